@@ -1,147 +1,130 @@
 import sys
 import os
-import sqlite3
-import math
-import statistics
 import json
 import datetime
+import threading
+import numpy as np
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
     QLabel, QPushButton, QLineEdit, QTableWidget, QTableWidgetItem, 
     QHeaderView, QTabWidget, QDialog, QFormLayout, QMessageBox, 
     QComboBox, QGroupBox, QScrollArea, QStackedWidget, QFileDialog,
-    QFrame, QAbstractItemView, QCheckBox, QDateEdit, QDoubleSpinBox
+    QFrame, QAbstractItemView, QCheckBox, QDateEdit, QDoubleSpinBox,
+    QTableView, QStyledItemDelegate, QProgressBar
+)
+from PyQt6.QtCore import (
+    Qt, QDate, QSize, pyqtSignal, QAbstractTableModel, QModelIndex,
+    QObject, QRunnable, QThreadPool
 )
-from PyQt6.QtCore import Qt, QDate, QSize, pyqtSignal
 from PyQt6.QtGui import QFont, QColor, QIcon, QAction
 
-# PDF Generation
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
-
-# ==================== CONFIGURATION ====================
-APP_NAME = "Uncertainty Calculator" # Changed from Lab Workbench
-ver_str = "0.6"
-COPYRIGHT_SIG = f"Eng. Mohammad Telfah copywrite Version {ver_str}"
-CONTACT_INFO = """
-Developer: Eng. Mohammad Telfah
-Phone: +962789841842
-Location: Amman - Jordan
-"""
+# Headless core (database, calculations, import, reports)
+from smartlab.config import (
+    APP_NAME, ver_str, COPYRIGHT_SIG, CONTACT_INFO,
+    DEFAULT_ADMIN_USER, DEFAULT_ADMIN_PASS, AUDITOR_USER, AUDITOR_PASS
+)
+from smartlab.db import DataManager, results_where
+from smartlab.units import UnitError
+from smartlab.calc import Calculator, RunningStats
+from smartlab.screening import Screening
+from smartlab.importer import CsvImporter
+from smartlab.analysis import analyze_matrix
+from smartlab.projects import ProjectBlob, read_project, save_project
+from smartlab.report import ReportBuilder
+from smartlab.trace import TRACE
+
+# ==================== BACKGROUND JOBS ====================
+class JobCancelled(Exception):
+    pass
+
+class JobSignals(QObject):
+    progress = pyqtSignal(int, int) # done, total
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+class Job(QRunnable):
+    # Runs fn(job, *args) on a pool thread. fn talks to SQLite only through
+    # job.db (that thread's own connection), reports job.progress(done, total)
+    # and calls job.check() at safe points so cancel() can stop it.
+    def __init__(self, name, fn, args, db_name):
+        super().__init__()
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.db_name = db_name
+        self.signals = JobSignals()
+        self._cancel = threading.Event()
+        self._db = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = DataManager.for_thread(self.db_name)
+            self._db.calibs.invalidate() # other connections may have written since
+            self._db.history.invalidate()
+        return self._db
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check(self):
+        if self.cancelled: raise JobCancelled()
+
+    def progress(self, done, total):
+        self.check()
+        self.signals.progress.emit(int(done), int(total))
+
+    def run(self):
+        try:
+            self.check()
+            with TRACE.span(f"job:{self.name}", "job"):
+                res = self.fn(self, *self.args)
+        except JobCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(f"{type(e).__name__}: {e}")
+        else:
+            self.signals.finished.emit(res)
+
+class JobRunner(QObject):
+    # Schedules Jobs on a QThreadPool; results come back as Qt signals on the GUI thread
+    changed = pyqtSignal()
+
+    def __init__(self, db_name, parent=None):
+        super().__init__(parent)
+        self.db_name = db_name
+        self.pool = QThreadPool()
+        self.jobs = []
+
+    def submit(self, name, fn, *args, on_done=None, on_error=None, on_progress=None):
+        job = Job(name, fn, args, self.db_name)
+        job.setAutoDelete(False)
+        if on_done: job.signals.finished.connect(on_done)
+        if on_error: job.signals.failed.connect(on_error)
+        if on_progress: job.signals.progress.connect(on_progress)
+        for sig in (job.signals.finished, job.signals.failed, job.signals.cancelled):
+            sig.connect(lambda *_, j=job: self._done(j))
+        self.jobs.append(job)
+        self.pool.start(job)
+        self.changed.emit()
+        return job
 
-# Auth Defaults
-DEFAULT_ADMIN_USER = "Admin"
-DEFAULT_ADMIN_PASS = "password123"
-AUDITOR_USER = "Auditor"
-AUDITOR_PASS = "2026"
-
-# ==================== DATABASE MANAGER ====================
-class DataManager:
-    def __init__(self, db_name="smartlab.db"):
-        self.conn = sqlite3.connect(db_name)
-        self.conn.row_factory = sqlite3.Row
-        self.init_db()
-
-    def init_db(self):
-        c = self.conn.cursor()
-        # Parameters
-        c.execute("""CREATE TABLE IF NOT EXISTS parameters (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, 
-            name TEXT, unit TEXT, warn_limit REAL, crit_limit REAL
-        )""")
-        
-        # Calibrations
-        c.execute("""CREATE TABLE IF NOT EXISTS calibrations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, 
-            param_id INTEGER, 
-            device TEXT, serial TEXT, date TEXT, 
-            cert_unc REAL, k_factor REAL, resolution REAL, 
-            drift REAL, accuracy REAL, active INTEGER DEFAULT 0
-        )""")
-        
-        # Results
-        c.execute("""CREATE TABLE IF NOT EXISTS results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, 
-            project TEXT, param TEXT, 
-            mean REAL, u_exp REAL, min_trust REAL, max_trust REAL, 
-            status TEXT, timestamp TEXT, auditor TEXT,
-            device_snap TEXT
-        )""")
-        
-        # Projects (Snapshots)
-        c.execute("""CREATE TABLE IF NOT EXISTS projects (
-            id TEXT PRIMARY KEY, 
-            name TEXT, 
-            last_modified TEXT, 
-            data_json TEXT
-        )""")
-
-        self.conn.commit()
-        self.seed_defaults()
-
-    def seed_defaults(self):
-        cur = self.conn.cursor()
-        cur.execute("SELECT count(*) FROM parameters")
-        if cur.fetchone()[0] == 0:
-            defaults = [
-                ("H2S","ppb", 10, 20), ("SO2","ppb", 75, 100), ("NO2","ppb", 40, 80),
-                ("PM2.5","ug/m3", 35, 50), ("PM10","ug/m3", 150, 200), ("TVOC","ppb", 200, 500),
-                ("CO","ppm", 9, 15), ("O3","ppb", 50, 80), 
-                ("Temperature","C", 45, 50), ("Humidity","%", 85, 90)
-            ]
-            for n, u, w, c in defaults:
-                self.conn.execute("INSERT INTO parameters (name, unit, warn_limit, crit_limit) VALUES (?,?,?,?)", (n,u,w,c))
-            self.conn.commit()
-
-    def query(self, sql, args=(), fetch=False):
-        c = self.conn.cursor()
-        c.execute(sql, args)
-        if fetch: return [dict(row) for row in c.fetchall()]
-        self.conn.commit()
-        return c.lastrowid
-
-# ==================== CALCULATION ENGINE ====================
-class Calculator:
-    @staticmethod
-    def convert(value, from_u, to_u):
-        if value is None: return 0.0
-        u1, u2 = str(from_u).lower().strip(), str(to_u).lower().strip()
-        if u1 == u2: return value
-        
-        # Concentration
-        if u1 == 'ppm' and u2 == 'ppb': return value * 1000.0
-        if u1 == 'ppb' and u2 == 'ppm': return value / 1000.0
-        
-        # Mass
-        if 'mg' in u1 and 'ug' in u2: return value * 1000.0
-        if 'ug' in u1 and 'mg' in u2: return value / 1000.0
-        
-        # Temp
-        if u1 == 'c' and u2 == 'k': return value + 273.15
-        if u1 == 'k' and u2 == 'c': return value - 273.15
-        if u1 == 'c' and u2 == 'f': return (value * 9/5) + 32
-        if u1 == 'f' and u2 == 'c': return (value - 32) * 5/9
-        
-        return value
-
-    @staticmethod
-    def calculate(readings, cert_unc, k, res, drift, acc):
-        if not readings: return 0, 0
-        n = len(readings)
-        mean = statistics.mean(readings)
-        stdev = statistics.stdev(readings) if n > 1 else 0
-        
-        u_a = stdev / math.sqrt(n)
-        u_cal = cert_unc / (k if k else 2.0)
-        u_res = res / math.sqrt(3)
-        u_drift = drift / math.sqrt(3)
-        u_acc = acc / math.sqrt(3)
-        
-        u_c = math.sqrt(u_a**2 + u_cal**2 + u_res**2 + u_drift**2 + u_acc**2)
-        u_exp = u_c * 2.0
-        return mean, u_exp
+    def _done(self, job):
+        if job in self.jobs: self.jobs.remove(job)
+        self.changed.emit()
+
+    def cancel_all(self):
+        for job in self.jobs: job.cancel()
+
+    def shutdown(self, msecs=5000):
+        self.cancel_all()
+        # idle pool threads outlive their jobs; don't leave their SQLite handles open
+        if self.pool.waitForDone(msecs): DataManager.close_threads(self.db_name)
 
 # ==================== UI STYLES ====================
 STYLES = """
@@ -166,7 +149,7 @@ STYLES = """
     
     /* Tables */
     QHeaderView::section { background-color: #f1f5f9; padding: 6px; border: none; font-weight: 600; color: #475569; }
-    QTableWidget { border: 1px solid #e2e8f0; gridline-color: #f1f5f9; selection-background-color: #e0f2fe; selection-color: #0f172a; }
+    QTableView { border: 1px solid #e2e8f0; gridline-color: #f1f5f9; selection-background-color: #e0f2fe; selection-color: #0f172a; }
     
     /* Buttons */
     QPushButton.primary { background-color: #0284c7; color: white; border: none; padding: 6px 12px; border-radius: 4px; font-weight: 600; }
@@ -179,6 +162,410 @@ STYLES = """
     QLineEdit:focus { border: 1px solid #0284c7; }
 """
 
+# ==================== MEASUREMENT GRID ====================
+def unit_options(unit):
+    if unit in ['ppm', 'ppb']: return ['ppb', 'ppm']
+    if 'm3' in unit: return ['ug/m3', 'mg/m3']
+    if unit.lower() in ['c', 'k', 'f']: return ['C', 'K', 'F']
+    return [unit]
+
+def fmt_reading(v):
+    t = repr(float(v))
+    return t[:-2] if t.endswith('.0') else t
+
+class MeasurementModel(QAbstractTableModel):
+    # Grid backed by one float64 (rows x params) array, NaN = empty cell.
+    # Row 0 holds the input unit of each column; rows 1.. are readings.
+    # The view only asks for visible cells, so no per-cell objects exist.
+    # Each column also keeps running stats (input units), built on first use
+    # and then updated per edit, so the live footer never rescans a column.
+    MIN_ROWS = 10
+    SPARE_ROWS = 10
+    statsChanged = pyqtSignal(int)
+
+    def __init__(self, read_only=False, parent=None):
+        super().__init__(parent)
+        self.read_only = read_only
+        self.params = []
+        self.units = []
+        self.values = np.full((self.MIN_ROWS, 0), np.nan, order='F')
+        self.used = 0 # rows up to the last reading ever entered
+        self.pending = {} # column -> (ProjectBlob, block) not decoded yet
+        self.stats = [] # column -> RunningStats, None until first asked for
+
+    # --- Qt model API ---
+    def rowCount(self, parent=QModelIndex()):
+        return 1 + max(self.used + self.SPARE_ROWS, self.MIN_ROWS)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.params)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        r, c = index.row(), index.column()
+        if r == 0:
+            if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole): return self.units[c]
+            if role == Qt.ItemDataRole.BackgroundRole: return QColor("#f1f5f9")
+            return None
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            if r - 1 >= len(self.values): return None
+            if self.pending: self._decode(c)
+            v = self.values[r - 1, c]
+            return None if np.isnan(v) else fmt_reading(v)
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if role != Qt.ItemDataRole.EditRole or self.read_only: return False
+        r, c = index.row(), index.column()
+        if r == 0:
+            self.units[c] = str(value)
+        else:
+            txt = str(value if value is not None else "").strip()
+            try: v = float(txt) if txt else np.nan
+            except ValueError: return False
+            self._decode(c)
+            self._reserve(r)
+            old = self.values[r - 1, c]
+            self.values[r - 1, c] = v
+            st = self.stats[c]
+            if st is not None:
+                if not np.isnan(old): st.remove(float(old))
+                if not np.isnan(v): st.add(v)
+            if txt and r > self.used: self._grow(r)
+        self.dataChanged.emit(index, index)
+        self.statsChanged.emit(c)
+        return True
+
+    def flags(self, index):
+        f = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        if not self.read_only: f |= Qt.ItemFlag.ItemIsEditable
+        return f
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole: return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.params[section]['name'] if section < len(self.params) else None
+        return "Unit" if section == 0 else str(section)
+
+    # --- Storage ---
+    def _grow(self, used):
+        first, last = self.rowCount(), 1 + max(used + self.SPARE_ROWS, self.MIN_ROWS) - 1
+        if last >= first: self.beginInsertRows(QModelIndex(), first, last)
+        self.used = used
+        if last >= first: self.endInsertRows()
+
+    def _reserve(self, rows):
+        if rows <= len(self.values): return
+        cap = max(rows, 2 * len(self.values))
+        grown = np.full((cap, len(self.params)), np.nan, order='F')
+        grown[:len(self.values)] = self.values
+        self.values = grown
+
+    def _decode(self, c=None):
+        for c in (list(self.pending) if c is None else [c]):
+            src = self.pending.pop(c, None)
+            if src: self.values[:src[0].rows, c] = src[0].column(src[1])
+
+    def column_stats(self, c):
+        # RunningStats of column c in its input unit
+        if self.stats[c] is None:
+            self._decode(c)
+            self.stats[c] = RunningStats().update(self.values[:, c])
+        return self.stats[c]
+
+    def set_params(self, params):
+        # Keeps readings/units of parameters that are still present
+        self._decode()
+        old = {p['id']: c for c, p in enumerate(self.params)}
+        values = np.full((len(self.values), len(params)), np.nan, order='F')
+        units = []
+        for c, p in enumerate(params):
+            if p['id'] in old:
+                values[:, c] = self.values[:, old[p['id']]]
+                units.append(self.units[old[p['id']]])
+            else:
+                units.append(p['unit'])
+        self.beginResetModel()
+        self.params, self.units, self.values = params, units, values
+        self.stats = [None] * len(params)
+        self.endResetModel()
+
+    def load(self, values, units=None):
+        # values: (rows x params) readings in the input units; units: input unit
+        # per column, missing / None = the parameter's own unit (never the last pick)
+        values = np.asarray(values, dtype=float)
+        self.beginResetModel()
+        self.values = np.full((max(len(values), self.MIN_ROWS), len(self.params)), np.nan, order='F')
+        self.values[:len(values), :values.shape[1]] = values[:, :len(self.params)]
+        units = units or []
+        self.units = [units[c] if c < len(units) and units[c] else p['unit'] for c, p in enumerate(self.params)]
+        filled = np.flatnonzero(~np.isnan(values).all(axis=1))
+        self.used = int(filled[-1]) + 1 if filled.size else 0
+        self.pending = {}
+        self.stats = [None] * len(self.params)
+        self.endResetModel()
+
+    def load_blob(self, blob):
+        # Columns stay compressed until they are shown or analysed
+        by_id = {p['id']: c for c, p in enumerate(self.params)}
+        self.beginResetModel()
+        self.values = np.full((max(blob.rows, self.MIN_ROWS), len(self.params)), np.nan, order='F')
+        self.units = [p['unit'] for p in self.params]
+        self.pending = {}
+        self.stats = [None] * len(self.params)
+        for i, col in enumerate(blob.columns):
+            c = by_id.get(col['param_id'])
+            if c is None: continue
+            self.units[c] = col['unit']
+            self.pending[c] = (blob, i)
+        self.used = blob.rows
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self.values = np.full((self.MIN_ROWS, len(self.params)), np.nan, order='F')
+        self.units = [p['unit'] for p in self.params]
+        self.used = 0
+        self.pending = {}
+        self.stats = [None] * len(self.params)
+        self.endResetModel()
+
+    def snapshot(self):
+        # (used rows x params) readings in their input units, input units
+        self._decode()
+        return self.values[:self.used], list(self.units)
+
+    def converted(self):
+        # (used rows x params) readings converted to each parameter's unit
+        self._decode()
+        out = np.array(self.values[:self.used], dtype=float)
+        for c, p in enumerate(self.params):
+            out[:, c] = Calculator.convert(out[:, c], self.units[c], p['unit'])
+        return out
+
+class UnitDelegate(QStyledItemDelegate):
+    # Unit selector for row 0 of the measurement grid
+    def createEditor(self, parent, option, index):
+        if index.row() != 0: return super().createEditor(parent, option, index)
+        cmb = QComboBox(parent)
+        cmb.addItems(unit_options(index.model().params[index.column()]['unit']))
+        cmb.currentTextChanged.connect(lambda _: self.commitData.emit(cmb))
+        return cmb
+
+    def setEditorData(self, editor, index):
+        if index.row() != 0: return super().setEditorData(editor, index)
+        editor.blockSignals(True)
+        editor.setCurrentText(index.data())
+        editor.blockSignals(False)
+
+    def setModelData(self, editor, model, index):
+        if index.row() != 0: return super().setModelData(editor, model, index)
+        model.setData(index, editor.currentText())
+
+class GridFooterModel(QAbstractTableModel):
+    # One live row under the grid: mean ± U (k=2) and status per parameter,
+    # from the grid's running column stats converted to the parameter unit.
+    COLORS = {"PASS": "#dcfce7", "WARN": "#fef9c3", "FAIL": "#fee2e2"}
+
+    def __init__(self, grid, calibs, parent=None):
+        super().__init__(parent)
+        self.grid = grid
+        self.calibs = calibs
+        grid.modelReset.connect(self.refresh)
+        grid.statsChanged.connect(lambda c: self.dataChanged.emit(self.index(0, c), self.index(0, c)))
+
+    def refresh(self):
+        self.beginResetModel()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 1
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.grid.columnCount()
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Vertical: return "Live"
+        return None
+
+    def summary(self, c):
+        # -> (n, mean, U or None, status) in the parameter unit, or None if empty
+        st = self.grid.column_stats(c)
+        if not st.n: return None
+        p, unit = self.grid.params[c], self.grid.units[c]
+        mean = Calculator.convert(st.mean, unit, p['unit'])
+        scale = abs(Calculator.convert(1.0, unit, p['unit']) - Calculator.convert(0.0, unit, p['unit']))
+        cal = self.calibs.active(p['id'])
+        u = None
+        if cal:
+            u = Calculator.expand(st.stdev / np.sqrt(st.n) * scale, cal['cert_unc'], cal['k_factor'],
+                                  cal['resolution'], cal['drift'], cal['accuracy'])
+        return st.n, mean, u, Calculator.status(mean, p['warn_limit'], p['crit_limit'])
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.BackgroundRole, Qt.ItemDataRole.ToolTipRole): return None
+        try:
+            s = self.summary(index.column())
+        except UnitError:
+            return "unit?" if role == Qt.ItemDataRole.DisplayRole else None
+        if s is None: return None
+        n, mean, u, status = s
+        if role == Qt.ItemDataRole.BackgroundRole: return QColor(self.COLORS[status])
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return f"n = {n}\nmean = {mean:.6g}\n" + (f"U (k=2) = {u:.6g}" if u is not None else "no active calibration")
+        return f"{mean:.5g} ± {u:.3g}  {status}" if u is not None else f"{mean:.5g}  {status}"
+
+class GridFooter(QTableView):
+    # Footer view that follows the grid's columns and horizontal scrolling
+    def __init__(self, grid, model):
+        super().__init__()
+        self.grid = grid
+        self.setModel(model)
+        self.horizontalHeader().hide()
+        self.verticalHeader().setDefaultSectionSize(26)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setFixedHeight(28)
+        grid.horizontalScrollBar().valueChanged.connect(self.horizontalScrollBar().setValue)
+        grid.horizontalHeader().sectionResized.connect(lambda c, _, w: self.setColumnWidth(c, w))
+        grid.verticalHeader().geometriesChanged.connect(self.sync)
+        model.modelReset.connect(self.sync)
+
+    def sync(self):
+        self.verticalHeader().setFixedWidth(self.grid.verticalHeader().width())
+        for c in range(self.model().columnCount()): self.setColumnWidth(c, self.grid.columnWidth(c))
+        self.horizontalScrollBar().setValue(self.grid.horizontalScrollBar().value())
+
+# ==================== RESULTS MODEL ====================
+class ResultsModel(QAbstractTableModel):
+    # Results newest-first, fetched a page at a time as the view scrolls
+    # (keyset on id, never OFFSET). refresh_new() only pulls rows newer than
+    # the newest one shown. Filters are applied in SQL.
+    HEADERS = ["Project", "Param", "Mean", "U (Exp)", "Min", "Max", "Status", "Date", "Flagged"]
+    STATUS_COLORS = {'FAIL': ("#fee2e2", "#b91c1c"), 'WARN': ("#fef3c7", "#b45309"), 'PASS': ("#dcfce7", "#15803d")}
+    PAGE = 500
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.rows = []
+        self.filters = {}
+        self.more = True
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal: return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        r, c = self.rows[index.row()], index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if c == 0: return r['project']
+            if c == 1: return r['param']
+            if c == 2: return f"{r['mean']:.4f}"
+            if c == 3: return f"± {r['u_exp']:.4f}"
+            if c == 4: return f"{r['min_trust']:.4f}"
+            if c == 5: return f"{r['max_trust']:.4f}"
+            if c == 6: return r['status']
+            if c == 7: return r['timestamp']
+            if c == 8: return str(len(json.loads(r['flagged']))) if r['flagged'] else ""
+        if c == 8 and role == Qt.ItemDataRole.ToolTipRole and r['flagged']:
+            cfg = json.loads(r['screening'])
+            vals = json.loads(r['flagged'])
+            return (f"{cfg['method']}, {'excluded' if cfg['exclude'] else 'kept'}: "
+                    + (", ".join(f"{v:g}" for v in vals[:20]) + (" ..." if len(vals) > 20 else "") if vals else "none"))
+        if c == 3 and role == Qt.ItemDataRole.ToolTipRole and r['type_a']:
+            return f"Type A: {r['type_a']}, effective n {r['n_eff']:.1f}"
+        if c == 6 and role in (Qt.ItemDataRole.BackgroundRole, Qt.ItemDataRole.ForegroundRole):
+            bg, fg = self.STATUS_COLORS.get(r['status'], self.STATUS_COLORS['PASS'])
+            return QColor(bg if role == Qt.ItemDataRole.BackgroundRole else fg)
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.more
+
+    def fetchMore(self, parent=QModelIndex()):
+        where, args = results_where(self.filters, ["id < ?"] if self.rows else [])
+        if self.rows: args.insert(0, self.rows[-1]['id'])
+        rows = self.db.query(f"SELECT * FROM results{where} ORDER BY id DESC LIMIT ?", (*args, self.PAGE), fetch=True)
+        self.more = len(rows) == self.PAGE
+        if not rows: return
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+        self.rows.extend(rows)
+        self.endInsertRows()
+
+    def refresh_new(self):
+        if not self.rows:
+            if self.more: return self.fetchMore()
+            self.more = True # empty so far: look again from the top
+            return self.fetchMore()
+        where, args = results_where(self.filters, ["id > ?"])
+        rows = self.db.query(f"SELECT * FROM results{where} ORDER BY id DESC LIMIT ?", (self.rows[0]['id'], *args, self.PAGE + 1), fetch=True)
+        if len(rows) > self.PAGE: return self.set_filters(**self.filters) # bulk insert: start over from the top
+        if not rows: return
+        self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+        self.rows[0:0] = rows
+        self.endInsertRows()
+
+    def set_filters(self, **filters):
+        self.beginResetModel()
+        self.filters = {k: v for k, v in filters.items() if v}
+        self.rows = []
+        self.more = True
+        self.endResetModel()
+        self.fetchMore()
+
+# ==================== RAW READINGS ====================
+class ReadingsModel(QAbstractTableModel):
+    # Read-only view straight over the ReadingStore's mmap'd array
+    def __init__(self, values, parent=None):
+        super().__init__(parent)
+        self.values = values
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.values)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 1
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole: return None
+        return "Reading" if orientation == Qt.Orientation.Horizontal else str(section + 1)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole: return fmt_reading(self.values[index.row()])
+        return None
+
+class ReadingsDialog(QDialog):
+    # The raw readings behind one result, re-verified against the stored row
+    def __init__(self, db, result, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Readings - {result['project']} / {result['param']}")
+        self.resize(360, 500)
+        l = QVBoxLayout(self)
+        values = db.readings.get(result['id'])
+        if values is None:
+            l.addWidget(QLabel("No raw readings were stored for this result."))
+            return
+        v = db.readings.verify([result['id']])[0]
+        msg = (f"n = {v['n']}, mean = {v['mean']:.6g}, U (k=2) = {v['u_exp']:.6g}\n"
+               + ("Verified: readings match, mean lies within the Monte Carlo interval." if v['ok'] and v['method'] == "mcm" else
+                  "Verified: readings and result match." if v['ok'] else
+                  "Digest mismatch: the stored readings were altered." if not v['digest_ok'] else
+                  "Recomputed values differ from the stored result."))
+        lbl = QLabel(msg); lbl.setStyleSheet(f"color: {'#15803d' if v['ok'] else '#b91c1c'};")
+        l.addWidget(lbl)
+        view = QTableView()
+        view.setModel(ReadingsModel(values, view))
+        view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        l.addWidget(view)
+
 # ==================== CALIBRATION DIALOG ====================
 class CalibrationDialog(QDialog):
     def __init__(self, db, param_id, user_role, parent=None):
@@ -231,17 +618,16 @@ class CalibrationDialog(QDialog):
         hist_grp = QGroupBox("History")
         hl = QVBoxLayout(hist_grp)
         self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["Date", "Device", "Serial", "Status"])
+        self.table.setColumnCount(5)
+        self.table.setHorizontalHeaderLabels(["Cal. Date", "Device", "Serial", "Valid From", "Valid To"])
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         hl.addWidget(self.table)
         layout.addWidget(hist_grp)
 
     def load_data(self):
         # Active
-        active = self.db.query("SELECT * FROM calibrations WHERE param_id=? AND active=1", (self.param_id,), fetch=True)
-        if active:
-            r = active[0]
+        r = self.db.calibs.active(self.param_id)
+        if r:
             self.inp_dev.setText(r['device'])
             self.inp_sn.setText(r['serial'])
             self.inp_date.setDate(QDate.fromString(r['date'], "yyyy-MM-dd"))
@@ -251,28 +637,23 @@ class CalibrationDialog(QDialog):
             self.inp_drift.setValue(r['drift'])
             self.inp_acc.setValue(r['accuracy'])
 
-        # History
-        rows = self.db.query("SELECT * FROM calibrations WHERE param_id=? ORDER BY date DESC", (self.param_id,), fetch=True)
+        # History: one immutable version per save, newest first
+        rows = self.db.query("SELECT * FROM calibrations WHERE param_id=? ORDER BY valid_from DESC, id DESC", (self.param_id,), fetch=True)
         self.table.setRowCount(len(rows))
         for i, row in enumerate(rows):
             self.table.setItem(i, 0, QTableWidgetItem(row['date']))
             self.table.setItem(i, 1, QTableWidgetItem(row['device']))
             self.table.setItem(i, 2, QTableWidgetItem(row['serial']))
-            status = "Active" if row['active'] else "Inactive"
-            self.table.setItem(i, 3, QTableWidgetItem(status))
+            self.table.setItem(i, 3, QTableWidgetItem(row['valid_from']))
+            self.table.setItem(i, 4, QTableWidgetItem(row['valid_to'] or ("Active" if row['active'] else "")))
 
     def save(self):
-        # Deactivate old
-        self.db.conn.execute("UPDATE calibrations SET active=0 WHERE param_id=?", (self.param_id,))
-        # Insert new
-        sql = """INSERT INTO calibrations (param_id, device, serial, date, cert_unc, k_factor, resolution, drift, accuracy, active)
-                 VALUES (?,?,?,?,?,?,?,?,?,1)"""
-        vals = (
-            self.param_id, self.inp_dev.text(), self.inp_sn.text(), self.inp_date.date().toString("yyyy-MM-dd"),
-            self.inp_unc.value(), self.inp_k.value(), self.inp_res.value(), self.inp_drift.value(), self.inp_acc.value()
-        )
-        self.db.conn.execute(sql, vals)
-        self.db.conn.commit()
+        # New version; the current one is closed, never overwritten
+        self.db.history.add(self.param_id, dict(
+            device=self.inp_dev.text(), serial=self.inp_sn.text(), date=self.inp_date.date().toString("yyyy-MM-dd"),
+            cert_unc=self.inp_unc.value(), k_factor=self.inp_k.value(), resolution=self.inp_res.value(),
+            drift=self.inp_drift.value(), accuracy=self.inp_acc.value()
+        ))
         QMessageBox.information(self, "Saved", "Calibration Profile Updated.")
         self.load_data()
 
@@ -324,13 +705,19 @@ class MainWindow(QMainWindow):
         self.username = username
         self.role = role
         self.is_auditor = (role == AUDITOR_USER)
+        self.project_id = None # project loaded in the grid, None = not saved yet
         self.db = DataManager()
+        self.jobs = JobRunner(self.db.db_name, self)
         
         self.setWindowTitle(f"{APP_NAME} v{ver_str}")
         self.resize(1200, 800)
         self.setup_ui()
         self.refresh_all()
 
+    def closeEvent(self, event):
+        self.jobs.shutdown()
+        super().closeEvent(event)
+
     def setup_ui(self):
         # Container
         container = QWidget()
@@ -400,6 +787,15 @@ class MainWindow(QMainWindow):
         main_layout.addWidget(sidebar)
         main_layout.addWidget(content_area)
 
+        # Background jobs: progress + cancel in the status bar
+        self.job_lbl = QLabel()
+        self.job_bar = QProgressBar(); self.job_bar.setFixedWidth(200)
+        self.job_cancel = QPushButton("Cancel"); self.job_cancel.clicked.connect(self.jobs.cancel_all)
+        for wdg in [self.job_lbl, self.job_bar, self.job_cancel]:
+            self.statusBar().addPermanentWidget(wdg)
+        self.jobs.changed.connect(self.update_job_status)
+        self.update_job_status()
+
         # --- VIEWS ---
         self.init_workbench()
         self.init_settings()
@@ -431,6 +827,7 @@ class MainWindow(QMainWindow):
         self.tabs.addTab(self.tab_params(), "Parameters")
         self.tabs.addTab(self.tab_measure(), "Measurement Analysis")
         self.tabs.addTab(self.tab_results(), "Results")
+        self.tabs.addTab(self.tab_trends(), "Trends")
         self.tabs.addTab(self.tab_docs(), "Documentation")
         
         l.addWidget(self.tabs)
@@ -486,33 +883,95 @@ class MainWindow(QMainWindow):
         
         if not self.is_auditor:
             b_save = QPushButton("Save Project"); b_save.clicked.connect(self.save_current_project)
+            b_imp = QPushButton("Import CSV"); b_imp.clicked.connect(self.import_csv)
             b_run = QPushButton("Run Analysis"); b_run.setProperty("class", "primary"); b_run.clicked.connect(self.run_analysis)
-            ctrl.addWidget(b_save); ctrl.addWidget(b_run)
+            self.cmb_method = QComboBox()
+            self.cmb_method.addItem("GUM (k=2)", None)
+            self.cmb_method.addItem("Monte Carlo (GUM-S1)", {})
+            ctrl.addWidget(QLabel("Method:")); ctrl.addWidget(self.cmb_method)
+            self.cmb_screen = QComboBox()
+            for label, m in [("No screening", None), ("Modified Z (MAD)", "mad"), ("Grubbs", "grubbs"), ("Dixon Q", "dixon")]:
+                self.cmb_screen.addItem(label, m)
+            self.chk_exclude = QCheckBox("Exclude outliers"); self.chk_exclude.setChecked(True)
+            ctrl.addWidget(QLabel("Screening:")); ctrl.addWidget(self.cmb_screen); ctrl.addWidget(self.chk_exclude)
+            self.cmb_type_a = QComboBox()
+            for label, m in [("Independent", None), ("Autocorrelation (log)", "acf"), ("Block bootstrap (log)", "bootstrap")]:
+                self.cmb_type_a.addItem(label, m)
+            ctrl.addWidget(QLabel("Type A:")); ctrl.addWidget(self.cmb_type_a)
+            ctrl.addWidget(b_save); ctrl.addWidget(b_imp); ctrl.addWidget(b_run)
             
         l.addLayout(ctrl)
         
         # Grid
-        self.grid = QTableWidget()
-        self.grid.setRowCount(10)
+        self.grid_model = MeasurementModel(read_only=self.is_auditor)
+        self.grid = QTableView()
+        self.grid.setModel(self.grid_model)
+        self.grid.setItemDelegate(UnitDelegate(self.grid))
+        self.grid_model.modelReset.connect(self.open_unit_editors)
         self.grid.setAlternatingRowColors(True)
+        self.grid.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.grid.verticalHeader().setDefaultSectionSize(26)
         l.addWidget(self.grid)
+        
+        # Live mean ± U / status per parameter, updated per edit
+        self.grid_footer = GridFooter(self.grid, GridFooterModel(self.grid_model, self.db.calibs))
+        l.addWidget(self.grid_footer)
         return w
 
     def tab_results(self):
         w = QWidget(); l = QVBoxLayout(w)
         
         top = QHBoxLayout()
+        self.f_proj = QLineEdit(); self.f_proj.setPlaceholderText("Project")
+        self.f_param = QComboBox(); self.f_param.addItem("All Params", "")
+        self.f_status = QComboBox()
+        for st in ["", "PASS", "WARN", "FAIL"]: self.f_status.addItem(st or "All Status", st)
+        self.f_use_dates = QCheckBox("From")
+        self.f_from = QDateEdit(QDate.currentDate().addMonths(-1)); self.f_from.setDisplayFormat("yyyy-MM-dd"); self.f_from.setCalendarPopup(True)
+        self.f_to = QDateEdit(QDate.currentDate()); self.f_to.setDisplayFormat("yyyy-MM-dd"); self.f_to.setCalendarPopup(True)
+        b_flt = QPushButton("Filter"); b_flt.clicked.connect(self.apply_results_filter)
+        self.f_proj.returnPressed.connect(self.apply_results_filter)
+        for wdg in [self.f_proj, self.f_param, self.f_status, self.f_use_dates, self.f_from, QLabel("To"), self.f_to, b_flt]:
+            top.addWidget(wdg)
         b_pdf = QPushButton("Export PDF Report"); b_pdf.clicked.connect(self.export_pdf)
         top.addStretch(); top.addWidget(b_pdf)
         l.addLayout(top)
         
-        self.tbl_res = QTableWidget()
-        self.tbl_res.setColumnCount(8)
-        self.tbl_res.setHorizontalHeaderLabels(["Project", "Param", "Mean", "U (Exp)", "Min", "Max", "Status", "Date"])
+        self.res_model = ResultsModel(self.db)
+        self.tbl_res = QTableView()
+        self.tbl_res.setModel(self.res_model)
         self.tbl_res.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.tbl_res.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.tbl_res.doubleClicked.connect(lambda idx: ReadingsDialog(self.db, self.res_model.rows[idx.row()], self).exec())
         l.addWidget(self.tbl_res)
         return w
         
+    def tab_trends(self):
+        w = QWidget(); l = QVBoxLayout(w)
+        
+        top = QHBoxLayout()
+        self.t_param = QComboBox()
+        self.t_proj = QLineEdit(); self.t_proj.setPlaceholderText("All Projects")
+        self.t_bucket = QComboBox()
+        for b in ["day", "week", "month", "year", "all"]: self.t_bucket.addItem(b.capitalize(), b)
+        self.t_bucket.setCurrentIndex(2)
+        self.t_use_dates = QCheckBox("From")
+        self.t_from = QDateEdit(QDate.currentDate().addYears(-3)); self.t_from.setDisplayFormat("yyyy-MM-dd"); self.t_from.setCalendarPopup(True)
+        self.t_to = QDateEdit(QDate.currentDate()); self.t_to.setDisplayFormat("yyyy-MM-dd"); self.t_to.setCalendarPopup(True)
+        b_show = QPushButton("Show"); b_show.clicked.connect(self.load_trends)
+        self.t_proj.returnPressed.connect(self.load_trends)
+        for wdg in [self.t_param, self.t_proj, self.t_bucket, self.t_use_dates, self.t_from, QLabel("To"), self.t_to, b_show]:
+            top.addWidget(wdg)
+        top.addStretch()
+        l.addLayout(top)
+        
+        self.tbl_trend = QTableWidget(0, 10)
+        self.tbl_trend.setHorizontalHeaderLabels(["Period", "Results", "Mean", "Std Dev", "Min", "Max", "Mean U", "Max U", "WARN", "FAIL"])
+        self.tbl_trend.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.tbl_trend.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        l.addWidget(self.tbl_trend)
+        return w
+
     def tab_docs(self):
         w = QWidget(); l = QVBoxLayout(w)
         txt = QLabel("""
@@ -553,9 +1012,47 @@ class MainWindow(QMainWindow):
         b_clr.clicked.connect(self.new_project)
         dl.addWidget(b_clr)
         l.addWidget(data)
-        l.addStretch()
+        
+        # Timings of queries, UI refreshes and background jobs
+        diag = QGroupBox("Diagnostics")
+        gl = QVBoxLayout(diag)
+        opts = QHBoxLayout()
+        c_trace = QCheckBox("Record timings"); c_trace.setChecked(TRACE.enabled)
+        c_trace.toggled.connect(TRACE.enable)
+        c_prof = QCheckBox("cProfile capture"); c_prof.setChecked(TRACE.profiling)
+        c_prof.toggled.connect(lambda on: setattr(TRACE, 'profiling', on))
+        opts.addWidget(c_trace); opts.addWidget(c_prof); opts.addStretch()
+        for text, slot in [("Refresh", self.load_diagnostics), ("Clear", lambda: (TRACE.clear(), self.load_diagnostics())),
+                           ("Export Trace", self.export_trace), ("Save Profile", self.export_profile)]:
+            b = QPushButton(text); b.clicked.connect(slot); opts.addWidget(b)
+        gl.addLayout(opts)
+        self.tbl_diag = QTableWidget(0, 7)
+        self.tbl_diag.setHorizontalHeaderLabels(["Kind", "Name", "Calls", "Total ms", "Mean ms", "Max ms", "Rows"])
+        self.tbl_diag.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        self.tbl_diag.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        gl.addWidget(self.tbl_diag)
+        l.addWidget(diag)
         self.stack.addWidget(w)
 
+    def load_diagnostics(self):
+        rows = TRACE.summary()[:200]
+        self.tbl_diag.setRowCount(len(rows))
+        for i, (kind, name, calls, total, mean, mx, n) in enumerate(rows):
+            for c, v in enumerate([kind, name, str(calls), f"{total:.1f}", f"{mean:.2f}", f"{mx:.1f}", str(n)]):
+                self.tbl_diag.setItem(i, c, QTableWidgetItem(v))
+
+    def export_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Trace", "trace.json", "JSON (*.json);;CSV (*.csv)")
+        if not path: return
+        n = TRACE.export(path)
+        QMessageBox.information(self, "Exported", f"{n} events written.")
+
+    def export_profile(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Profile", "profile.prof", "pstats (*.prof);;Text (*.txt)")
+        if not path: return
+        if TRACE.export_profile(path): QMessageBox.information(self, "Saved", "Profile saved.")
+        else: QMessageBox.warning(self, "Profile", "Nothing captured yet: enable cProfile capture and use the app first.")
+
     def init_about(self):
         w = QWidget(); l = QVBoxLayout(w)
         l.addWidget(QLabel(f"<h2>{APP_NAME}</h2>"))
@@ -571,31 +1068,46 @@ class MainWindow(QMainWindow):
     # ------------------ LOGIC ------------------
 
     def refresh_all(self):
-        self.load_params()
-        self.load_projects_list()
-        self.load_results()
-        self.setup_grid_cols()
+        with TRACE.span("MainWindow.refresh_all"):
+            self.load_params()
+            self.load_projects_list()
+            self.load_results()
+            self.load_trends()
+            self.setup_grid_cols()
 
     def load_params(self):
-        params = self.db.query("SELECT * FROM parameters", fetch=True)
-        self.tbl_params.setRowCount(len(params))
-        for i, p in enumerate(params):
-            self.tbl_params.setItem(i, 0, QTableWidgetItem(p['name']))
-            self.tbl_params.setItem(i, 1, QTableWidgetItem(p['unit']))
-            self.tbl_params.setItem(i, 2, QTableWidgetItem(str(p['warn_limit'])))
-            self.tbl_params.setItem(i, 3, QTableWidgetItem(str(p['crit_limit'])))
+        with TRACE.span("MainWindow.load_params"):
+            params = self.db.calibs.params()
+            self.tbl_params.setRowCount(len(params))
+            for i, p in enumerate(params):
+                self.tbl_params.setItem(i, 0, QTableWidgetItem(p['name']))
+                self.tbl_params.setItem(i, 1, QTableWidgetItem(p['unit']))
+                self.tbl_params.setItem(i, 2, QTableWidgetItem(str(p['warn_limit'])))
+                self.tbl_params.setItem(i, 3, QTableWidgetItem(str(p['crit_limit'])))
             
-            # Status
-            cal = self.db.query("SELECT * FROM calibrations WHERE param_id=? AND active=1", (p['id'],), fetch=True)
-            st_txt = "Active" if cal else "Missing"
-            st_col = QColor("green") if cal else QColor("orange")
-            it_st = QTableWidgetItem(st_txt); it_st.setForeground(st_col)
-            self.tbl_params.setItem(i, 4, it_st)
+                # Status
+                cal = self.db.calibs.active(p['id'])
+                st_txt = "Active" if cal else "Missing"
+                st_col = QColor("green") if cal else QColor("orange")
+                it_st = QTableWidgetItem(st_txt); it_st.setForeground(st_col)
+                self.tbl_params.setItem(i, 4, it_st)
             
-            # Btn
-            btn = QPushButton("Manage Cal" if not self.is_auditor else "View Cal")
-            btn.clicked.connect(lambda ch, pid=p['id']: self.open_cal_dialog(pid))
-            self.tbl_params.setCellWidget(i, 5, btn)
+                # Btn
+                btn = QPushButton("Manage Cal" if not self.is_auditor else "View Cal")
+                btn.clicked.connect(lambda ch, pid=p['id']: self.open_cal_dialog(pid))
+                self.tbl_params.setCellWidget(i, 5, btn)
+        
+            # Results filter choices
+            sel = self.f_param.currentData()
+            self.f_param.blockSignals(True)
+            self.f_param.clear(); self.f_param.addItem("All Params", "")
+            for p in params: self.f_param.addItem(p['name'], p['name'])
+            self.f_param.setCurrentIndex(max(self.f_param.findData(sel), 0))
+            self.f_param.blockSignals(False)
+            sel = self.t_param.currentData()
+            self.t_param.clear()
+            for p in params: self.t_param.addItem(p['name'], p['name'])
+            self.t_param.setCurrentIndex(max(self.t_param.findData(sel), 0))
 
     def open_cal_dialog(self, pid):
         d = CalibrationDialog(self.db, pid, self.role, self)
@@ -615,189 +1127,183 @@ class MainWindow(QMainWindow):
         l.addRow(b)
         if d.exec():
             if n.text():
-                self.db.conn.execute("INSERT INTO parameters (name, unit, warn_limit, crit_limit) VALUES (?,?,?,?)",
-                                     (n.text(), u.text(), w.value(), c.value()))
-                self.db.conn.commit()
+                self.db.query("INSERT INTO parameters (name, unit, warn_limit, crit_limit) VALUES (?,?,?,?)",
+                              (n.text(), u.text(), w.value(), c.value()))
+                self.db.calibs.invalidate()
                 self.refresh_all()
 
     def setup_grid_cols(self):
-        params = self.db.query("SELECT * FROM parameters", fetch=True)
-        self.grid.setColumnCount(len(params))
-        self.grid.setHorizontalHeaderLabels([p['name'] for p in params])
-        
-        # Unit Header (Row 0 workaround or just comboboxes)
+        params = self.db.calibs.params()
         # Using a custom approach: Store params in a list to map columns
         self.grid_params = params
-        self.grid_units = []
-        
-        # We'll use Cell Widgets for unit selection in Row 0? 
-        # Better: Just plain inputs. To keep it simple like Angular, we assume input is converted.
-        # But let's add a row 0 for "Input Unit"
-        if self.grid.rowCount() < 11: self.grid.insertRow(0)
-        
-        for c, p in enumerate(params):
-            cmb = QComboBox()
-            opts = [p['unit']]
-            if p['unit'] in ['ppm', 'ppb']: opts = ['ppb', 'ppm']
-            elif 'm3' in p['unit']: opts = ['ug/m3', 'mg/m3']
-            elif p['unit'].lower() in ['c','k','f']: opts = ['C', 'K', 'F']
-            cmb.addItems(opts)
-            cmb.setCurrentText(p['unit'])
-            if self.is_auditor: cmb.setEnabled(False)
-            self.grid.setCellWidget(0, c, cmb)
+        self.grid_model.set_params(params)
+
+    def open_unit_editors(self):
+        # Row 0 is "Input Unit": keep a combobox open on each column
+        if self.is_auditor: return
+        for c in range(self.grid_model.columnCount()):
+            self.grid.openPersistentEditor(self.grid_model.index(0, c))
+
+    # ------------------ JOBS ------------------
+    def update_job_status(self):
+        busy = bool(self.jobs.jobs)
+        self.job_lbl.setText(", ".join(j.name for j in self.jobs.jobs))
+        self.job_bar.setRange(0, 0) # busy until a job reports progress
+        for wdg in [self.job_lbl, self.job_bar, self.job_cancel]: wdg.setVisible(busy)
+
+    def job_progress(self, done, total):
+        self.job_bar.setRange(0, max(total, 1))
+        self.job_bar.setValue(done)
+
+    def job_failed(self, msg):
+        QMessageBox.warning(self, "Error", msg)
 
     def run_analysis(self):
-        proj = self.txt_proj_name.text() or "Untitled"
+        with TRACE.span("MainWindow.run_analysis"):
+            proj = self.txt_proj_name.text() or "Untitled"
         
-        for c, p in enumerate(self.grid_params):
-            # Get Calibration
-            cal_row = self.db.query("SELECT * FROM calibrations WHERE param_id=? AND active=1", (p['id'],), fetch=True)
-            if not cal_row: continue # Skip if no cal
-            cal = cal_row[0]
-            
-            # Get Readings
-            readings = []
-            u_in = self.grid.cellWidget(0, c).currentText()
-            
-            for r in range(1, self.grid.rowCount()):
-                it = self.grid.item(r, c)
-                if it and it.text().strip():
-                    try:
-                        val = float(it.text())
-                        val_conv = Calculator.convert(val, u_in, p['unit'])
-                        readings.append(val_conv)
-                    except: pass
-            
-            if not readings: continue
-            
-            # Calc
-            mean, u_exp = Calculator.calculate(
-                readings, cal['cert_unc'], cal['k_factor'], cal['resolution'], cal['drift'], cal['accuracy']
-            )
-            
-            # Limits
-            status = "PASS"
-            if p['crit_limit'] and mean > p['crit_limit']: status = "FAIL"
-            elif p['warn_limit'] and mean > p['warn_limit']: status = "WARN"
-            
-            # Save Result
-            self.db.conn.execute("""INSERT INTO results (project, param, mean, u_exp, min_trust, max_trust, status, timestamp, auditor, device_snap)
-                                    VALUES (?,?,?,?,?,?,?,?,?,?)""",
-                                    (proj, p['name'], mean, u_exp, mean-u_exp, mean+u_exp, status, datetime.datetime.now().strftime("%Y-%m-%d %H:%M"), self.username, cal['device']))
+            # Get Readings: (rows x params) snapshot of the grid model; the
+            # operator can keep editing while the job runs
+            try:
+                data = self.grid_model.converted()
+            except UnitError as e:
+                QMessageBox.warning(self, "Error", str(e))
+                return
+            params = list(self.grid_params)
+            mcm, screen, type_a = self.analysis_method(), self.analysis_screen(), self.cmb_type_a.currentData()
         
-        self.db.conn.commit()
+            # Screen + Calc (whole grid at once) + Save Results on a worker
+            def job(j):
+                j.progress(0, 1)
+                n = analyze_matrix(j.db, proj, params, data, self.username,
+                                   mcm=None if mcm is None else dict(mcm, progress=j.progress), screen=screen, type_a=type_a)
+                j.progress(1, 1)
+                return n
+            self.jobs.submit("Analysis", job, on_done=self.analysis_done, on_error=self.job_failed, on_progress=self.job_progress)
+
+    def analysis_method(self):
+        # None -> GUM formula; dict -> MonteCarlo.calculate_batch options
+        mcm = self.cmb_method.currentData()
+        return None if mcm is None else dict(mcm)
+
+    def analysis_screen(self):
+        # None -> no screening; dict -> Screening.config
+        m = self.cmb_screen.currentData()
+        return Screening.config(m and dict(method=m, exclude=self.chk_exclude.isChecked()))
+
+    def analysis_done(self, n):
         QMessageBox.information(self, "Done", "Analysis Complete")
         self.refresh_all()
         self.tabs.setCurrentIndex(3) # Go to results
 
+    def import_csv(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Import Readings", "", "CSV / Log Files (*.csv *.txt *.log);;All Files (*)")
+        if not path: return
+        proj = self.txt_proj_name.text() or os.path.splitext(os.path.basename(path))[0]
+        params = list(self.grid_params)
+        mcm, screen, type_a = self.analysis_method(), self.analysis_screen(), self.cmb_type_a.currentData()
+        
+        # Straight into the analysis engine, no grid cells involved
+        def job(j):
+            imp = CsvImporter(params, progress=j.progress).read(path)
+            j.check()
+            return len(imp['data']), analyze_matrix(j.db, proj, imp['params'], imp['data'], self.username,
+                                                    mcm=None if mcm is None else dict(mcm, progress=j.progress), screen=screen, type_a=type_a)
+        self.jobs.submit("Import", job, on_done=self.import_done, on_error=self.job_failed, on_progress=self.job_progress)
+
+    def import_done(self, res):
+        rows, n = res
+        QMessageBox.information(self, "Imported", f"{rows} rows imported, {n} parameters analysed.")
+        self.refresh_all()
+        self.tabs.setCurrentIndex(3)
+
     def load_results(self):
-        res = self.db.query("SELECT * FROM results ORDER BY id DESC", fetch=True)
-        self.tbl_res.setRowCount(len(res))
-        for i, r in enumerate(res):
-            self.tbl_res.setItem(i, 0, QTableWidgetItem(r['project']))
-            self.tbl_res.setItem(i, 1, QTableWidgetItem(r['param']))
-            self.tbl_res.setItem(i, 2, QTableWidgetItem(f"{r['mean']:.4f}"))
-            self.tbl_res.setItem(i, 3, QTableWidgetItem(f"± {r['u_exp']:.4f}"))
-            self.tbl_res.setItem(i, 4, QTableWidgetItem(f"{r['min_trust']:.4f}"))
-            self.tbl_res.setItem(i, 5, QTableWidgetItem(f"{r['max_trust']:.4f}"))
-            
-            st = QTableWidgetItem(r['status'])
-            if r['status'] == 'FAIL': st.setBackground(QColor("#fee2e2")); st.setForeground(QColor("#b91c1c"))
-            elif r['status'] == 'WARN': st.setBackground(QColor("#fef3c7")); st.setForeground(QColor("#b45309"))
-            else: st.setBackground(QColor("#dcfce7")); st.setForeground(QColor("#15803d"))
-            self.tbl_res.setItem(i, 6, st)
-            
-            self.tbl_res.setItem(i, 7, QTableWidgetItem(r['timestamp']))
+        with TRACE.span("MainWindow.load_results"):
+            # Only rows added since the last refresh are fetched
+            self.res_model.refresh_new()
+
+    def apply_results_filter(self):
+        dates = self.f_use_dates.isChecked()
+        self.res_model.set_filters(
+            project=self.f_proj.text().strip(), param=self.f_param.currentData(), status=self.f_status.currentData(),
+            date_from=self.f_from.date().toString("yyyy-MM-dd") if dates else None,
+            date_to=self.f_to.date().toString("yyyy-MM-dd") if dates else None
+        )
+
+    def load_trends(self):
+        with TRACE.span("MainWindow.load_trends"):
+            # Read from the daily rollups, never from results
+            dates = self.t_use_dates.isChecked()
+            rows = self.db.rollups.trend(
+                self.t_param.currentData(), self.t_proj.text().strip(),
+                self.t_from.date().toString("yyyy-MM-dd") if dates else None,
+                self.t_to.date().toString("yyyy-MM-dd") if dates else None, self.t_bucket.currentData()
+            ) if self.t_param.currentData() else []
+            self.tbl_trend.setRowCount(len(rows))
+            for i, r in enumerate(rows):
+                vals = [r['period'] or "All", str(r['n']), f"{r['mean']:.4f}", f"{r['stdev']:.4f}", f"{r['min']:.4f}", f"{r['max']:.4f}",
+                        f"{r['u_mean']:.4f}", f"{r['u_max']:.4f}" if r['u_max'] is not None else "", str(r['n_warn']), str(r['n_fail'])]
+                for c, v in enumerate(vals): self.tbl_trend.setItem(i, c, QTableWidgetItem(v))
+                if r['n_fail']: self.tbl_trend.item(i, 9).setForeground(QColor("#b91c1c"))
 
     def load_projects_list(self):
-        projs = self.db.query("SELECT * FROM projects", fetch=True)
-        self.tbl_proj.setRowCount(len(projs))
-        for i, p in enumerate(projs):
-            self.tbl_proj.setItem(i, 0, QTableWidgetItem(p['name']))
-            self.tbl_proj.setItem(i, 1, QTableWidgetItem(p['last_modified']))
-            btn = QPushButton("Load")
-            btn.clicked.connect(lambda ch, pid=p['id']: self.load_project_data(pid))
-            self.tbl_proj.setCellWidget(i, 2, btn)
+        with TRACE.span("MainWindow.load_projects_list"):
+            projs = self.db.query("SELECT * FROM projects", fetch=True)
+            self.tbl_proj.setRowCount(len(projs))
+            for i, p in enumerate(projs):
+                self.tbl_proj.setItem(i, 0, QTableWidgetItem(p['name']))
+                self.tbl_proj.setItem(i, 1, QTableWidgetItem(p['last_modified']))
+                btn = QPushButton("Load")
+                btn.clicked.connect(lambda ch, pid=p['id']: self.load_project_data(pid))
+                self.tbl_proj.setCellWidget(i, 2, btn)
 
     def save_current_project(self):
-        # Serialize Grid
-        data = {}
-        for c in range(self.grid.columnCount()):
-            col_vals = {}
-            for r in range(1, self.grid.rowCount()):
-                it = self.grid.item(r, c)
-                if it and it.text(): col_vals[r] = it.text()
-            if col_vals: data[c] = col_vals
-            
-        pid = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        name = self.txt_proj_name.text() or "Untitled"
-        js = json.dumps(data)
-        
-        self.db.conn.execute("INSERT OR REPLACE INTO projects (id, name, last_modified, data_json) VALUES (?,?,?,?)",
-                             (pid, name, datetime.datetime.now().strftime("%Y-%m-%d %H:%M"), js))
-        self.db.conn.commit()
-        QMessageBox.information(self, "Saved", "Project saved to history.")
-        self.refresh_all()
+        with TRACE.span("MainWindow.save_current_project"):
+            # Serialize Grid (typed columns + input units); saving a loaded
+            # project overwrites its row, which converts a legacy JSON grid
+            values, units = self.grid_model.snapshot()
+            name = self.txt_proj_name.text() or "Untitled"
+            self.project_id = save_project(self.db, name, values, self.grid_params, units, self.project_id)
+            QMessageBox.information(self, "Saved", "Project saved to history.")
+            self.refresh_all()
 
     def load_project_data(self, pid):
-        row = self.db.query("SELECT * FROM projects WHERE id=?", (pid,), fetch=True)
-        if not row: return
-        p = row[0]
+        with TRACE.span("MainWindow.load_project_data"):
+            self.setup_grid_cols() # Reset headers
+            n_cols = len(self.grid_params)
+            self.jobs.submit("Load Project", lambda j: read_project(j.db, pid, n_cols),
+                             on_done=self.project_loaded, on_error=self.job_failed)
+
+    def project_loaded(self, res):
+        p, grid = res
+        if not p: return
+        self.project_id = p['id']
         self.txt_proj_name.setText(p['name'])
-        data = json.loads(p['data_json'])
-        
-        self.grid.clearContents()
-        self.setup_grid_cols() # Reset headers
-        
-        for c_str, rows in data.items():
-            c = int(c_str)
-            if c < self.grid.columnCount():
-                for r_str, val in rows.items():
-                    r = int(r_str)
-                    self.grid.setItem(r, c, QTableWidgetItem(val))
-        
+        if isinstance(grid, ProjectBlob): self.grid_model.load_blob(grid)
+        else: self.grid_model.load(grid)
         self.tabs.setCurrentIndex(2) # Go to measure
 
     def new_project(self):
+        self.project_id = None
         self.txt_proj_name.clear()
-        self.grid.clearContents()
         self.setup_grid_cols()
+        self.grid_model.clear()
         self.tabs.setCurrentIndex(2)
 
     def export_pdf(self):
-        path, _ = QFileDialog.getSaveFileName(self, "Export Report", "Report.pdf", "PDF Files (*.pdf)")
-        if not path: return
-        
-        doc = SimpleDocTemplate(path, pagesize=A4)
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        elements.append(Paragraph(f"{APP_NAME} Report", styles['Title']))
-        elements.append(Paragraph(f"Generated by: {self.username} | Date: {datetime.datetime.now()}", styles['Normal']))
-        elements.append(Spacer(1, 20))
-        
-        data = [["Project", "Parameter", "Mean", "Uncertainty", "Status"]]
-        res = self.db.query("SELECT * FROM results", fetch=True)
-        for r in res:
-            data.append([r['project'], r['param'], f"{r['mean']:.3f}", f"{r['u_exp']:.3f}", r['status']])
-            
-        t = Table(data)
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.navy),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('GRID', (0,0), (-1,-1), 1, colors.black)
-        ]))
-        elements.append(t)
-        
-        # Sig
-        elements.append(Spacer(1, 40))
-        elements.append(Paragraph(COPYRIGHT_SIG, styles['Normal']))
-        
-        doc.build(elements)
-        QMessageBox.information(self, "Success", "PDF Report Generated")
+        with TRACE.span("MainWindow.export_pdf"):
+            path, _ = QFileDialog.getSaveFileName(self, "Export Report", "Report.pdf", "PDF Files (*.pdf)")
+            if not path: return
+            # Current Results tab filters, one section per project
+            filters = dict(self.res_model.filters)
+            self.jobs.submit("PDF Export", lambda j: ReportBuilder(j.db, filters, True, j.progress).build(path, self.username),
+                             on_done=lambda pages: QMessageBox.information(self, "Success", f"PDF Report Generated ({pages} pages)"),
+                             on_error=self.job_failed, on_progress=self.job_progress)
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["reanalyze"]:
+        from smartlab.cli import main
+        sys.exit(main(sys.argv[1:]))
     app = QApplication(sys.argv)
     app.setStyleSheet(STYLES)
     
@@ -0,0 +1,573 @@
+# SmartLab benchmarks.
+# Usage:
+#   python benchmarks.py [--scale small|full] [-k NAME] [--baseline FILE] [--save-baseline] [--threshold 0.25]
+#       timed suite on a synthetic lab database; compares against the JSON
+#       baseline (made on the same machine) and exits 1 on regressions
+#   python benchmarks.py throughput [rows]
+#       one-off throughput / before-after reports and the query-plan and CLI checks
+import os
+import sys
+import time
+import json
+import resource
+import sqlite3
+import asyncio
+import argparse
+import fnmatch
+import platform
+import threading
+import tempfile
+import numpy as np
+
+from smartlab import CsvImporter, Calculator, DataManager, MonteCarlo, Screening, UNITS, ProjectBlob, read_project, analyze_matrix
+from smartlab.reanalysis import reanalyze_projects
+from smartlab.report import ReportBuilder
+from smartlab.trace import TRACE
+from smartlab.db import results_where
+from smartlab.service import AnalysisService
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PARAMS = [
+    {'id': i + 1, 'name': n, 'unit': u, 'warn_limit': 0, 'crit_limit': 0}
+    for i, (n, u) in enumerate([("H2S", "ppb"), ("SO2", "ppb"), ("NO2", "ppb"), ("PM2.5", "ug/m3"), ("PM10", "ug/m3"),
+                                ("TVOC", "ppb"), ("CO", "ppm"), ("O3", "ppb"), ("Temperature", "C"), ("Humidity", "%")])
+]
+
+def write_csv(path, rows, params=PARAMS, seed=0):
+    rng = np.random.default_rng(seed)
+    header = ",".join(f"{p['name']} [{'ppm' if p['unit'] == 'ppb' else p['unit']}]" for p in params)
+    with open(path, 'w') as f:
+        f.write(header + "\n")
+        step = 200000
+        for start in range(0, rows, step):
+            block = rng.normal(50, 5, size=(min(step, rows - start), len(params)))
+            np.savetxt(f, block, delimiter=",", fmt="%.4f")
+
+def bench_csv_import(rows=1_000_000):
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "log.csv")
+        write_csv(path, rows)
+        size_mb = os.path.getsize(path) / 1e6
+
+        t = time.perf_counter()
+        imp = CsvImporter(PARAMS).read(path)
+        t_mmap = time.perf_counter() - t
+
+        t = time.perf_counter()
+        with open(path, newline='') as f:
+            CsvImporter(PARAMS).read_stream(f)
+        t_stream = time.perf_counter() - t
+
+        t = time.perf_counter()
+        Calculator.calculate_batch(imp['data'], 0.5, 2.0, 0.1, 0.1, 0.1)
+        t_calc = time.perf_counter() - t
+
+    print(f"csv import: {rows:,} rows x {len(PARAMS)} cols ({size_mb:.0f} MB)")
+    print(f"  mmap    {t_mmap:7.2f} s  {rows / t_mmap:12,.0f} rows/s")
+    print(f"  stream  {t_stream:7.2f} s  {rows / t_stream:12,.0f} rows/s")
+    print(f"  analyse {t_calc:7.2f} s  {rows / t_calc:12,.0f} rows/s")
+
+def result_rows(n):
+    return [("Bench", "SO2", 50.0 + i % 7, 1.2, 48.8, 51.2, "PASS", "2024-01-01 12:00", "bench", "dev", None, None, None, None, None, None) for i in range(n)]
+
+def bench_result_inserts(rows=100_000, legacy_rows=5_000):
+    with tempfile.TemporaryDirectory() as d:
+        # Before: default journal/sync, one INSERT + commit per result (legacy run_analysis path)
+        conn = sqlite3.connect(os.path.join(d, "before.db"))
+        conn.execute("CREATE TABLE results (id INTEGER PRIMARY KEY AUTOINCREMENT, project TEXT, param TEXT, mean REAL, u_exp REAL, "
+                     "min_trust REAL, max_trust REAL, status TEXT, timestamp TEXT, auditor TEXT, device_snap TEXT, cal_id INTEGER, "
+                     "screening TEXT, flagged TEXT, type_a TEXT, n_eff REAL, method TEXT)")
+        t = time.perf_counter()
+        for r in result_rows(legacy_rows):
+            conn.execute(DataManager.RESULT_INSERT, r)
+            conn.commit()
+        t_before = time.perf_counter() - t
+        conn.close()
+
+        # After: tuned DataManager, executemany inside one transaction
+        db = DataManager(os.path.join(d, "after.db"))
+        data = result_rows(rows)
+        t = time.perf_counter()
+        with db.transaction():
+            db.insert_results(data)
+        t_after = time.perf_counter() - t
+        db.conn.close()
+
+    print(f"result inserts:")
+    print(f"  before  {legacy_rows:>9,} rows {t_before:7.2f} s  {legacy_rows / t_before:12,.0f} rows/s")
+    print(f"  after   {rows:>9,} rows {t_after:7.2f} s  {rows / t_after:12,.0f} rows/s")
+
+HOT_QUERIES = [
+    ("active calibration", "SELECT * FROM calibrations WHERE param_id=? AND active=1", (2,)),
+    ("calibration history", "SELECT * FROM calibrations WHERE param_id=? ORDER BY valid_from DESC, id DESC", (2,)),
+    ("results by project", "SELECT * FROM results WHERE project=? ORDER BY id DESC LIMIT 200", ("P17",)),
+    ("results by param", "SELECT * FROM results WHERE param=? ORDER BY id DESC LIMIT 200", ("SO2",)),
+    ("results by date", "SELECT * FROM results WHERE timestamp >= ? ORDER BY timestamp LIMIT 200", ("2024-06-01",)),
+    ("latest results", "SELECT * FROM results ORDER BY id DESC LIMIT 200", ()),
+    ("project by name", "SELECT * FROM projects WHERE name=?", ("P17",)),
+]
+
+# Schema of a database from before the first migration (user_version 0)
+LEGACY_SCHEMA = [
+    "CREATE TABLE parameters (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, unit TEXT, warn_limit REAL, crit_limit REAL)",
+    """CREATE TABLE calibrations (id INTEGER PRIMARY KEY AUTOINCREMENT, param_id INTEGER, device TEXT, serial TEXT, date TEXT,
+                                 cert_unc REAL, k_factor REAL, resolution REAL, drift REAL, accuracy REAL, active INTEGER DEFAULT 0)""",
+    """CREATE TABLE results (id INTEGER PRIMARY KEY AUTOINCREMENT, project TEXT, param TEXT, mean REAL, u_exp REAL,
+                            min_trust REAL, max_trust REAL, status TEXT, timestamp TEXT, auditor TEXT, device_snap TEXT)""",
+    "CREATE TABLE projects (id TEXT PRIMARY KEY, name TEXT, last_modified TEXT, data_json TEXT)",
+]
+
+def legacy_db(path, rows, seed=0):
+    # Unindexed user_version 0 database: 10 params, 1000 calibrations (many active per
+    # param), rows results over 5000 projects, 5000 legacy JSON projects
+    rng = np.random.default_rng(seed)
+    params = [p['name'] for p in PARAMS]
+    conn = sqlite3.connect(path)
+    for sql in LEGACY_SCHEMA: conn.execute(sql)
+    conn.executemany("INSERT INTO parameters (name, unit, warn_limit, crit_limit) VALUES (?,?,0,0)",
+                     [(p['name'], p['unit']) for p in PARAMS])
+    conn.executemany("INSERT INTO calibrations (param_id, device, date, cert_unc, k_factor, resolution, drift, accuracy, active) "
+                     "VALUES (?,?,?,0.5,2,0.1,0.1,0.1,1)", [(i % 10 + 1, f"dev{i}", f"2024-01-{i % 28 + 1:02d}") for i in range(1000)])
+    conn.executemany("INSERT INTO results (project, param, mean, u_exp, min_trust, max_trust, status, timestamp, auditor, device_snap) "
+                     "VALUES (?,?,?,1.0,?,?,'PASS',?,'bench','dev')",
+                     ((f"P{i % 5000}", params[i % 10], m, m - 1, m + 1, f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d} 12:00")
+                      for i, m in enumerate(rng.normal(50, 5, rows).tolist())))
+    conn.executemany("INSERT INTO projects (id, name, last_modified, data_json) VALUES (?,?,?,'{}')",
+                     [(str(i), f"P{i}", "2024-01-01") for i in range(5000)])
+    conn.commit()
+    conn.close()
+
+def query_plan(conn, sql, args=()):
+    return " | ".join(r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, args))
+
+def bench_query_plans(rows=1_000_000):
+    # Builds a legacy (unindexed, user_version 0) database, migrates it in place,
+    # then checks the plan of every hot query and times it.
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "plans.db")
+        legacy_db(path, rows)
+
+        t = time.perf_counter()
+        db = DataManager(path) # opens -> migrates
+        t_mig = time.perf_counter() - t
+        version = db.conn.execute("PRAGMA user_version").fetchone()[0]
+        active = db.conn.execute("SELECT COUNT(*) FROM calibrations WHERE active=1").fetchone()[0]
+        print(f"query plans: {rows:,} results, migration to v{version} {t_mig:.2f} s, {active} active calibrations")
+
+        ok = True
+        for label, sql, args in HOT_QUERIES:
+            plan = query_plan(db.conn, sql, args)
+            t = time.perf_counter()
+            for _ in range(20): db.conn.execute(sql, args).fetchall()
+            ms = (time.perf_counter() - t) / 20 * 1000
+            # filtered queries must SEARCH an index; nothing may sort in a temp b-tree
+            indexed = "TEMP B-TREE" not in plan and ("WHERE" not in sql or plan.startswith("SEARCH"))
+            ok &= indexed
+            print(f"  {'ok  ' if indexed else 'SCAN'} {label:20s} {ms:8.3f} ms  {plan}")
+        db.conn.close()
+    return ok
+
+def make_projects_db(path, projects, rows=50, seed=0):
+    # Default parameters, one active calibration each, `projects` saved grids
+    db = DataManager(path)
+    rng = np.random.default_rng(seed)
+    with db.transaction():
+        db.executemany("INSERT INTO calibrations (param_id, device, serial, date, cert_unc, k_factor, resolution, drift, accuracy, active) "
+                       "VALUES (?,?,'SN','2024-01-01',0.5,2,0.1,0.1,0.1,1)", [(p['id'], f"dev{p['id']}") for p in db.calibs.params()])
+        n_cols = len(db.calibs.params())
+        for start in range(0, projects, 1000):
+            batch = []
+            for i in range(start, min(start + 1000, projects)):
+                grid = rng.normal(50, 5, (rows, n_cols)).round(3).tolist()
+                data = {c: {r + 1: str(grid[r][c]) for r in range(rows)} for c in range(n_cols)}
+                batch.append((f"{i:08d}", f"Site {i % 500}", "2024-01-01 00:00", json.dumps(data)))
+            db.executemany("INSERT INTO projects (id, name, last_modified, data_json) VALUES (?,?,?,?)", batch)
+    db.calibs.invalidate()
+    db.conn.close()
+
+def bench_reanalysis(projects=50_000, workers=None):
+    workers = workers or [1, os.cpu_count() or 1]
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "reanalysis.db")
+        make_projects_db(path, projects)
+        print(f"re-analysis: {projects:,} projects x 10 params x 50 rows")
+        base = None
+        for w in sorted(set(workers)):
+            t = time.perf_counter()
+            done, written = reanalyze_projects(path, workers=w)
+            secs = time.perf_counter() - t
+            base = base or secs
+            print(f"  {w:3d} workers {secs:7.2f} s  {done / secs:10,.0f} projects/s  speedup {base / secs:4.1f}x  ({written:,} results)")
+
+def bench_pdf_report(rows=500_000, projects=200):
+    with tempfile.TemporaryDirectory() as d:
+        db = DataManager(os.path.join(d, "report.db"))
+        rng = np.random.default_rng(0)
+        params = [p['name'] for p in PARAMS]
+        with db.transaction():
+            db.insert_results((f"Site {i % projects}", params[i % 10], float(m), 1.0, m - 1, m + 1, "PASS",
+                               "2024-01-01 12:00", "bench", "dev", None, None, None, None, None, None) for i, m in enumerate(rng.normal(50, 5, rows).tolist()))
+        rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        t = time.perf_counter()
+        pages = ReportBuilder(db, by_project=True).build(os.path.join(d, "report.pdf"), "bench")
+        secs = time.perf_counter() - t
+        rss1 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        size_mb = os.path.getsize(os.path.join(d, "report.pdf")) / 1e6
+        db.conn.close()
+    print(f"pdf report: {rows:,} results, {pages:,} pages ({size_mb:.0f} MB)")
+    print(f"  {secs:7.2f} s  {pages / secs:8,.1f} pages/s  {rows / secs:10,.0f} rows/s  peak RSS {rss1:.0f} MB (before build {rss0:.0f} MB)")
+
+def bench_monte_carlo(samples=MonteCarlo.SAMPLES, rows=60, workers=None):
+    # One 10-parameter project through GUM-S1: time, peak memory, and how far
+    # the shortest 95 % interval lands from the GUM +/- U
+    rng = np.random.default_rng(0)
+    data = rng.normal(50, 5, size=(rows, len(PARAMS)))
+    cal = dict(cert_unc=0.5, k=2, res=0.01, drift=0.1, acc=0.2)
+    workers = workers or [1, os.cpu_count() or 1]
+    gum = Calculator.calculate_batch(data, **cal)
+    print(f"monte carlo: {len(PARAMS)} params x {samples:,} trials")
+    for w in sorted(set(workers)):
+        rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        t = time.perf_counter()
+        mcm = MonteCarlo.calculate_batch(data, **cal, samples=samples, seed=1, workers=w)
+        secs = time.perf_counter() - t
+        rss1 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        diff = np.abs(mcm['u_exp'] - gum['u_exp']).max()
+        print(f"  {w:3d} workers {secs:7.2f} s  {len(PARAMS) * samples / secs:12,.0f} trials/s  "
+              f"peak RSS +{rss1 - rss0:.0f} MB  max |U_mcm - U_gum| {diff:.4f}")
+
+def bench_trace_overhead(queries=50_000):
+    # Cost of the DataManager.query hooks with the tracer off / on
+    with tempfile.TemporaryDirectory() as d:
+        db = DataManager(os.path.join(d, "trace.db"))
+        sql = "SELECT id, name FROM parameters WHERE id = ?"
+        times = {}
+        for on in (False, True, False):
+            TRACE.enable(on)
+            t = time.perf_counter()
+            for i in range(queries): db.query(sql, (i % 10 + 1,), fetch=True)
+            times[on] = time.perf_counter() - t
+        TRACE.enable(False); TRACE.clear()
+        db.conn.close()
+    print(f"trace overhead: {queries:,} queries  off {times[False] / queries * 1e6:.2f} us/query  "
+          f"on {times[True] / queries * 1e6:.2f} us/query")
+
+def bench_service(requests=2000, concurrency=64, sets=50, readings=30, save=True):
+    # Local load test: keep-alive clients hammer POST /analyze on a live server
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "service.db")
+        make_projects_db(path, 0)
+        service = AnalysisService(path)
+        started, stop = threading.Event(), {}
+
+        async def serve():
+            server = await service.start("127.0.0.1", 0)
+            stop['port'] = server.sockets[0].getsockname()[1]
+            stop['loop'], stop['event'] = asyncio.get_running_loop(), asyncio.Event()
+            started.set()
+            async with server: await stop['event'].wait()
+        thread = threading.Thread(target=asyncio.run, args=(serve(),))
+        thread.start()
+        started.wait()
+        port = stop['port']
+
+        rng = np.random.default_rng(0)
+        names = [p['name'] for p in PARAMS]
+        body = json.dumps({'project': "Load", 'save': save, 'sets': [
+            {'param': names[i % 10], 'readings': rng.normal(50, 5, readings).round(3).tolist()} for i in range(sets)]}).encode()
+        req = (f"POST /analyze HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+               f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+        latencies, errors = [], 0
+
+        async def client(n):
+            nonlocal errors
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            for _ in range(n):
+                t = time.perf_counter()
+                writer.write(req)
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+                await reader.readexactly(length)
+                latencies.append(time.perf_counter() - t)
+                errors += not head.startswith(b"HTTP/1.1 200")
+            writer.close()
+
+        async def run():
+            per = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+            await asyncio.gather(*(client(n) for n in per if n))
+
+        t = time.perf_counter()
+        asyncio.run(run())
+        secs = time.perf_counter() - t
+        stop['loop'].call_soon_threadsafe(stop['event'].set)
+        thread.join()
+        service.close()
+        saved = DataManager(path).conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    lat = np.sort(latencies) * 1000
+    print(f"service: {requests:,} POST /analyze x {sets} sets x {readings} readings, {concurrency} connections, {service.workers} workers")
+    print(f"  {secs:7.2f} s  {requests / secs:8,.0f} req/s  {requests * sets / secs:10,.0f} sets/s  "
+          f"p50 {lat[len(lat) // 2]:.1f} ms  p99 {lat[int(len(lat) * 0.99)]:.1f} ms  errors {errors}  saved {saved:,}")
+    return errors == 0
+
+# ==================== SUITE ====================
+# Synthetic lab generator + timed core operations. Sizes come from SCALES and
+# every random draw is seeded, so two runs on one machine do the same work.
+SCALES = {
+    'small': dict(params=10, cal_history=20, results=100_000, projects=100, grid_rows=2_000),
+    'full': dict(params=20, cal_history=200, results=1_000_000, projects=500, grid_rows=10_000),
+}
+BASELINE = os.path.join(HERE, "benchmarks_baseline.json")
+UNIT_CYCLE = ["ppb", "ppm", "ug/m3", "mg/m3", "C", "%"]
+
+def make_lab_db(path, params=10, cal_history=20, results=100_000, projects=100, grid_rows=2_000, seed=0):
+    # N parameters, M calibrations per parameter (newest active), K results,
+    # P projects saved as ProjectBlob grids of grid_rows x N readings
+    db = DataManager(path)
+    rng = np.random.default_rng(seed)
+    with db.transaction():
+        db.conn.execute("DELETE FROM parameters WHERE id > ?", (params,))
+        db.executemany("INSERT INTO parameters (name, unit, warn_limit, crit_limit) VALUES (?,?,60,80)",
+                       [(f"P{i + 1}", UNIT_CYCLE[i % len(UNIT_CYCLE)]) for i in range(len(db.calibs.params()), params)])
+        db.calibs.invalidate()
+        plist = db.calibs.params()
+        db.executemany("INSERT INTO calibrations (param_id, device, serial, date, cert_unc, k_factor, resolution, drift, accuracy, active) "
+                       "VALUES (?,?,?,?,?,2,?,?,?,?)",
+                       [(p['id'], f"dev{p['id']}-{h}", f"SN{h}", f"{2000 + h // 12:04d}-{h % 12 + 1:02d}-01",
+                         float(rng.uniform(0.1, 1)), 0.01, 0.1, 0.2, int(h == cal_history - 1))
+                        for p in plist for h in range(cal_history)])
+        names = [p['name'] for p in plist]
+        for start in range(0, results, 100_000):
+            m = rng.normal(50, 5, min(100_000, results - start)).tolist()
+            db.insert_results((f"Site {i % projects}", names[i % len(names)], v, 1.0, v - 1, v + 1,
+                               "PASS" if v < 60 else "WARN", f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d} 12:00", "bench", "dev", None, None, None, None, None, None)
+                              for i, v in enumerate(m, start))
+        # A handful of distinct grids, reused: generation stays fast, storage is realistic
+        blobs = []
+        for _ in range(min(projects, 4)):
+            grid = rng.normal(50, 5, (grid_rows, len(plist))).round(3)
+            grid[rng.random(grid.shape) < 0.02] = np.nan
+            blobs.append(ProjectBlob.encode(grid, plist, [p['unit'] for p in plist]))
+        db.executemany("INSERT INTO projects (id, name, last_modified, data_json, data_blob) VALUES (?,?,'2024-01-01 00:00',NULL,?)",
+                       [(f"{i:08d}", f"Site {i}", blobs[i % len(blobs)]) for i in range(projects)])
+    db.calibs.invalidate()
+    return db
+
+CASES = []
+
+def case(name, repeat=5):
+    # fn(ctx) does the setup and returns (timed callable, operations per call)
+    def deco(fn):
+        CASES.append((name, repeat, fn))
+        return fn
+    return deco
+
+@case("calc.calculate")
+def _calc_calculate(ctx):
+    readings = ctx['rng'].normal(50, 5, 1000).tolist()
+    return lambda: [Calculator.calculate(readings, 0.5, 2, 0.01, 0.1, 0.2) for _ in range(200)], 200
+
+@case("calc.calculate_batch")
+def _calc_batch(ctx):
+    data = ctx['rng'].normal(50, 5, (ctx['grid_rows'] * 10, ctx['params']))
+    return lambda: Calculator.calculate_batch(data, 0.5, 2, 0.01, 0.1, 0.2), data.size
+
+@case("calc.screen")
+def _calc_screen(ctx):
+    # All three screening methods over one grid, every column at once
+    data = ctx['rng'].normal(50, 5, (ctx['grid_rows'] * 10, ctx['params']))
+    data[ctx['rng'].random(data.shape) < 0.02] = np.nan
+    cfgs = [Screening.config(m) for m in Screening.METHODS]
+    return lambda: [Screening.screen(data, c) for c in cfgs], data.size * len(cfgs)
+
+@case("calc.type_a")
+def _calc_type_a(ctx):
+    # Autocorrelated 1 Hz logs of mixed length (AR(1), phi = 0.9), both time-series Type A modes
+    rng = ctx['rng']
+    n = rng.integers(3600, 86_400, 40)
+    e = rng.normal(0, 1, int(n.sum()))
+    x = e.tolist()
+    for i in range(1, len(x)): x[i] += 0.9 * x[i - 1]
+    x = np.array(x)
+    offsets = np.concatenate([[0], np.cumsum(n)])
+    return lambda: [Calculator.calculate_batch(x, 0.5, 2, 0.01, 0.1, 0.2, offsets, m) for m in ("acf", "bootstrap")], 2 * x.size
+
+@case("calc.convert_scalar")
+def _convert_scalar(ctx):
+    pairs = [("ppm", "ppb"), ("ppb", "ppm"), ("mg/m3", "ug/m3"), ("C", "F"), ("K", "C")]
+    return lambda: [Calculator.convert(float(i), *pairs[i % 5]) for i in range(20_000)], 20_000
+
+@case("calc.convert_array")
+def _convert_array(ctx):
+    x = ctx['rng'].normal(50, 5, 1_000_000)
+    return lambda: UNITS.convert(x, "F", "K"), x.size
+
+@case("db.insert_results")
+def _insert_results(ctx):
+    db = DataManager(os.path.join(ctx['dir'], "inserts.db"))
+    rows = result_rows(20_000)
+    def run():
+        with db.transaction(): db.insert_results(rows)
+    return run, len(rows)
+
+@case("db.calibration_lookup")
+def _calibration_lookup(ctx):
+    db = ctx['db']
+    def run():
+        for _ in range(50):
+            db.calibs.invalidate()
+            for p in db.calibs.params(): db.calibs.active(p['id'])
+    return run, 50
+
+@case("db.calibration_history")
+def _calibration_history(ctx):
+    db, ids = ctx['db'], [p['id'] for p in ctx['db'].calibs.params()]
+    return lambda: [db.query("SELECT * FROM calibrations WHERE param_id=? ORDER BY valid_from DESC, id DESC", (i,), fetch=True) for i in ids], len(ids)
+
+@case("db.results_filtered")
+def _results_filtered(ctx):
+    db = ctx['db']
+    where, args = results_where({'param': "SO2", 'date_from': "2024-03-01", 'date_to': "2024-09-30"})
+    return lambda: db.query(f"SELECT * FROM results{where} ORDER BY id DESC LIMIT 500", args, fetch=True), 1
+
+@case("db.trend_monthly")
+def _trend_monthly(ctx):
+    # Monthly SO2 trend over the whole history, all sites and one site, from the rollups
+    db = ctx['db']
+    return lambda: (db.rollups.trend("SO2", bucket="month"), db.rollups.trend("SO2", "Site 3", bucket="month")), 2
+
+@case("analysis.rerun_memoized")
+def _rerun_memoized(ctx):
+    # Run Analysis again on an unchanged grid: every column is a cache hit
+    db, params = ctx['db'], ctx['db'].calibs.params()
+    data = ctx['rng'].normal(50, 5, (ctx['grid_rows'], len(params)))
+    analyze_matrix(db, "Memo", params, data, "bench")
+    return lambda: analyze_matrix(db, "Memo", params, data, "bench"), data.size
+
+@case("project.save")
+def _project_save(ctx):
+    db, params = ctx['db'], ctx['db'].calibs.params()
+    grid = ctx['rng'].normal(50, 5, (ctx['grid_rows'], len(params))).round(3)
+    units = [p['unit'] for p in params]
+    def run():
+        db.query("INSERT OR REPLACE INTO projects (id, name, last_modified, data_json, data_blob) VALUES ('bench','Bench','2024-01-01',NULL,?)",
+                 (ProjectBlob.encode(grid, params, units),))
+    return run, grid.size
+
+@case("project.load")
+def _project_load(ctx):
+    db, params = ctx['db'], ctx['db'].calibs.params()
+    def run():
+        p, blob = read_project(db, "00000001", len(params))
+        return blob.matrix(params)
+    return run, ctx['grid_rows'] * len(params)
+
+@case("qt.results_load")
+def _results_load(ctx):
+    from Main import ResultsModel
+    qt_app()
+    def run():
+        m = ResultsModel(ctx['db'])
+        for _ in range(9): m.fetchMore()
+        return m.rowCount()
+    return run, 10 * ResultsModel.PAGE
+
+@case("qt.grid_load")
+def _grid_load(ctx):
+    from Main import MeasurementModel
+    qt_app()
+    db, params = ctx['db'], ctx['db'].calibs.params()
+    blob = read_project(db, "00000001", len(params))[1]
+    def run():
+        m = MeasurementModel()
+        m.set_params(params)
+        m.load_blob(blob)
+        return m.converted()
+    return run, ctx['grid_rows'] * len(params)
+
+@case("report.pdf", repeat=1)
+def _report_pdf(ctx):
+    from smartlab.report import ReportBuilder
+    out = os.path.join(ctx['dir'], "report.pdf")
+    return lambda: ReportBuilder(ctx['db'], {'param': "SO2"}, by_project=True).build(out, "bench"), ctx['results'] // ctx['params']
+
+def qt_app():
+    # Headless: no display needed on a plain Linux box
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+def run_suite(scale="small", pattern="*"):
+    sizes = SCALES[scale]
+    results = {}
+    with tempfile.TemporaryDirectory() as d:
+        t = time.perf_counter()
+        db = make_lab_db(os.path.join(d, "lab.db"), **sizes)
+        print(f"suite [{scale}]: {', '.join(f'{k}={v:,}' for k, v in sizes.items())}  (generated in {time.perf_counter() - t:.1f} s)")
+        for name, repeat, fn in CASES:
+            if not fnmatch.fnmatch(name, pattern): continue
+            ctx = dict(sizes, db=db, dir=d, rng=np.random.default_rng(1))
+            run, ops = fn(ctx)
+            run() # warm-up: caches, imports, first page of the DB
+            best = min(_timed(run) for _ in range(repeat))
+            results[name] = {'s': best, 'ops': ops}
+            print(f"  {name:24s} {best * 1000:10.2f} ms  {ops / best:14,.0f} ops/s")
+        db.conn.close()
+    return results
+
+def _timed(fn):
+    t = time.perf_counter()
+    fn()
+    return time.perf_counter() - t
+
+def compare(results, baseline, threshold):
+    # -> names slower than baseline by more than threshold (0.25 = 25 %)
+    regressed = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base: continue
+        ratio = r['s'] / base['s']
+        bad = ratio > 1 + threshold
+        if bad: regressed.append(name)
+        print(f"  {'SLOWER' if bad else 'ok    '} {name:24s} {ratio:6.2f}x  ({base['s'] * 1000:.2f} -> {r['s'] * 1000:.2f} ms)")
+    return regressed
+
+def throughput(rows):
+    bench_csv_import(rows)
+    bench_result_inserts()
+    bench_reanalysis()
+    bench_pdf_report()
+    bench_monte_carlo()
+    bench_trace_overhead()
+    ok = bench_service()
+    return bench_query_plans() and ok
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="SmartLab benchmarks")
+    ap.add_argument("mode", nargs="?", default="suite", choices=["suite", "throughput"])
+    ap.add_argument("rows", nargs="?", type=int, default=1_000_000, help="throughput: CSV rows")
+    ap.add_argument("--scale", default="small", choices=list(SCALES))
+    ap.add_argument("-k", dest="pattern", default="*", help="only cases matching this glob, e.g. 'db.*'")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before a case counts as a regression")
+    args = ap.parse_args()
+    
+    if args.mode == "throughput":
+        sys.exit(0 if throughput(args.rows) else 1)
+    
+    results = run_suite(args.scale, args.pattern)
+    stored = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f: stored = json.load(f)
+    if args.save_baseline:
+        prev = stored.get(args.scale, {}).get('cases', {})
+        stored[args.scale] = {'machine': f"{platform.node()} {platform.machine()} {platform.python_version()} numpy {np.__version__}",
+                              'cases': {**prev, **results}}
+        with open(args.baseline, "w") as f: json.dump(stored, f, indent=1, sort_keys=True)
+        print(f"baseline [{args.scale}] saved to {args.baseline}")
+    elif args.scale in stored:
+        print(f"vs baseline [{args.scale}] ({stored[args.scale]['machine']}), threshold {args.threshold:.0%}:")
+        if compare(results, stored[args.scale]['cases'], args.threshold): sys.exit(1)
+    else:
+        print(f"no [{args.scale}] baseline in {args.baseline}; run with --save-baseline to create one")
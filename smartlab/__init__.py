@@ -0,0 +1,19 @@
+# SmartLab headless core: database, calculations, import and project storage.
+# Nothing imported here pulls in Qt or reportlab (PDF output is smartlab.report),
+# so scripts and the CLI start fast and need no display.
+from .config import APP_NAME, ver_str
+from .db import DataManager, CalibrationRepository, CalibrationHistory, results_where
+from .units import UNITS, UnitError, UnitRegistry
+from .calc import Calculator, RunningStats
+from .montecarlo import MonteCarlo
+from .trace import TRACE, Tracer
+from .memo import AnalysisCache
+from .readings import ReadingStore
+from .rollups import Rollups
+from .importer import CsvImporter
+from .screening import Screening
+from .autocorr import Autocorrelation
+from .analysis import active_columns, column_readings, screen_columns, result_rows, analyze_matrix, analyze_sets
+from .projects import ProjectBlob, parse_grid, project_matrix, read_project, save_project
+
+__version__ = ver_str
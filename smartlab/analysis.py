@@ -0,0 +1,163 @@
+import json
+import datetime
+import numpy as np
+
+from .calc import Calculator
+from .units import UNITS, UnitError
+from .montecarlo import MonteCarlo
+from .trace import TRACE
+from .memo import AnalysisCache
+from .screening import Screening
+from .autocorr import Autocorrelation
+
+# ==================== ANALYSIS ====================
+def active_columns(db, params):
+    # [(column index, param, active calibration)] for params that have one
+    cols = []
+    for j, p in enumerate(params):
+        cal = db.calibs.active(p['id'])
+        if cal: cols.append((j, p, cal))
+    return cols
+
+def column_readings(cols, data):
+    # The valid readings of each non-empty column: one per row of result_rows
+    out = []
+    for j, _, _ in cols:
+        x = data[:, j]
+        x = x[~np.isnan(x)]
+        if len(x): out.append(x)
+    return out
+
+def screen_columns(cols, data, screen):
+    # screen: Screening.config() dict or None.
+    # -> (data for the calculation, {column index: flagged readings}); with
+    # exclude the flagged cells are NaN in a copy, otherwise data is unchanged
+    if not screen or not cols: return data, {}
+    idx = [j for j, _, _ in cols]
+    with TRACE.span("Screening.screen", "calc"):
+        flags = Screening.screen(data[:, idx], screen)
+    flagged = {j: data[flags[:, i], j] for i, j in enumerate(idx) if flags[:, i].any()}
+    if screen['exclude'] and flagged:
+        data = data.copy()
+        for i, j in enumerate(idx): data[flags[:, i], j] = np.nan
+    return data, flagged
+
+def result_rows(project, cols, data, auditor, ts=None, mcm=None, screen=None, flagged=None, type_a=None):
+    # data: (rows x params) converted readings, NaN for empty cells.
+    # Computes every column in one batch -> rows for DataManager.insert_results
+    # mcm: None for the GUM law of propagation, or MonteCarlo.calculate_batch
+    # keyword arguments ({} for defaults); min/max trust then hold the
+    # shortest coverage interval, which need not be symmetric.
+    # screen / flagged: as used and returned by screen_columns, recorded per row.
+    # type_a: Autocorrelation.mode() for time-ordered logs; rows record it and n_eff.
+    args = (
+        data[:, [j for j, _, _ in cols]],
+        [cal['cert_unc'] for _, _, cal in cols], [cal['k_factor'] for _, _, cal in cols],
+        [cal['resolution'] for _, _, cal in cols], [cal['drift'] for _, _, cal in cols],
+        [cal['accuracy'] for _, _, cal in cols]
+    )
+    with TRACE.span("Calculator.calculate_batch" if mcm is None else "MonteCarlo.calculate_batch", "calc"):
+        res = (Calculator.calculate_batch(*args, type_a=type_a) if mcm is None
+               else MonteCarlo.calculate_batch(*args, type_a=type_a, **mcm))
+    
+    ts = ts or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    label, flagged, method = Screening.label(screen), flagged or {}, MonteCarlo.label(mcm)
+    rows = []
+    for i, (j, p, cal) in enumerate(cols):
+        if not res['n'][i]: continue
+        mean, u_exp = float(res['mean'][i]), float(res['u_exp'][i])
+        low, high = (mean-u_exp, mean+u_exp) if mcm is None else (float(res['low'][i]), float(res['high'][i]))
+        status = Calculator.status(mean, p['warn_limit'], p['crit_limit'])
+        rows.append((project, p['name'], mean, u_exp, low, high, status, ts, auditor, cal['device'], cal['id'],
+                     label, label and json.dumps(flagged[j].tolist() if j in flagged else []),
+                     type_a, type_a and float(res['n_eff'][i]), method))
+    return rows
+
+def analyze_matrix(db, project, params, data, auditor, mcm=None, screen=None, type_a=None):
+    # Columns whose content key is already cached keep their stored result;
+    # only new or edited columns are screened, computed and inserted.
+    cols = active_columns(db, params)
+    keys = {}
+    if AnalysisCache.cacheable(mcm):
+        for j, p, cal in cols:
+            x = data[:, j]
+            keys[j] = AnalysisCache.key(project, p, cal, x[~np.isnan(x)], mcm, screen, type_a)
+    hits = db.memo.get(list(keys.values())) if keys else {}
+    todo = [c for c in cols if keys.get(c[0]) not in hits]
+    used, flagged = screen_columns(todo, data, screen)
+    rows = result_rows(project, todo, used, auditor, mcm=mcm, screen=screen, flagged=flagged, type_a=type_a)
+    
+    # One statement, one commit (or part of the caller's transaction)
+    with db.transaction():
+        ids = db.insert_results(rows, column_readings(todo, used))
+        if keys and rows:
+            done = [c for c in todo if (~np.isnan(used[:, c[0]])).any()] # result_rows skips empty columns
+            db.memo.put({keys[j]: {'param_id': p['id'], 'result_id': ids[i],
+                                   'mean': r[2], 'u_exp': r[3], 'min_trust': r[4], 'max_trust': r[5], 'status': r[6]}
+                         for i, ((j, p, _), r) in enumerate(zip(done, rows))})
+    return len(rows) + len(cols) - len(todo)
+
+def analyze_sets(db, project, sets, auditor, ts=None, mcm=None, screen=None, type_a=None):
+    # sets: [{'param': name or id, 'readings': [...], 'unit': input unit (optional),
+    #         'project': overrides project (optional)}]
+    # screen: Screening.config() dict or None; each result then lists its flagged readings.
+    # type_a: Autocorrelation.mode(); readings are then taken in time order and
+    # each result reports n_eff.
+    # Ragged readings go through one calculate_batch call. A bad set gets an
+    # 'error' entry instead of failing the others.
+    # -> (one result dict per set, rows for DataManager.insert_results, their readings)
+    params = db.calibs.params()
+    by_key = {**{p['id']: p for p in params}, **{p['name']: p for p in params}}
+    out, chunks, cols = [None] * len(sets), [], []
+    for i, s in enumerate(sets):
+        key = s.get('param') if isinstance(s, dict) else None
+        p = by_key.get(key)
+        cal = p and db.calibs.active(p['id'])
+        if not p: out[i] = {'param': key, 'error': "unknown parameter"}; continue
+        if not cal: out[i] = {'param': p['name'], 'error': "no active calibration"}; continue
+        try:
+            x = np.asarray(s.get('readings') or [], dtype=float).ravel()
+            if s.get('unit') and s['unit'] != p['unit']: x = UNITS.convert(x, s['unit'], p['unit'])
+        except (TypeError, ValueError, UnitError) as e:
+            out[i] = {'param': p['name'], 'error': str(e)}; continue
+        chunks.append(x[~np.isnan(x)])
+        cols.append((i, p, cal))
+    if not cols: return out, [], []
+    
+    offsets = np.concatenate([[0], np.cumsum([len(x) for x in chunks])])
+    flagged = [np.empty(0)] * len(chunks)
+    if screen:
+        # All sets screened in one pass over the ragged layout
+        with TRACE.span("Screening.screen", "calc"):
+            flags = Screening.screen_flat(np.concatenate(chunks), offsets, screen)
+        for c in np.unique(np.searchsorted(offsets, np.flatnonzero(flags), side='right') - 1):
+            f = flags[offsets[c]:offsets[c + 1]]
+            flagged[c] = chunks[c][f]
+            if screen['exclude']: chunks[c] = chunks[c][~f]
+        offsets = np.concatenate([[0], np.cumsum([len(x) for x in chunks])])
+    args = (
+        np.concatenate(chunks),
+        [cal['cert_unc'] for _, _, cal in cols], [cal['k_factor'] for _, _, cal in cols],
+        [cal['resolution'] for _, _, cal in cols], [cal['drift'] for _, _, cal in cols],
+        [cal['accuracy'] for _, _, cal in cols]
+    )
+    with TRACE.span("Calculator.calculate_batch" if mcm is None else "MonteCarlo.calculate_batch", "calc"):
+        res = (Calculator.calculate_batch(*args, offsets=offsets, type_a=type_a) if mcm is None
+               else MonteCarlo.calculate_batch(*args, offsets=offsets, type_a=type_a, **mcm))
+    
+    ts = ts or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    label, method = Screening.label(screen), MonteCarlo.label(mcm)
+    rows, readings = [], []
+    for c, (i, p, cal) in enumerate(cols):
+        n = int(res['n'][c])
+        if not n: out[i] = {'param': p['name'], 'n': 0, 'error': "no readings"}; continue
+        mean, u_exp = float(res['mean'][c]), float(res['u_exp'][c])
+        low, high = (mean-u_exp, mean+u_exp) if mcm is None else (float(res['low'][c]), float(res['high'][c]))
+        status = Calculator.status(mean, p['warn_limit'], p['crit_limit'])
+        out[i] = {'param': p['name'], 'n': n, 'mean': mean, 'u_exp': u_exp, 'min_trust': low, 'max_trust': high, 'status': status}
+        if label: out[i]['flagged'] = flagged[c].tolist()
+        if type_a: out[i]['n_eff'] = float(res['n_eff'][c])
+        rows.append((sets[i].get('project') or project, p['name'], mean, u_exp, low, high, status, ts, auditor, cal['device'], cal['id'],
+                     label, label and json.dumps(flagged[c].tolist()), type_a, type_a and float(res['n_eff'][c]), method))
+        readings.append(chunks[c])
+    return out, rows, readings
@@ -0,0 +1,105 @@
+import math
+import numpy as np
+
+# ==================== AUTOCORRELATED TYPE A ====================
+# Continuous-analyzer logs (1 Hz and up) are strongly autocorrelated, so
+# s / sqrt(n) understates the uncertainty of their mean. Both estimators give
+# an effective number of independent readings n_eff (1 <= n_eff <= n) and
+# u_A = s / sqrt(n_eff):
+#   acf        n / tau, tau = 1 + 2 sum(rho_k), with rho from the FFT
+#              autocovariance (O(n log n)), summed over Geyer's initial
+#              positive sequence so noise in the tail is not added up
+#   bootstrap  moving-block bootstrap of the mean; block sums come from a
+#              prefix sum, so each replicate costs n / block, not n
+# Columns are ragged segments of one flat array (offsets, as in
+# Calculator.calculate_batch). Segments with the same FFT size are
+# transformed together as one 2-D rfft.
+class Autocorrelation:
+    MODES = ('iid', 'acf', 'bootstrap')
+    FFT_CELLS = 1 << 24    # padded cells per batched rfft (~256 MB of complex128)
+    REPLICATES = 1000
+    SEED = 0               # bootstrap results are reproducible by default
+
+    @classmethod
+    def mode(cls, type_a):
+        # None / 'iid' -> None (independent readings), else the validated mode; ValueError if unknown
+        if not type_a or type_a == 'iid': return None
+        if type_a not in cls.MODES: raise ValueError(f"type A mode must be one of {', '.join(cls.MODES)}")
+        return type_a
+
+    @classmethod
+    def effective_n(cls, vals, offsets, mode='acf', **kw):
+        # -> n_eff per segment (float array); 'iid' gives n
+        vals = np.asarray(vals, dtype=float)
+        offsets = np.asarray(offsets, dtype=np.intp)
+        if mode == 'iid': return np.diff(offsets).astype(float)
+        if mode == 'acf': return cls.acf_n(vals, offsets)
+        if mode == 'bootstrap': return cls.bootstrap_n(vals, offsets, **kw)
+        raise ValueError(f"type A mode must be one of {', '.join(cls.MODES)}")
+
+    @classmethod
+    def acf(cls, vals, offsets):
+        # -> {segment: autocorrelation rho_0..rho_{n-1}} for segments with n >= 2
+        n = np.diff(offsets)
+        out = {}
+        nfft = np.where(n > 1, 1 << np.ceil(np.log2(np.maximum(2 * n - 1, 1))).astype(int), 0)
+        for size in np.unique(nfft[nfft > 0]):
+            segs = np.flatnonzero(nfft == size)
+            step = max(1, cls.FFT_CELLS // int(size))
+            for start in range(0, len(segs), step):
+                part = segs[start:start + step]
+                m = n[part]
+                width = int(m.max())
+                col = np.arange(width)
+                inside = col < m[:, None]
+                x = np.where(inside, vals[np.minimum(offsets[part][:, None] + col, len(vals) - 1)], 0.0)
+                x -= np.where(inside, (x.sum(axis=1) / m)[:, None], 0.0)
+                f = np.fft.rfft(x, int(size), axis=1)
+                acov = np.fft.irfft(f.real ** 2 + f.imag ** 2, int(size), axis=1)[:, :width]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    rho = acov / acov[:, :1]
+                for r, s in enumerate(part):
+                    out[int(s)] = rho[r, :n[s]] if acov[r, 0] > 0 else np.zeros(n[s])
+        return out
+
+    @classmethod
+    def acf_n(cls, vals, offsets):
+        n = np.diff(offsets)
+        n_eff = n.astype(float)
+        for s, rho in cls.acf(vals, offsets).items():
+            if not rho[0]: continue # constant series: u_A is 0 either way
+            # Geyer: pair sums Gamma_m = rho_2m + rho_2m+1, kept while positive
+            pairs = rho[:len(rho) // 2 * 2].reshape(-1, 2).sum(axis=1)
+            stop = np.flatnonzero(pairs <= 0)
+            tau = -1.0 + 2.0 * pairs[:stop[0] if len(stop) else len(pairs)].sum()
+            n_eff[s] = n[s] / min(max(tau, 1.0), n[s])
+        return n_eff
+
+    @classmethod
+    def bootstrap_n(cls, vals, offsets, block=None, replicates=None, seed=None):
+        # block: readings per block. Default sqrt(n): the textbook n^(1/3) is far
+        # too short for slowly drifting 1 Hz logs. Each segment gets its own
+        # generator seeded by (seed, n), so a result does not depend on the batch
+        n = np.diff(offsets)
+        n_eff = n.astype(float)
+        replicates = replicates or cls.REPLICATES
+        seed = cls.SEED if seed is None else seed
+        for s in np.flatnonzero(n > 2):
+            x = vals[offsets[s]:offsets[s + 1]]
+            m = int(n[s])
+            var = x.var(ddof=1)
+            if not var > 0: continue
+            b = int(block or max(1, round(math.sqrt(m))))
+            b = min(b, m)
+            k = math.ceil(m / b)
+            csum = np.concatenate([[0.0], np.cumsum(x - x.mean())])
+            sums = csum[b:] - csum[:-b] # every block's sum, by start index
+            rng = np.random.default_rng([seed, m])
+            means = np.empty(replicates)
+            chunk = max(1, (1 << 22) // k)
+            for r in range(0, replicates, chunk):
+                starts = rng.integers(0, len(sums), (min(chunk, replicates - r), k))
+                means[r:r + len(starts)] = sums[starts].sum(axis=1) / (k * b)
+            u2 = means.var(ddof=1)
+            if u2 > 0: n_eff[s] = min(max(var / u2, 1.0), m)
+        return n_eff
@@ -0,0 +1,193 @@
+import math
+import statistics
+import itertools
+import numpy as np
+
+from .units import UNITS
+from .autocorr import Autocorrelation
+
+# ==================== CALCULATION ENGINE ====================
+class Calculator:
+    @staticmethod
+    def convert(value, from_u, to_u):
+        # Scalars or whole arrays; raises UnitError for pairs with no conversion
+        if value is None: return 0.0
+        return UNITS.convert(value, from_u, to_u)
+
+    @staticmethod
+    def calculate(readings, cert_unc, k, res, drift, acc):
+        if not readings: return 0, 0
+        n = len(readings)
+        mean = statistics.mean(readings)
+        stdev = statistics.stdev(readings) if n > 1 else 0
+        
+        u_a = stdev / math.sqrt(n)
+        return mean, Calculator.expand(u_a, cert_unc, k, res, drift, acc)
+
+    @staticmethod
+    def expand(u_a, cert_unc, k, res, drift, acc):
+        # Combine Type A with the Type B components -> expanded U (k=2)
+        u_cal = cert_unc / (k if k else 2.0)
+        u_res = res / math.sqrt(3)
+        u_drift = drift / math.sqrt(3)
+        u_acc = acc / math.sqrt(3)
+        
+        u_c = math.sqrt(u_a**2 + u_cal**2 + u_res**2 + u_drift**2 + u_acc**2)
+        return u_c * 2.0
+
+    @staticmethod
+    def calculate_stream(values, cert_unc, k, res, drift, acc, from_u=None, to_u=None):
+        # Same output as calculate() for any iterable, in constant memory
+        return RunningStats().feed(values, from_u, to_u).result(cert_unc, k, res, drift, acc)
+
+    @staticmethod
+    def calculate_batch(readings, cert_unc, k, res, drift, acc, offsets=None, type_a=None):
+        # Vectorized calculate() for many columns in one call.
+        # readings: 2-D array (rows x columns, NaN = empty cell), or a flat
+        # 1-D array of ragged columns delimited by offsets (len = columns + 1).
+        # Calibration arguments are scalars or one value per column.
+        # type_a: None / 'iid' for s/sqrt(n), or 'acf' / 'bootstrap' for
+        # time-ordered logs (Autocorrelation): u_a = s/sqrt(n_eff).
+        x = np.asarray(readings, dtype=float)
+        if offsets is None:
+            if x.ndim == 1: x = x.reshape(-1, 1)
+            valid = ~np.isnan(x)
+            n = valid.sum(axis=0)
+            mean = np.where(valid, x, 0.0).sum(axis=0) / np.maximum(n, 1)
+            dev = np.where(valid, x - mean, 0.0)
+            ss = (dev * dev).sum(axis=0)
+            if type_a not in (None, 'iid'):
+                # column-major so each column is one contiguous, time-ordered segment
+                vals, seg_offsets = x.T[valid.T], np.concatenate([[0], np.cumsum(n)])
+        else:
+            offsets = np.asarray(offsets, dtype=np.intp)
+            n = np.diff(offsets)
+            seg = np.repeat(np.arange(len(n)), n)
+            vals = x[offsets[0]:offsets[-1]]
+            mean = np.bincount(seg, weights=vals, minlength=len(n)) / np.maximum(n, 1)
+            dev = vals - mean[seg]
+            ss = np.bincount(seg, weights=dev * dev, minlength=len(n))
+            seg_offsets = offsets - offsets[0]
+
+        n_eff = n.astype(float)
+        if type_a not in (None, 'iid'):
+            n_eff = Autocorrelation.effective_n(vals, seg_offsets, type_a)
+        stdev = np.sqrt(ss / np.maximum(n - 1, 1))
+        u_a = stdev / np.sqrt(np.maximum(n_eff, 1))
+
+        shape = mean.shape
+        k = np.broadcast_to(np.array(k, dtype=float), shape)
+        k = np.where(np.isnan(k) | (k == 0), 2.0, k)
+        u_cal = np.broadcast_to(np.array(cert_unc, dtype=float), shape) / k
+        u_res = np.broadcast_to(np.array(res, dtype=float), shape) / math.sqrt(3)
+        u_drift = np.broadcast_to(np.array(drift, dtype=float), shape) / math.sqrt(3)
+        u_acc = np.broadcast_to(np.array(acc, dtype=float), shape) / math.sqrt(3)
+
+        u_c = np.sqrt(u_a**2 + u_cal**2 + u_res**2 + u_drift**2 + u_acc**2)
+        u_exp = u_c * 2.0
+
+        # Empty columns report (0, 0) like calculate()
+        empty = n == 0
+        mean = np.where(empty, 0.0, mean)
+        u_exp = np.where(empty, 0.0, u_exp)
+        return {'n': n, 'n_eff': n_eff, 'mean': mean, 'u_a': u_a, 'u_cal': u_cal, 'u_res': u_res,
+                'u_drift': u_drift, 'u_acc': u_acc, 'u_c': u_c, 'u_exp': u_exp}
+
+    @staticmethod
+    def status(mean, warn_limit, crit_limit):
+        if crit_limit and mean > crit_limit: return "FAIL"
+        if warn_limit and mean > warn_limit: return "WARN"
+        return "PASS"
+
+class RunningStats:
+    # Single-pass running mean/variance (Welford, merged per chunk with Chan's
+    # formula). Accumulators from separate chunks/processes can be merge()d.
+    CHUNK = 65536
+
+    def __init__(self, n=0, mean=0.0, m2=0.0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, x):
+        self.n += 1
+        d = x - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (x - self.mean)
+        return self
+
+    def remove(self, x):
+        # Inverse of add(): drops one value that was added before
+        if self.n <= 1:
+            self.n, self.mean, self.m2 = 0, 0.0, 0.0
+            return self
+        d = x - self.mean
+        self.n -= 1
+        self.mean -= d / self.n
+        self.m2 = max(self.m2 - d * (x - self.mean), 0.0)
+        return self
+
+    def update(self, values):
+        arr = np.asarray(values, dtype=float).ravel()
+        arr = arr[~np.isnan(arr)]
+        if arr.size:
+            m = arr.mean()
+            d = arr - m
+            self.merge(RunningStats(arr.size, float(m), float(d @ d)))
+        return self
+
+    def feed(self, values, from_u=None, to_u=None, chunk_size=None):
+        # Consume any iterable chunk by chunk (optionally converting units)
+        it = iter(values)
+        size = chunk_size or self.CHUNK
+        while True:
+            chunk = np.fromiter(itertools.islice(it, size), dtype=float)
+            if not chunk.size: break
+            if from_u and to_u: chunk = Calculator.convert(chunk, from_u, to_u)
+            self.update(chunk)
+        return self
+
+    @classmethod
+    def from_file(cls, path, column=0, delimiter=None, from_u=None, to_u=None, chunk_size=None):
+        # One reading per line (or one field of a delimited line); lines that
+        # do not parse (headers, blanks, analyzer status codes) are skipped.
+        def values():
+            with open(path, newline='') as f:
+                for line in f:
+                    parts = line.split(delimiter)
+                    if len(parts) <= column: continue
+                    try: yield float(parts[column])
+                    except ValueError: pass
+        return cls().feed(values(), from_u, to_u, chunk_size)
+
+    def merge(self, other):
+        if not other.n: return self
+        if not self.n:
+            self.n, self.mean, self.m2 = other.n, other.mean, other.m2
+            return self
+        n = self.n + other.n
+        d = other.mean - self.mean
+        self.mean += d * other.n / n
+        self.m2 += other.m2 + d * d * self.n * other.n / n
+        self.n = n
+        return self
+
+    @classmethod
+    def combine(cls, parts):
+        acc = cls()
+        for p in parts: acc.merge(p)
+        return acc
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.variance)
+
+    def result(self, cert_unc, k, res, drift, acc):
+        # (mean, U_exp) exactly as Calculator.calculate reports them
+        if not self.n: return 0, 0
+        u_a = self.stdev / math.sqrt(self.n)
+        return self.mean, Calculator.expand(u_a, cert_unc, k, res, drift, acc)
@@ -0,0 +1,271 @@
+# Command line entry point: python -m smartlab <command> [options]
+# Never imports Qt; reportlab is only imported by `export` to a PDF file.
+import os
+import sys
+import csv
+import json
+import argparse
+import datetime
+
+from .config import APP_NAME, ver_str
+from .db import DataManager, results_where
+from .importer import CsvImporter
+from .analysis import active_columns, column_readings, screen_columns, result_rows
+from .projects import ProjectBlob
+from .montecarlo import MonteCarlo
+from .screening import Screening
+from .autocorr import Autocorrelation
+
+def _units(pairs):
+    # ["SO2=ppm", ...] -> {"SO2": "ppm"}
+    out = {}
+    for pair in pairs or []:
+        name, _, unit = pair.partition("=")
+        if not unit: raise SystemExit(f"--unit expects PARAM=UNIT, got '{pair}'")
+        out[name.strip()] = unit.strip()
+    return out
+
+def _read(db, args):
+    return CsvImporter(db.calibs.params(), args.delimiter, _units(args.unit)).read(args.file)
+
+def cmd_analyze(args):
+    db = DataManager(args.db)
+    imp = _read(db, args)
+    project = args.project or os.path.splitext(os.path.basename(args.file))[0]
+    mcm = dict(samples=args.samples, p=args.coverage, seed=args.seed, workers=args.workers) if args.mcm else None
+    screen = Screening.config(args.screen and dict(method=args.screen, alpha=args.alpha, threshold=args.threshold,
+                                                   exclude=not args.flag_only))
+    cols = active_columns(db, imp['params'])
+    data, flagged = screen_columns(cols, imp['data'], screen)
+    rows = result_rows(project, cols, data, args.auditor, mcm=mcm, screen=screen, flagged=flagged,
+                       type_a=Autocorrelation.mode(args.type_a))
+    if args.save:
+        with db.transaction(): db.insert_results(rows, column_readings(cols, data))
+    
+    if args.json:
+        keys = ["project", "param", "mean", "u_exp", "min_trust", "max_trust", "status", "timestamp", "auditor", "device_snap", "cal_id", "screening", "flagged",
+                "type_a", "n_eff", "method"]
+        for r in rows: print(json.dumps(dict(zip(keys, r))))
+    else:
+        print(f"{'Param':<14}{'Mean':>14}{'U (Exp)':>14}{'Interval':>28}  Status")
+        for r in rows: print(f"{r[1]:<14}{r[2]:>14.4f}{'± ' + format(r[3], '.4f'):>14}{f'[{r[4]:.4f}, {r[5]:.4f}]':>28}  {r[6]}"
+                             + (f"  n_eff {r[14]:.1f}" if r[13] else ""))
+        for j, x in flagged.items():
+            print(f"{imp['params'][j]['name']}: {len(x)} {'excluded' if screen['exclude'] else 'flagged'} ({args.screen}): "
+                  + ", ".join(f"{v:g}" for v in x[:10]) + (" ..." if len(x) > 10 else ""))
+        uncal = len(imp['params']) - len(cols)
+        empty = len(cols) - len(rows) # calibrated, but no readings in the file
+        print(f"{len(imp['data'])} rows, {len(rows)} results{' saved' if args.save else ''}"
+              + (f", {uncal} parameters skipped (no active calibration)" if uncal else "")
+              + (f", {empty} parameters without readings" if empty else ""))
+    return 0
+
+def cmd_import(args):
+    # Stores the file as a saved project (converted to the parameters' units)
+    import numpy as np
+    db = DataManager(args.db)
+    imp = _read(db, args)
+    params = db.calibs.params()
+    col = {p['id']: c for c, p in enumerate(params)}
+    values = np.full((len(imp['data']), len(params)), np.nan)
+    for j, p in enumerate(imp['params']): values[:, col[p['id']]] = imp['data'][:, j]
+    
+    now = datetime.datetime.now()
+    name = args.project or os.path.splitext(os.path.basename(args.file))[0]
+    db.query("INSERT OR REPLACE INTO projects (id, name, last_modified, data_json, data_blob) VALUES (?,?,?,NULL,?)",
+             (now.strftime("%Y%m%d%H%M%S"), name, now.strftime("%Y-%m-%d %H:%M"),
+              ProjectBlob.encode(values, params, [p['unit'] for p in params])))
+    print(f"Project '{name}' saved: {len(values)} rows, {len(imp['params'])} parameters")
+    return 0
+
+def cmd_export(args):
+    db = DataManager(args.db)
+    filters = {k: v for k, v in dict(project=args.project, param=args.param, status=args.status,
+                                     date_from=args.date_from, date_to=args.date_to).items() if v}
+    if args.out.lower().endswith(".csv"):
+        where, qargs = results_where(filters)
+        cur = db.conn.execute(f"SELECT * FROM results{where} ORDER BY id", qargs)
+        n = 0
+        with open(args.out, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow([d[0] for d in cur.description])
+            while True:
+                chunk = cur.fetchmany(5000)
+                if not chunk: break
+                w.writerows(chunk)
+                n += len(chunk)
+        print(f"{n} results written to {args.out}")
+    else:
+        from .report import ReportBuilder
+        pages = ReportBuilder(db, filters, args.by_project).build(args.out, args.user)
+        print(f"{pages} pages written to {args.out}")
+    return 0
+
+def cmd_audit(args):
+    # Every result with the calibration version that produced it
+    db = DataManager(args.db)
+    filters = {k: v for k, v in dict(project=args.project, param=args.param, status=args.status,
+                                     date_from=args.date_from, date_to=args.date_to).items() if v}
+    cal_cols = [c for c in db.history.COLS if c not in ('id', 'param_id')]
+    n = 0
+    with open(args.out, "w", newline="") as f:
+        w = csv.writer(f)
+        for r, cal in db.history.audit(filters):
+            if not n: w.writerow(list(r) + ['cal_' + c for c in cal_cols])
+            w.writerow(list(r.values()) + [cal and cal[c] for c in cal_cols])
+            n += 1
+    print(f"{n} results written to {args.out}")
+    return 0
+
+def cmd_readings(args):
+    db = DataManager(args.db)
+    x = db.readings.get(args.result_id)
+    if x is None: raise ValueError(f"no readings stored for result {args.result_id}")
+    sys.stdout.writelines(f"{v!r}\n" for v in x.tolist())
+    return 0
+
+def cmd_verify(args):
+    # Recompute stored results from their raw readings; exit 1 on any mismatch
+    db = DataManager(args.db)
+    filters = {k: v for k, v in dict(project=args.project, param=args.param,
+                                     date_from=args.date_from, date_to=args.date_to).items() if v}
+    where, qargs = results_where(filters, ["id IN (SELECT result_id FROM readings_index)"])
+    cur = db.conn.execute(f"SELECT id FROM results{where} ORDER BY id", qargs)
+    n = bad = 0
+    while True:
+        ids = [r[0] for r in cur.fetchmany(5000)]
+        if not ids: break
+        for v in db.readings.verify(ids):
+            n += 1
+            if v['ok']: continue
+            bad += 1
+            print(f"result {v['result_id']}: {'digest mismatch, ' if not v['digest_ok'] else ''}"
+                  f"mean {v['stored_mean']} -> {v['mean']}, U {v['stored_u_exp']} -> {v['u_exp']}")
+    print(f"{n} results verified, {bad} mismatches")
+    return 1 if bad else 0
+
+def cmd_trend(args):
+    db = DataManager(args.db)
+    rows = db.rollups.trend(args.param, args.project, args.date_from, args.date_to, args.by)
+    if args.json:
+        for r in rows: print(json.dumps(r))
+        return 0
+    print(f"{'Period':<12}{'Results':>9}{'Mean':>12}{'Std Dev':>12}{'Max':>12}{'Mean U':>10}{'Max U':>10}{'WARN':>7}{'FAIL':>7}")
+    for r in rows:
+        print(f"{r['period'] or 'all':<12}{r['n']:>9}{r['mean']:>12.4f}{r['stdev']:>12.4f}{r['max']:>12.4f}"
+              f"{r['u_mean']:>10.4f}{r['u_max'] or 0:>10.4f}{r['n_warn']:>7}{r['n_fail']:>7}")
+    return 0
+
+def cmd_rollups(args):
+    db = DataManager(args.db)
+    t = datetime.datetime.now()
+    n = db.rollups.rebuild()
+    print(f"{n} daily rollups rebuilt in {(datetime.datetime.now() - t).total_seconds():.1f} s")
+    return 0
+
+def cmd_reanalyze(args):
+    from .reanalysis import reanalyze_projects
+    t = datetime.datetime.now()
+    done, written = reanalyze_projects(args.db, args.auditor, args.workers,
+                                       progress=lambda d, n: print(f"\r{d}/{n} projects", end="", file=sys.stderr, flush=True))
+    secs = (datetime.datetime.now() - t).total_seconds()
+    print(f"\n{done} projects, {written} results in {secs:.1f} s")
+    return 0
+
+def cmd_serve(args):
+    from .service import serve
+    serve(args.db, args.host, args.port, args.workers)
+    return 0
+
+def build_parser():
+    ap = argparse.ArgumentParser(prog="smartlab", description=f"{APP_NAME} v{ver_str} (headless)")
+    ap.add_argument("--db", default="smartlab.db", help="database file (default: smartlab.db)")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    def readings(p):
+        p.add_argument("file", help="CSV / instrument log with one column per parameter")
+        p.add_argument("--project", help="project name (default: file name)")
+        p.add_argument("--unit", action="append", metavar="PARAM=UNIT", help="input unit of a column, overrides the header")
+        p.add_argument("--delimiter", default=",")
+
+    p = sub.add_parser("analyze", help="compute mean / U / status for every parameter in a readings file")
+    readings(p)
+    p.add_argument("--save", action="store_true", help="store the results in the database")
+    p.add_argument("--json", action="store_true", help="one JSON object per result")
+    p.add_argument("--auditor", default="CLI")
+    p.add_argument("--mcm", action="store_true", help="Monte Carlo propagation (GUM-S1) instead of the GUM formula")
+    p.add_argument("--samples", type=int, default=MonteCarlo.SAMPLES, help="Monte Carlo trials per parameter")
+    p.add_argument("--coverage", type=float, default=MonteCarlo.COVERAGE, help="coverage probability of the interval")
+    p.add_argument("--seed", type=int, help="RNG seed for reproducible Monte Carlo results")
+    p.add_argument("--workers", type=int, help="Monte Carlo worker processes (default: one per CPU)")
+    p.add_argument("--screen", choices=Screening.METHODS, help="outlier screening before the calculation")
+    p.add_argument("--alpha", type=float, default=Screening.DEFAULTS['alpha'], help="significance level for grubbs")
+    p.add_argument("--threshold", type=float, default=Screening.DEFAULTS['threshold'], help="modified Z-score limit for mad")
+    p.add_argument("--flag-only", action="store_true", help="report screened readings but keep them in the calculation")
+    p.add_argument("--type-a", choices=Autocorrelation.MODES, default="iid",
+                   help="Type A for time-ordered logs: effective n from the autocorrelation (acf) or a block bootstrap")
+    p.set_defaults(func=cmd_analyze)
+
+    p = sub.add_parser("import", help="save a readings file as a project")
+    readings(p)
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("export", help="export results to PDF (or .csv)")
+    p.add_argument("out")
+    p.add_argument("--project"); p.add_argument("--param")
+    p.add_argument("--status", choices=["PASS", "WARN", "FAIL"])
+    p.add_argument("--from", dest="date_from", metavar="YYYY-MM-DD")
+    p.add_argument("--to", dest="date_to", metavar="YYYY-MM-DD")
+    p.add_argument("--by-project", action="store_true", help="one section per project")
+    p.add_argument("--user", default="CLI")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("audit", help="export results with the calibration version each one used (.csv)")
+    p.add_argument("out")
+    p.add_argument("--project"); p.add_argument("--param")
+    p.add_argument("--status", choices=["PASS", "WARN", "FAIL"])
+    p.add_argument("--from", dest="date_from", metavar="YYYY-MM-DD")
+    p.add_argument("--to", dest="date_to", metavar="YYYY-MM-DD")
+    p.set_defaults(func=cmd_audit)
+
+    p = sub.add_parser("readings", help="print the raw readings stored for a result")
+    p.add_argument("result_id", type=int)
+    p.set_defaults(func=cmd_readings)
+
+    p = sub.add_parser("verify", help="recompute results from their stored raw readings")
+    p.add_argument("--project"); p.add_argument("--param")
+    p.add_argument("--from", dest="date_from", metavar="YYYY-MM-DD")
+    p.add_argument("--to", dest="date_to", metavar="YYYY-MM-DD")
+    p.set_defaults(func=cmd_verify)
+
+    p = sub.add_parser("trend", help="aggregate results of one parameter per day / week / month / year")
+    p.add_argument("param")
+    p.add_argument("--project")
+    p.add_argument("--from", dest="date_from", metavar="YYYY-MM-DD")
+    p.add_argument("--to", dest="date_to", metavar="YYYY-MM-DD")
+    p.add_argument("--by", default="month", choices=["day", "week", "month", "year", "all"])
+    p.add_argument("--json", action="store_true", help="one JSON object per period")
+    p.set_defaults(func=cmd_trend)
+
+    p = sub.add_parser("rollups", help="rebuild the daily result rollups from the results table")
+    p.set_defaults(func=cmd_rollups)
+
+    p = sub.add_parser("reanalyze", help="recompute all saved projects against the active calibrations")
+    p.add_argument("--workers", type=int)
+    p.add_argument("--auditor", default="Re-analysis")
+    p.set_defaults(func=cmd_reanalyze)
+
+    p = sub.add_parser("serve", help="local HTTP/JSON analysis service for LIMS / instruments")
+    p.add_argument("--host", default="127.0.0.1", help="bind address (default: loopback only)")
+    p.add_argument("--port", type=int, default=8017)
+    p.add_argument("--workers", type=int, help="threads for database and calculation work")
+    p.set_defaults(func=cmd_serve)
+    return ap
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
@@ -0,0 +1,15 @@
+# ==================== CONFIGURATION ====================
+APP_NAME = "Uncertainty Calculator" # Changed from Lab Workbench
+ver_str = "0.6"
+COPYRIGHT_SIG = f"Eng. Mohammad Telfah copywrite Version {ver_str}"
+CONTACT_INFO = """
+Developer: Eng. Mohammad Telfah
+Phone: +962789841842
+Location: Amman - Jordan
+"""
+
+# Auth Defaults
+DEFAULT_ADMIN_USER = "Admin"
+DEFAULT_ADMIN_PASS = "password123"
+AUDITOR_USER = "Auditor"
+AUDITOR_PASS = "2026"
@@ -0,0 +1,448 @@
+import time
+import sqlite3
+import datetime
+import itertools
+import contextlib
+import threading
+import weakref
+import numpy as np
+
+from .trace import TRACE
+from .memo import AnalysisCache
+from .readings import ReadingStore
+from .rollups import Rollups
+
+# ==================== DATABASE MANAGER ====================
+class _ThreadExit:
+    # Weak-referenceable marker kept in a thread's local storage (see for_thread)
+    pass
+
+class DataManager:
+    RESULT_INSERT = """INSERT INTO results (project, param, mean, u_exp, min_trust, max_trust, status, timestamp, auditor, device_snap, cal_id,
+                                            screening, flagged, type_a, n_eff, method)
+                       VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)"""
+
+    # Schema migrations in order; PRAGMA user_version = how many are applied.
+    # Existing databases are upgraded in place on open. Append, never edit.
+    MIGRATIONS = [
+        # 1: indexes for the hot paths
+        [
+            # at most one active profile per parameter (keep the newest)
+            """UPDATE calibrations SET active=0 WHERE active=1 AND id NOT IN
+               (SELECT MAX(id) FROM calibrations WHERE active=1 GROUP BY param_id)""",
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_calibrations_active ON calibrations(param_id) WHERE active=1",
+            "CREATE INDEX IF NOT EXISTS idx_calibrations_param_date ON calibrations(param_id, date)",
+            "CREATE INDEX IF NOT EXISTS idx_results_project ON results(project, id)",
+            "CREATE INDEX IF NOT EXISTS idx_results_param ON results(param, id)",
+            "CREATE INDEX IF NOT EXISTS idx_results_timestamp ON results(timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_projects_name ON projects(name)",
+        ],
+        # 2: keyset paging of the Results tab filtered by status
+        [
+            "CREATE INDEX IF NOT EXISTS idx_results_status ON results(status, id)",
+        ],
+        # 3: binary project grids (ProjectBlob); data_json stays for legacy rows
+        [
+            "ALTER TABLE projects ADD COLUMN data_blob BLOB",
+        ],
+        # 4: memo of analysed columns (AnalysisCache)
+        [
+            """CREATE TABLE IF NOT EXISTS analysis_cache (
+                key BLOB PRIMARY KEY, param_id INTEGER, result_id INTEGER,
+                mean REAL, u_exp REAL, min_trust REAL, max_trust REAL, status TEXT
+            ) WITHOUT ROWID""",
+            "CREATE INDEX IF NOT EXISTS idx_analysis_cache_param ON analysis_cache(param_id)",
+        ],
+        # 5: immutable calibration versions valid over [valid_from, valid_to),
+        #    results linked to the exact version (CalibrationHistory)
+        [
+            "ALTER TABLE calibrations ADD COLUMN valid_from TEXT",
+            "ALTER TABLE calibrations ADD COLUMN valid_to TEXT",
+            "ALTER TABLE results ADD COLUMN cal_id INTEGER",
+            # Legacy rows: activation order is id order, from the calibration date on
+            """UPDATE calibrations SET valid_from = (SELECT MAX(c.date) FROM calibrations c
+                                                     WHERE c.param_id = calibrations.param_id AND c.id <= calibrations.id)""",
+            """UPDATE calibrations SET valid_to = (SELECT c.valid_from FROM calibrations c
+                                                   WHERE c.param_id = calibrations.param_id AND c.id > calibrations.id
+                                                   ORDER BY c.id LIMIT 1)""",
+            "CREATE INDEX IF NOT EXISTS idx_calibrations_asof ON calibrations(param_id, valid_from, id)",
+            "CREATE INDEX IF NOT EXISTS idx_results_cal ON results(cal_id)",
+            # Rows inserted without a validity start are valid from their calibration date
+            """CREATE TRIGGER IF NOT EXISTS calibrations_valid_from AFTER INSERT ON calibrations
+               WHEN NEW.valid_from IS NULL BEGIN
+                   UPDATE calibrations SET valid_from = COALESCE(NEW.date, '') WHERE id = NEW.id;
+               END""",
+            # Versions are never edited or deleted; only active and a still-open valid_to may change
+            """CREATE TRIGGER IF NOT EXISTS calibrations_immutable BEFORE UPDATE ON calibrations
+               WHEN NEW.id IS NOT OLD.id OR NEW.param_id IS NOT OLD.param_id OR NEW.device IS NOT OLD.device
+                 OR NEW.serial IS NOT OLD.serial OR NEW.date IS NOT OLD.date OR NEW.cert_unc IS NOT OLD.cert_unc
+                 OR NEW.k_factor IS NOT OLD.k_factor OR NEW.resolution IS NOT OLD.resolution
+                 OR NEW.drift IS NOT OLD.drift OR NEW.accuracy IS NOT OLD.accuracy
+                 OR (OLD.valid_from IS NOT NULL AND NEW.valid_from IS NOT OLD.valid_from)
+                 OR (OLD.valid_to IS NOT NULL AND NEW.valid_to IS NOT OLD.valid_to)
+               BEGIN SELECT RAISE(ABORT, 'calibration profiles are immutable'); END""",
+            """CREATE TRIGGER IF NOT EXISTS calibrations_no_delete BEFORE DELETE ON calibrations
+               BEGIN SELECT RAISE(ABORT, 'calibration profiles are immutable'); END""",
+        ],
+        # 6: where each result's raw readings live in the segment files (ReadingStore)
+        [
+            """CREATE TABLE IF NOT EXISTS readings_index (
+                result_id INTEGER PRIMARY KEY, segment INTEGER, offset INTEGER, n INTEGER, digest BLOB
+            )""",
+        ],
+        # 7: per (param, project, day) rollups of the results (Rollups), backfilled
+        [
+            """CREATE TABLE IF NOT EXISTS results_daily (
+                param TEXT NOT NULL, project TEXT NOT NULL, day TEXT NOT NULL,
+                n INTEGER, mean REAL, m2 REAL, u_sum REAL, u_max REAL, lo REAL, hi REAL, n_warn INTEGER, n_fail INTEGER,
+                PRIMARY KEY (param, project, day)
+            ) WITHOUT ROWID""",
+            "CREATE INDEX IF NOT EXISTS idx_results_daily_day ON results_daily(param, day)",
+            Rollups.REBUILD,
+        ],
+        # 8: outlier screening config and the readings it flagged (JSON), per result
+        [
+            "ALTER TABLE results ADD COLUMN screening TEXT",
+            "ALTER TABLE results ADD COLUMN flagged TEXT",
+        ],
+        # 9: Type A mode for autocorrelated logs (NULL = independent readings) and its effective n
+        [
+            "ALTER TABLE results ADD COLUMN type_a TEXT",
+            "ALTER TABLE results ADD COLUMN n_eff REAL",
+        ],
+        # 10: propagation method, Monte Carlo options as JSON (NULL = GUM formula)
+        [
+            "ALTER TABLE results ADD COLUMN method TEXT",
+        ],
+    ]
+
+    def __init__(self, db_name="smartlab.db", check_same_thread=True):
+        self.db_name = db_name
+        self.conn = sqlite3.connect(db_name, check_same_thread=check_same_thread)
+        self.conn.row_factory = sqlite3.Row
+        self._tx_depth = 0
+        self.calibs = CalibrationRepository(self)
+        self.history = CalibrationHistory(self)
+        self.readings = ReadingStore(self)
+        self.rollups = Rollups(self)
+        self.memo = AnalysisCache(self)
+        self.tune()
+        self.init_db()
+
+    _local = threading.local()
+    _threads = {} # thread ident -> that thread's {db_name: DataManager}
+    _threads_lock = threading.Lock()
+
+    @classmethod
+    def for_thread(cls, db_name):
+        # sqlite3 connections are per thread: one DataManager per (thread, file).
+        # They are closed when the thread exits, or by close_threads() once the
+        # pool that owned the threads has finished (hence check_same_thread=False)
+        local = cls._local.__dict__
+        if 'dbs' not in local:
+            ident = threading.get_ident()
+            local['dbs'] = dbs = {}
+            local['exit'] = marker = _ThreadExit() # only referenced here: freed with the thread
+            weakref.finalize(marker, cls._thread_exit, ident, dbs)
+            with cls._threads_lock: cls._threads[ident] = dbs
+        dbs = local['dbs']
+        if db_name not in dbs: dbs[db_name] = cls(db_name, check_same_thread=False)
+        return dbs[db_name]
+
+    @classmethod
+    def _thread_exit(cls, ident, dbs):
+        with cls._threads_lock:
+            if cls._threads.get(ident) is dbs: del cls._threads[ident]
+        cls._close(dbs)
+
+    @classmethod
+    def close_threads(cls, db_name=None):
+        # Close every thread's cached connection (to db_name, or all). Only call
+        # when no pool thread is still using them; a later for_thread() reconnects
+        with cls._threads_lock: caches = list(cls._threads.values())
+        for dbs in caches: cls._close(dbs, db_name)
+
+    @staticmethod
+    def _close(dbs, db_name=None):
+        for name in [n for n in list(dbs) if db_name is None or n == db_name]:
+            db = dbs.pop(name, None)
+            if db is not None: db.conn.close()
+
+    def tune(self):
+        # WAL: readers don't block the writer; NORMAL sync is durable enough under WAL
+        c = self.conn.cursor()
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")
+        c.execute("PRAGMA cache_size=-65536") # 64 MB page cache
+        c.execute("PRAGMA temp_store=MEMORY")
+
+    def init_db(self):
+        c = self.conn.cursor()
+        # Parameters
+        c.execute("""CREATE TABLE IF NOT EXISTS parameters (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, 
+            name TEXT, unit TEXT, warn_limit REAL, crit_limit REAL
+        )""")
+        
+        # Calibrations
+        c.execute("""CREATE TABLE IF NOT EXISTS calibrations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, 
+            param_id INTEGER, 
+            device TEXT, serial TEXT, date TEXT, 
+            cert_unc REAL, k_factor REAL, resolution REAL, 
+            drift REAL, accuracy REAL, active INTEGER DEFAULT 0
+        )""")
+        
+        # Results
+        c.execute("""CREATE TABLE IF NOT EXISTS results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, 
+            project TEXT, param TEXT, 
+            mean REAL, u_exp REAL, min_trust REAL, max_trust REAL, 
+            status TEXT, timestamp TEXT, auditor TEXT,
+            device_snap TEXT
+        )""")
+        
+        # Projects (Snapshots)
+        c.execute("""CREATE TABLE IF NOT EXISTS projects (
+            id TEXT PRIMARY KEY, 
+            name TEXT, 
+            last_modified TEXT, 
+            data_json TEXT
+        )""")
+
+        self.conn.commit()
+        self.migrate()
+        self.seed_defaults()
+
+    def migrate(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        for v in range(version, len(self.MIGRATIONS)):
+            with self.transaction():
+                for sql in self.MIGRATIONS[v]: self.conn.execute(sql)
+                self.conn.execute(f"PRAGMA user_version={v + 1}")
+        return len(self.MIGRATIONS) - version
+
+    def seed_defaults(self):
+        cur = self.conn.cursor()
+        cur.execute("SELECT count(*) FROM parameters")
+        if cur.fetchone()[0] == 0:
+            defaults = [
+                ("H2S","ppb", 10, 20), ("SO2","ppb", 75, 100), ("NO2","ppb", 40, 80),
+                ("PM2.5","ug/m3", 35, 50), ("PM10","ug/m3", 150, 200), ("TVOC","ppb", 200, 500),
+                ("CO","ppm", 9, 15), ("O3","ppb", 50, 80), 
+                ("Temperature","C", 45, 50), ("Humidity","%", 85, 90)
+            ]
+            for n, u, w, c in defaults:
+                self.conn.execute("INSERT INTO parameters (name, unit, warn_limit, crit_limit) VALUES (?,?,?,?)", (n,u,w,c))
+            self.conn.commit()
+
+    def query(self, sql, args=(), fetch=False):
+        traced = TRACE.enabled
+        if traced: start = time.perf_counter()
+        c = self.conn.cursor()
+        c.execute(sql, args)
+        if fetch:
+            rows = [dict(row) for row in c.fetchall()]
+            if traced: TRACE.record("query", _sql_name(sql), start, len(rows))
+            return rows
+        if not self._tx_depth: self.conn.commit()
+        if traced: TRACE.record("query", _sql_name(sql), start, c.rowcount)
+        return c.lastrowid
+
+    def executemany(self, sql, rows):
+        traced = TRACE.enabled
+        if traced: start = time.perf_counter()
+        c = self.conn.cursor()
+        c.executemany(sql, rows)
+        if not self._tx_depth: self.conn.commit()
+        if traced: TRACE.record("query", _sql_name(sql), start, c.rowcount, "executemany")
+        return c.rowcount
+
+    @contextlib.contextmanager
+    def transaction(self):
+        # Everything inside commits once (or rolls back); nested blocks join the outer one
+        if not self._tx_depth:
+            if self.conn.in_transaction: self.conn.commit()
+            self.conn.execute("BEGIN")
+        self._tx_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._tx_depth -= 1
+            if not self._tx_depth: self.conn.rollback()
+            raise
+        self._tx_depth -= 1
+        if not self._tx_depth: self.conn.commit()
+
+    def insert_results(self, rows, readings=None):
+        # rows: (project, param, mean, u_exp, min, max, status, timestamp, auditor, device, calibration id,
+        #        screening config, flagged readings, Type A mode, effective n, Monte Carlo options)
+        # readings: optional converted readings per row, kept in the ReadingStore
+        # -> range of the new result ids, in row order
+        rows = list(rows)
+        if not rows: return range(0)
+        with self.transaction():
+            self.executemany(self.RESULT_INSERT, rows)
+            # AUTOINCREMENT ids of one executemany in one transaction are consecutive;
+            # read right after it, before anything else inserts into a rowid table
+            last = self.conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+            ids = range(last - len(rows) + 1, last + 1)
+            if readings is not None: self.readings.append(ids, readings)
+            self.rollups.add(rows)
+        return ids
+
+def _sql_name(sql):
+    # Trace key: the statement on one line, literals and all (callers bind values)
+    return " ".join(sql.split())[:120]
+
+class CalibrationRepository:
+    # In-process cache of the parameters and their active calibration profile,
+    # loaded with one JOINed query. Call invalidate() after writing either table.
+    PARAM_COLS = ['id', 'name', 'unit', 'warn_limit', 'crit_limit']
+
+    def __init__(self, db):
+        self.db = db
+        self._params = None
+        self._active = None
+
+    def load(self):
+        rows = self.db.query(f"""SELECT {', '.join('p.' + k + ' AS p_' + k for k in self.PARAM_COLS)}, c.*
+                                 FROM parameters p LEFT JOIN calibrations c ON c.param_id = p.id AND c.active = 1
+                                 ORDER BY p.id""", fetch=True)
+        self._params, self._active = [], {}
+        for r in rows:
+            p = {k: r['p_' + k] for k in self.PARAM_COLS}
+            self._params.append(p)
+            if r['id'] is not None:
+                self._active[p['id']] = {k: v for k, v in r.items() if not k.startswith('p_')}
+
+    def invalidate(self):
+        self._params = self._active = None
+
+    def params(self):
+        if self._params is None: self.load()
+        return self._params
+
+    def active(self, param_id):
+        if self._active is None: self.load()
+        return self._active.get(param_id)
+
+class CalibrationHistory:
+    # Point-in-time view of the calibration versions. A version is never edited:
+    # add() closes the open one (valid_to) and inserts its successor, so "the
+    # profile of param X at time T" is the last version with valid_from <= T.
+    # resolve() answers that for millions of (param, T) pairs with a binary
+    # search per pair over an in-memory copy of the (small) calibrations table.
+    # Timestamps compare as ISO strings. valid_from and new results carry
+    # seconds; a legacy minute-precision result "HH:MM" sorts before every
+    # second of its minute, so it resolves to the version valid at HH:MM:00.
+    # Versions saved within the same second tie-break on id (the later wins).
+    COLS = ['id', 'param_id', 'device', 'serial', 'date', 'cert_unc', 'k_factor', 'resolution', 'drift',
+            'accuracy', 'valid_from', 'valid_to']
+    OPEN = "\uffff" # valid_to of the current version, sorts after any timestamp
+
+    def __init__(self, db):
+        self.db = db
+        self._index = None
+        self._versions = {}
+
+    def add(self, param_id, values, ts=None):
+        # values: device, serial, date, cert_unc, k_factor, resolution, drift, accuracy -> new version id
+        ts = ts or datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.db.transaction():
+            last = self.db.conn.execute("SELECT MAX(valid_from) FROM calibrations WHERE param_id=?", (param_id,)).fetchone()[0]
+            ts = max(ts, last or "")
+            self.db.query("UPDATE calibrations SET active=0, valid_to=? WHERE param_id=? AND valid_to IS NULL", (ts, param_id))
+            cal_id = self.db.query("""INSERT INTO calibrations (param_id, device, serial, date, cert_unc, k_factor, resolution,
+                                      drift, accuracy, active, valid_from) VALUES (?,?,?,?,?,?,?,?,?,1,?)""",
+                                   (param_id, *(values[k] for k in self.COLS[2:10]), ts))
+            # Memoized results of the old version are stale
+            self.db.memo.invalidate_param(param_id)
+        self.db.calibs.invalidate()
+        self.invalidate()
+        return cal_id
+
+    def invalidate(self):
+        self._index = None
+
+    def load(self):
+        # {param_id: (valid_from[], valid_to[], id[])}, each sorted by (valid_from, id)
+        rows = self.db.conn.execute("SELECT param_id, valid_from, valid_to, id FROM calibrations "
+                                    "ORDER BY param_id, valid_from, id").fetchall()
+        self._index = {}
+        for pid, grp in itertools.groupby(rows, key=lambda r: r[0]):
+            grp = list(grp)
+            self._index[pid] = (np.array([r[1] or "" for r in grp]), np.array([r[2] or self.OPEN for r in grp]),
+                                np.array([r[3] for r in grp], dtype=np.int64))
+
+    def as_of(self, param_id, ts):
+        # One lookup straight from the (param_id, valid_from, id) index -> version dict or None
+        rows = self.db.query(f"""SELECT {', '.join(self.COLS)} FROM calibrations
+                                 WHERE param_id=? AND valid_from <= ? ORDER BY valid_from DESC, id DESC LIMIT 1""",
+                             (param_id, ts), fetch=True)
+        if not rows or (rows[0]['valid_to'] is not None and ts >= rows[0]['valid_to']): return None
+        return rows[0]
+
+    def resolve(self, params, timestamps):
+        # params: parameter ids or names, timestamps: ISO strings (same length)
+        # -> int64 array of version ids, 0 where nothing was valid
+        if self._index is None: self.load()
+        names = {p['name']: p['id'] for p in self.db.calibs.params()}
+        keys, inv = np.unique(np.asarray(params), return_inverse=True)
+        ts = np.asarray(timestamps, dtype=str)
+        out = np.zeros(len(ts), dtype=np.int64)
+        order = np.argsort(inv, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(inv, minlength=len(keys)))])
+        for g, key in enumerate(keys.tolist()):
+            entry = self._index.get(names.get(key, key))
+            if entry is None: continue
+            sel = order[bounds[g]:bounds[g + 1]]
+            starts, ends, ids = entry
+            t = ts[sel]
+            pos = np.searchsorted(starts, t, side='right') - 1
+            hit = pos >= 0
+            pos = np.maximum(pos, 0)
+            out[sel] = np.where(hit & (t < ends[pos]), ids[pos], 0)
+        return out
+
+    def versions(self, ids):
+        # {id: version dict}; versions are immutable, so they are cached for good
+        missing = sorted({int(i) for i in ids if i} - self._versions.keys())
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            for r in self.db.query(f"SELECT {', '.join(self.COLS)} FROM calibrations WHERE id IN ({','.join('?' * len(chunk))})",
+                                   chunk, fetch=True):
+                self._versions[r['id']] = r
+        return {int(i): self._versions[int(i)] for i in ids if i and int(i) in self._versions}
+
+    def audit(self, filters=None, chunk_size=50000):
+        # Yields results rows (dicts) with the calibration version that produced
+        # them: the linked cal_id, or for rows saved before the link existed the
+        # version valid at their timestamp ('cal_source' tells which).
+        where, args = results_where(filters)
+        cur = self.db.conn.execute(f"SELECT * FROM results{where} ORDER BY id", args)
+        cols = [d[0] for d in cur.description]
+        while True:
+            chunk = cur.fetchmany(chunk_size)
+            if not chunk: break
+            rows = [dict(zip(cols, r)) for r in chunk]
+            legacy = [r for r in rows if r['cal_id'] is None]
+            if legacy:
+                for r, cid in zip(legacy, self.resolve([r['param'] for r in legacy], [r['timestamp'] or "" for r in legacy]).tolist()):
+                    r['cal_id'], r['cal_source'] = cid or None, 'as-of'
+            found = self.versions([r['cal_id'] for r in rows])
+            for r in rows:
+                r.setdefault('cal_source', 'linked')
+                yield r, found.get(r['cal_id'])
+
+def results_where(filters, extra=()):
+    # Results filters (project, param, status, date_from, date_to) -> (" WHERE ...", args)
+    f, clauses, args = filters or {}, list(extra), []
+    if f.get('project'): clauses.append("project = ?"); args.append(f['project'])
+    if f.get('param'): clauses.append("param = ?"); args.append(f['param'])
+    if f.get('status'): clauses.append("status = ?"); args.append(f['status'])
+    if f.get('date_from'): clauses.append("timestamp >= ?"); args.append(f['date_from'])
+    if f.get('date_to'):
+        end = datetime.date.fromisoformat(f['date_to']) + datetime.timedelta(days=1)
+        clauses.append("timestamp < ?"); args.append(end.isoformat())
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
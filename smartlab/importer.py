@@ -0,0 +1,92 @@
+import os
+import re
+import csv
+import mmap
+import itertools
+import numpy as np
+
+from .calc import Calculator
+from .units import UNITS
+
+# ==================== DATA IMPORT ====================
+class CsvImporter:
+    # Streams a CSV / instrument log into typed float64 columns (one per known
+    # parameter, converted to the parameter's unit), without any widgets.
+    # Header cells are matched to parameter names; the input unit may be given
+    # as "SO2 [ppm]" / "SO2 (ppm)", otherwise the parameter's unit is assumed.
+    CHUNK_BYTES = 1 << 24
+    CHUNK_LINES = 100000
+    HEADER_RE = re.compile(r"^\s*(.*?)\s*(?:[\[(]\s*(.*?)\s*[\])])?\s*$")
+
+    def __init__(self, params, delimiter=',', units=None, progress=None):
+        self.params = params
+        self.delimiter = delimiter
+        self.units = units or {}
+        self.progress = progress # progress(bytes_done, bytes_total) per chunk
+
+    def read(self, path):
+        # Large files are memory-mapped and parsed in newline-aligned chunks
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0: raise ValueError("Empty file")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                end = mm.find(b'\n')
+                if end < 0: end = len(mm)
+                self._header(mm[:end].decode('utf-8-sig'))
+                pos = end + 1
+                while pos < len(mm):
+                    stop = min(pos + self.CHUNK_BYTES, len(mm))
+                    if stop < len(mm):
+                        nl = mm.rfind(b'\n', pos, stop)
+                        if nl < 0: nl = mm.find(b'\n', stop)
+                        stop = len(mm) if nl < 0 else nl + 1
+                    self._chunk(mm[pos:stop].decode('utf-8').splitlines())
+                    pos = stop
+                    if self.progress: self.progress(pos, len(mm))
+        return self._finish()
+
+    def read_stream(self, lines):
+        # Any iterable of text lines (open file, socket reader, stdin)
+        it = iter(lines)
+        self._header(next(it, '').lstrip('\ufeff'))
+        while True:
+            chunk = list(itertools.islice(it, self.CHUNK_LINES))
+            if not chunk: break
+            self._chunk(chunk)
+        return self._finish()
+
+    def _header(self, line):
+        by_name = {p['name'].strip().lower(): p for p in self.params}
+        self.fields, self.cols, self.from_units, self.parts = [], [], [], []
+        for i, cell in enumerate(next(csv.reader([line], delimiter=self.delimiter), [])):
+            name, unit = self.HEADER_RE.match(cell).groups()
+            p = by_name.get(name.lower())
+            if not p or p in self.cols: continue
+            u_in = self.units.get(p['name']) or unit or p['unit']
+            UNITS.resolve(u_in, p['unit']) # fail on unknown units before reading anything
+            self.fields.append(i)
+            self.cols.append(p)
+            self.from_units.append(u_in)
+            self.parts.append([])
+        if not self.cols: raise ValueError("No known parameter columns in header")
+
+    def _chunk(self, lines):
+        try:
+            block = np.loadtxt(lines, delimiter=self.delimiter, usecols=self.fields,
+                               ndmin=2, dtype=float, quotechar='"')
+        except ValueError:
+            # Blank or non-numeric cells somewhere in this chunk: parse row by row
+            block = np.full((len(lines), len(self.fields)), np.nan)
+            n = 0
+            for row in csv.reader(lines, delimiter=self.delimiter):
+                if not row: continue
+                for j, i in enumerate(self.fields):
+                    try: block[n, j] = float(row[i])
+                    except (ValueError, IndexError): pass
+                n += 1
+            block = block[:n]
+        for j, p in enumerate(self.cols):
+            self.parts[j].append(Calculator.convert(block[:, j], self.from_units[j], p['unit']))
+
+    def _finish(self):
+        data = np.column_stack([np.concatenate(parts) if parts else np.empty(0) for parts in self.parts])
+        return {'params': self.cols, 'units': self.from_units, 'data': data}
@@ -0,0 +1,78 @@
+import json
+import hashlib
+import threading
+import collections
+import numpy as np
+
+# ==================== ANALYSIS CACHE ====================
+# Content-addressed memo of analysed columns. The key hashes everything a
+# result depends on: project, parameter + limits, the active calibration
+# profile (id and values), the method, the screening, the Type A mode and the converted readings. A hit
+# means that exact result row is already stored, so Run Analysis reuses it
+# instead of recomputing and inserting a duplicate.
+#   tier 1: process-wide LRU (shared by the GUI and job threads)
+#   tier 2: analysis_cache table, survives restarts
+# Changing a calibration profile makes new keys anyway; invalidate_param()
+# also drops the stale entries.
+class AnalysisCache:
+    LRU_SIZE = 4096
+    COLS = ['param_id', 'result_id', 'mean', 'u_exp', 'min_trust', 'max_trust', 'status']
+    _lru = collections.OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, db):
+        self.db = db
+
+    @staticmethod
+    def key(project, param, cal, readings, mcm=None, screen=None, type_a=None):
+        # readings: the column's valid (converted, non-NaN) values before screening, in order
+        h = hashlib.blake2b(digest_size=16)
+        h.update(json.dumps([project, param['id'], param['name'], param['unit'], param['warn_limit'], param['crit_limit'],
+                             cal['id'], cal['device'], cal['cert_unc'], cal['k_factor'], cal['resolution'], cal['drift'],
+                             cal['accuracy'], None if mcm is None else sorted(mcm.items()),
+                             None if screen is None else sorted(screen.items())]
+                            + ([type_a] if type_a else []), default=str).encode())
+        h.update(np.ascontiguousarray(readings, dtype='<f8').tobytes())
+        return h.digest()
+
+    @staticmethod
+    def cacheable(mcm):
+        # Monte Carlo results only repeat with a fixed seed
+        return mcm is None or mcm.get('seed') is not None
+
+    def get(self, keys):
+        # -> {key: {param_id, result_id, mean, u_exp, min_trust, max_trust, status}} for the hits
+        hits, missing = {}, []
+        with self._lock:
+            for k in keys:
+                v = self._lru.get((self.db.db_name, k))
+                if v is None: missing.append(k); continue
+                self._lru.move_to_end((self.db.db_name, k))
+                hits[k] = v
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            rows = self.db.query(f"SELECT key, {', '.join(self.COLS)} FROM analysis_cache WHERE key IN ({','.join('?' * len(chunk))})",
+                                 chunk, fetch=True)
+            for r in rows:
+                hits[r.pop('key')] = r
+            self._remember({k: hits[k] for k in chunk if k in hits})
+        return hits
+
+    def put(self, entries):
+        # entries: {key: {param_id, result_id, mean, ...}}
+        self.db.executemany(f"INSERT OR REPLACE INTO analysis_cache (key, {', '.join(self.COLS)}) VALUES (?,?,?,?,?,?,?,?)",
+                            [(k, *(v[c] for c in self.COLS)) for k, v in entries.items()])
+        self._remember(entries)
+
+    def _remember(self, entries):
+        with self._lock:
+            for k, v in entries.items():
+                self._lru[(self.db.db_name, k)] = v
+                self._lru.move_to_end((self.db.db_name, k))
+            while len(self._lru) > self.LRU_SIZE: self._lru.popitem(last=False)
+
+    def invalidate_param(self, param_id):
+        self.db.query("DELETE FROM analysis_cache WHERE param_id=?", (param_id,))
+        with self._lock:
+            for k in [k for k, v in self._lru.items() if k[0] == self.db.db_name and v['param_id'] == param_id]:
+                del self._lru[k]
@@ -0,0 +1,104 @@
+import os
+import json
+import math
+import multiprocessing
+import concurrent.futures
+import numpy as np
+
+from .calc import Calculator
+
+# ==================== MONTE CARLO (GUM-S1) ====================
+# Propagation of distributions for Y = mean + d_cal + d_res + d_drift + d_acc:
+#   mean   scaled/shifted t, n-1 degrees of freedom (GUM-S1 6.4.9); with an
+#          autocorrelated Type A mode, n_eff-1 (at least 1)
+#   d_cal  normal, u = cert_unc / k
+#   others rectangular, half-width = res / drift / acc
+# Samples are drawn in CHUNK-sized batches and kept as float32 deviations
+# from the mean, so memory per column is 4 bytes x samples whatever the
+# chunking. Each column gets its own child seed, so results depend on the
+# seed only, never on the number of worker processes.
+class MonteCarlo:
+    SAMPLES = 1_000_000
+    CHUNK = 1 << 18
+    COVERAGE = 0.95
+
+    @classmethod
+    def label(cls, mcm):
+        # What goes in results.method: None for the GUM formula, else the options a result depends on
+        if mcm is None: return None
+        return json.dumps({'samples': mcm.get('samples') or cls.SAMPLES, 'p': mcm.get('p') or cls.COVERAGE,
+                           'seed': mcm.get('seed')}, sort_keys=True)
+
+    @staticmethod
+    def shortest_interval(y, p=COVERAGE):
+        # y sorted; narrowest window holding a fraction p of the samples (GUM-S1 7.7)
+        m = len(y)
+        q = min(max(int(p * m + 0.5), 1), m)
+        r = int(np.argmin(y[q - 1:] - y[:m - q + 1]))
+        return y[r], y[r + q - 1]
+
+    @staticmethod
+    def sample_column(task):
+        # task: (mean, u_a, n_eff, u_cal, res, drift, acc, samples, p, seed)
+        # -> (estimate, standard uncertainty, low, high)
+        mean, u_a, n, u_cal, res, drift, acc, samples, p, seed = task
+        rng = np.random.default_rng(seed)
+        dev = np.empty(samples, dtype=np.float32)
+        total = sq = 0.0
+        for start in range(0, samples, MonteCarlo.CHUNK):
+            m = min(MonteCarlo.CHUNK, samples - start)
+            y = rng.standard_t(max(n - 1, 1), m) * u_a if u_a else np.zeros(m)
+            if u_cal: y += rng.normal(0.0, u_cal, m)
+            for a in (res, drift, acc):
+                if a: y += rng.uniform(-a, a, m)
+            dev[start:start + m] = y
+            total += y.sum(); sq += (y * y).sum()
+
+        shift = total / samples
+        u = math.sqrt(max(sq - samples * shift * shift, 0.0) / max(samples - 1, 1))
+        dev.sort()
+        low, high = MonteCarlo.shortest_interval(dev, p)
+        return mean + shift, u, mean + float(low), mean + float(high)
+
+    @staticmethod
+    def calculate_batch(readings, cert_unc, k, res, drift, acc, samples=SAMPLES, p=COVERAGE,
+                        seed=None, workers=None, progress=None, offsets=None, type_a=None):
+        # Same inputs as Calculator.calculate_batch -> dict of per-column arrays:
+        # n, mean, u_c, low, high, u_exp (half-width of the coverage interval)
+        g = Calculator.calculate_batch(readings, cert_unc, k, res, drift, acc, offsets, type_a)
+        cols = len(g['n'])
+        shape = (cols,)
+        res = np.broadcast_to(np.array(res, dtype=float), shape)
+        drift = np.broadcast_to(np.array(drift, dtype=float), shape)
+        acc = np.broadcast_to(np.array(acc, dtype=float), shape)
+        seeds = np.random.SeedSequence(seed).spawn(cols)
+
+        out = {'n': g['n'], 'n_eff': g['n_eff'], 'mean': np.zeros(cols), 'u_c': np.zeros(cols),
+               'low': np.zeros(cols), 'high': np.zeros(cols), 'u_exp': np.zeros(cols)}
+        todo = [i for i in range(cols) if g['n'][i]]
+        tasks = [(float(g['mean'][i]), float(g['u_a'][i]), float(g['n_eff'][i]), float(g['u_cal'][i]),
+                  float(res[i]), float(drift[i]), float(acc[i]), int(samples), p, seeds[i]) for i in todo]
+
+        def store(i, r):
+            out['mean'][i], out['u_c'][i], out['low'][i], out['high'][i] = r
+            out['u_exp'][i] = (r[3] - r[2]) / 2
+
+        workers = min(workers or os.cpu_count() or 1, len(tasks))
+        if progress: progress(0, len(tasks))
+        if workers <= 1:
+            for done, (i, t) in enumerate(zip(todo, tasks), 1):
+                store(i, MonteCarlo.sample_column(t))
+                if progress: progress(done, len(tasks))
+        else:
+            # spawn: safe to start from the GUI's worker threads
+            with concurrent.futures.ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as ex:
+                futures = {ex.submit(MonteCarlo.sample_column, t): i for i, t in zip(todo, tasks)}
+                try:
+                    for done, f in enumerate(concurrent.futures.as_completed(futures), 1):
+                        store(futures[f], f.result())
+                        if progress: progress(done, len(tasks))
+                except BaseException:
+                    # Cancelled from progress(): drop the queued columns
+                    ex.shutdown(wait=False, cancel_futures=True)
+                    raise
+        return out
@@ -0,0 +1,101 @@
+import json
+import zlib
+import datetime
+import struct
+import numpy as np
+
+# ==================== PROJECTS ====================
+def parse_grid(data_json, n_cols):
+    # Saved grid {col: {row: "text"}} -> (rows x n_cols) matrix, NaN = empty
+    data = json.loads(data_json)
+    cells = [(int(c), int(r), val) for c, rows in data.items() for r, val in rows.items()]
+    values = np.full((max([r for _, r, _ in cells], default=0), n_cols), np.nan)
+    for c, r, val in cells:
+        if c < n_cols:
+            try: values[r-1, c] = float(val)
+            except ValueError: pass
+    return values
+
+class ProjectBlob:
+    # Versioned binary project grid:
+    #   b"SLPJ" | u16 version | u32 header length | header JSON | column blocks
+    # The header lists each stored column (param id, input unit, block offset).
+    # A block is zlib(validity bitmap + float64 of the valid cells) and is only
+    # decompressed the first time column() asks for it.
+    MAGIC = b"SLPJ"
+    VERSION = 1
+    HEAD = struct.Struct("<4sHI")
+    LEVEL = 1 # zlib: float noise barely compresses further, and saves are interactive
+
+    def __init__(self, blob):
+        magic, version, n = self.HEAD.unpack_from(blob)
+        if magic != self.MAGIC: raise ValueError("Not a project blob")
+        if version > self.VERSION: raise ValueError(f"Project format v{version} is newer than this version of the app")
+        self.blob = memoryview(blob)
+        self.base = self.HEAD.size + n
+        meta = json.loads(bytes(self.blob[self.HEAD.size:self.base]))
+        self.rows = meta['rows']
+        self.columns = meta['columns']
+        self._cache = {}
+
+    @classmethod
+    def encode(cls, values, params, units):
+        # values: (rows x params) readings in the input units given by units
+        cols, blocks, offset = [], [], 0
+        for c, p in enumerate(params):
+            valid = ~np.isnan(values[:, c])
+            if not valid.any(): continue
+            block = zlib.compress(np.packbits(valid).tobytes() + values[valid, c].astype('<f8').tobytes(), cls.LEVEL)
+            cols.append({'param_id': p['id'], 'name': p['name'], 'unit': units[c],
+                         'count': int(valid.sum()), 'offset': offset, 'length': len(block)})
+            blocks.append(block)
+            offset += len(block)
+        head = json.dumps({'rows': len(values), 'columns': cols}).encode()
+        return cls.HEAD.pack(cls.MAGIC, cls.VERSION, len(head)) + head + b"".join(blocks)
+
+    def column(self, i):
+        if i not in self._cache:
+            col = self.columns[i]
+            start = self.base + col['offset']
+            raw = zlib.decompress(self.blob[start:start + col['length']])
+            nbits = (self.rows + 7) // 8
+            valid = np.unpackbits(np.frombuffer(raw, np.uint8, nbits), count=self.rows).astype(bool)
+            out = np.full(self.rows, np.nan)
+            out[valid] = np.frombuffer(raw, '<f8', offset=nbits)
+            self._cache[i] = out
+        return self._cache[i]
+
+    def matrix(self, params):
+        # Decode everything -> ((rows x params) readings, input unit per param)
+        by_id = {col['param_id']: i for i, col in enumerate(self.columns)}
+        values = np.full((self.rows, len(params)), np.nan)
+        units = [p['unit'] for p in params]
+        for c, p in enumerate(params):
+            if p['id'] in by_id:
+                values[:, c] = self.column(by_id[p['id']])
+                units[c] = self.columns[by_id[p['id']]]['unit']
+        return values, units
+
+def project_matrix(data_json, data_blob, params):
+    # Either storage format -> ((rows x params) readings, input unit per param).
+    # Legacy JSON grids carry no units: they were entered in the params' units.
+    if data_blob is not None: return ProjectBlob(data_blob).matrix(params)
+    return parse_grid(data_json or "{}", len(params)), [p['unit'] for p in params]
+
+def save_project(db, name, values, params, units, pid=None):
+    # Stores the grid as a ProjectBlob -> project id. pid: the project being
+    # edited (its row is overwritten, so a legacy JSON grid is converted in
+    # place), or None for a new project.
+    now = datetime.datetime.now()
+    pid = pid or now.strftime("%Y%m%d%H%M%S")
+    db.query("INSERT OR REPLACE INTO projects (id, name, last_modified, data_json, data_blob) VALUES (?,?,?,NULL,?)",
+             (pid, name, now.strftime("%Y-%m-%d %H:%M"), ProjectBlob.encode(values, params, units)))
+    return pid
+
+def read_project(db, pid, n_cols):
+    # -> (project row, ProjectBlob | legacy (rows x n_cols) readings matrix)
+    row = db.query("SELECT * FROM projects WHERE id=?", (pid,), fetch=True)
+    if not row: return None, None
+    p = row[0]
+    if p['data_blob'] is not None: return p, ProjectBlob(p['data_blob'])
+    return p, parse_grid(p['data_json'] or "{}", n_cols)
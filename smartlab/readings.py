@@ -0,0 +1,129 @@
+import os
+import mmap
+import hashlib
+import threading
+import numpy as np
+
+from .calc import Calculator
+
+# ==================== RAW READINGS STORE ====================
+# Append-only record of the converted readings behind every result, so a
+# result can be pulled up and re-verified long after the grid is gone.
+#   <db>.readings/seg-000001.f64 ...  raw little-endian float64, only appended
+#   readings_index table               result id -> (segment, offset, count, blake2b)
+# Bytes are written (and fsync'd) inside the caller's SQLite write
+# transaction, after the results insert took the write lock, so concurrent
+# writers - threads or processes - never interleave appends. A rollback
+# leaves unreferenced bytes behind; the index is the only way in.
+# Reads are zero-copy read-only NumPy views over mmap'd segments.
+class ReadingStore:
+    SEGMENT_BYTES = 256 << 20 # roll over to a new segment file past this size
+    DTYPE = np.dtype('<f8')
+    _lock = threading.Lock()
+
+    def __init__(self, db):
+        self.db = db
+        self.dir = os.path.abspath(db.db_name) + ".readings"
+        self._maps = {}
+
+    def _path(self, seg):
+        return os.path.join(self.dir, f"seg-{seg:06d}.f64")
+
+    @staticmethod
+    def digest(x):
+        return hashlib.blake2b(np.ascontiguousarray(x, dtype='<f8').tobytes(), digest_size=16).digest()
+
+    def append(self, result_ids, readings):
+        # readings: one 1-D array per result id. Must run inside a write transaction.
+        if not len(result_ids): return 0
+        chunks = [np.ascontiguousarray(x, dtype=self.DTYPE).ravel() for x in readings]
+        with self._lock:
+            os.makedirs(self.dir, exist_ok=True)
+            segs = sorted(int(f[4:10]) for f in os.listdir(self.dir) if f.startswith("seg-") and f.endswith(".f64"))
+            seg = segs[-1] if segs else 1
+            if os.path.exists(self._path(seg)) and os.path.getsize(self._path(seg)) >= self.SEGMENT_BYTES: seg += 1
+            with open(self._path(seg), "ab") as f:
+                pos = f.tell() // self.DTYPE.itemsize
+                index = []
+                for rid, x in zip(result_ids, chunks):
+                    index.append((int(rid), seg, pos, len(x), self.digest(x)))
+                    pos += len(x)
+                f.write(b"".join(x.tobytes() for x in chunks))
+                f.flush()
+                os.fsync(f.fileno())
+        self.db.executemany("INSERT OR REPLACE INTO readings_index (result_id, segment, offset, n, digest) VALUES (?,?,?,?,?)", index)
+        return len(index)
+
+    def _view(self, seg, offset, n):
+        if not n: return np.empty(0, self.DTYPE)
+        end = (offset + n) * self.DTYPE.itemsize
+        mm = self._maps.get(seg)
+        if mm is None or len(mm) < end:
+            # Segment grew since it was mapped: map it again (old views keep the old map alive)
+            with open(self._path(seg), "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[seg] = mm
+        return np.frombuffer(mm, self.DTYPE, n, offset * self.DTYPE.itemsize)
+
+    def index(self, result_ids):
+        # -> {result id: index row}
+        out, ids = {}, [int(i) for i in result_ids]
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            for r in self.db.query(f"SELECT * FROM readings_index WHERE result_id IN ({','.join('?' * len(chunk))})",
+                                   chunk, fetch=True):
+                out[r['result_id']] = r
+        return out
+
+    def get(self, result_id):
+        # -> read-only float64 view of the result's readings, or None if none were stored
+        return self.get_many([result_id]).get(int(result_id))
+
+    def get_many(self, result_ids):
+        return {rid: self._view(r['segment'], r['offset'], r['n']) for rid, r in self.index(result_ids).items()}
+
+    def verify(self, result_ids):
+        # Re-derives each stored result from its readings and the calibration
+        # version it is linked to, in the result's Type A mode (bootstrap is
+        # seeded, so it repeats). GUM results must match the recomputation.
+        # A Monte Carlo column cannot be re-drawn on its own (its seed is
+        # spawned by position in the batch), so those are checked on the
+        # digest and on the arithmetic mean lying within the stored interval.
+        # -> [{result_id, n, method, digest_ok, mean, u_exp, stored_mean, stored_u_exp, ok}]
+        idx = self.index(result_ids)
+        if not idx: return []
+        ids = sorted(idx)
+        stored = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            for r in self.db.query(f"SELECT id, mean, u_exp, min_trust, max_trust, cal_id, type_a, method FROM results WHERE id IN ({','.join('?' * len(chunk))})",
+                                   chunk, fetch=True):
+                stored[r['id']] = r
+        ids = [i for i in ids if i in stored]
+        if not ids: return []
+        cals = self.db.history.versions([stored[i]['cal_id'] for i in ids])
+        views = [self._view(idx[i]['segment'], idx[i]['offset'], idx[i]['n']) for i in ids]
+        cal = [cals.get(stored[i]['cal_id']) or {} for i in ids]
+        arg = lambda k, sel: [cal[c].get(k) or 0.0 for c in sel]
+        mean, u = np.zeros(len(ids)), np.zeros(len(ids))
+        # One batch per Type A mode the results were computed with
+        for mode in {stored[i]['type_a'] for i in ids}:
+            sel = [c for c, i in enumerate(ids) if stored[i]['type_a'] == mode]
+            res = Calculator.calculate_batch(np.concatenate([views[c] for c in sel]),
+                                             arg('cert_unc', sel), arg('k_factor', sel), arg('resolution', sel),
+                                             arg('drift', sel), arg('accuracy', sel),
+                                             offsets=np.concatenate([[0], np.cumsum([len(views[c]) for c in sel])]), type_a=mode)
+            mean[sel], u[sel] = res['mean'], res['u_exp']
+        out = []
+        for c, i in enumerate(ids):
+            s = stored[i]
+            ok_digest = self.digest(views[c]) == idx[i]['digest']
+            mean_c, u_c = float(mean[c]), float(u[c])
+            if s['mean'] is None: ok = False
+            elif s['method']: ok = s['min_trust'] <= mean_c <= s['max_trust']
+            else: ok = (np.isclose(mean_c, s['mean'], rtol=1e-12, atol=1e-12)
+                        and (not cal[c] or np.isclose(u_c, s['u_exp'] or 0.0, rtol=1e-9, atol=1e-12)))
+            out.append({'result_id': i, 'n': idx[i]['n'], 'method': "mcm" if s['method'] else "gum", 'digest_ok': ok_digest,
+                        'mean': mean_c, 'u_exp': u_c, 'stored_mean': s['mean'], 'stored_u_exp': s['u_exp'],
+                        'ok': bool(ok_digest and ok)})
+        return out
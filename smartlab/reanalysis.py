@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import datetime
+import concurrent.futures
+
+from .db import DataManager
+from .calc import Calculator
+from .analysis import active_columns, column_readings, result_rows
+from .projects import project_matrix
+
+# ==================== RE-ANALYSIS ====================
+# Recomputes every saved project against the current calibration profiles.
+# Projects are read in chunks and fanned out to worker processes (pure
+# computation, no DB access); the parent is the single writer and commits
+# results in large batches.
+_reanalysis = {}
+
+def _reanalysis_init(params, cols, auditor, ts):
+    _reanalysis.update(params=params, cols=cols, auditor=auditor, ts=ts)
+
+def _reanalyze_chunk(projects):
+    cfg = _reanalysis
+    rows, readings = [], []
+    for pid, name, data_json, data_blob in projects:
+        data, units = project_matrix(data_json, data_blob, cfg['params'])
+        if not len(data): continue
+        for c, p in enumerate(cfg['params']):
+            data[:, c] = Calculator.convert(data[:, c], units[c], p['unit'])
+        rows.extend(result_rows(name, cfg['cols'], data, cfg['auditor'], cfg['ts']))
+        readings.extend(column_readings(cfg['cols'], data))
+    return len(projects), rows, readings
+
+def reanalyze_projects(db_name, auditor="Re-analysis", workers=None, chunk_size=250, commit_every=50000, progress=None):
+    db = DataManager(db_name)
+    params = db.calibs.params()
+    cols = active_columns(db, params)
+    ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    total = db.conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0]
+    
+    # Separate read connection: WAL gives it a stable snapshot while we write
+    reader = sqlite3.connect(db_name)
+    cur = reader.execute("SELECT id, name, data_json, data_blob FROM projects ORDER BY id")
+    workers = workers or os.cpu_count() or 1
+    done = written = 0
+    pending, batch, readings = set(), [], []
+    
+    def flush():
+        nonlocal written
+        with db.transaction(): db.insert_results(batch, readings)
+        written += len(batch)
+        batch.clear()
+        readings.clear()
+    
+    with concurrent.futures.ProcessPoolExecutor(workers, initializer=_reanalysis_init,
+                                                initargs=(params, cols, auditor, ts)) as ex:
+        while True:
+            # Keep a bounded number of chunks in flight
+            while len(pending) < workers * 4:
+                chunk = cur.fetchmany(chunk_size)
+                if not chunk: break
+                pending.add(ex.submit(_reanalyze_chunk, chunk))
+            if not pending: break
+            finished, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for f in finished:
+                n, rows, vals = f.result()
+                done += n
+                batch.extend(rows)
+                readings.extend(vals)
+            if len(batch) >= commit_every: flush()
+            if progress: progress(done, total)
+    if batch: flush()
+    reader.close()
+    db.conn.close()
+    return done, written
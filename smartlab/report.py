@@ -0,0 +1,111 @@
+import datetime
+
+# PDF Generation
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, CondPageBreak
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib import colors
+
+from .config import APP_NAME, COPYRIGHT_SIG
+from .db import results_where
+
+# ==================== REPORTS ====================
+class FlowableStream(list):
+    # A list that refills itself from a generator while reportlab's build loop
+    # consumes it from the front, so only a few pages of flowables exist at once.
+    # The loop only uses len(), [0], del [0] and [0:0] = split parts;
+    # tests/test_report.py checks the output against a plain-list build.
+    LOW = 8
+
+    def __init__(self, gen):
+        super().__init__()
+        self.gen = gen
+
+    def _refill(self):
+        while self.gen is not None and list.__len__(self) < self.LOW:
+            f = next(self.gen, None)
+            if f is None: self.gen = None
+            else: self.append(f)
+
+    def __len__(self):
+        self._refill()
+        return list.__len__(self)
+
+    def __getitem__(self, i):
+        self._refill()
+        return list.__getitem__(self, i)
+
+class ReportBuilder:
+    # Streams results from a cursor into page-sized tables (header repeated on
+    # every split), optionally one section per project. Memory stays flat in
+    # the number of results.
+    HEADERS = ["Project", "Parameter", "Mean", "Uncertainty", "Status"]
+    COL_WIDTHS = [150, 90, 75, 75, 60]
+    ROW_HEIGHT = 14
+    ROWS_PER_TABLE = 45
+    FETCH = 2000
+
+    def __init__(self, db, filters=None, by_project=False, progress=None):
+        self.db = db
+        self.filters = filters or {}
+        self.by_project = by_project
+        self.progress = progress # progress(rows_done, rows_total) per fetch
+        self.rows_done = 0
+        self.style = TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.navy),
+            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+            ('GRID', (0,0), (-1,-1), 1, colors.black)
+        ])
+
+    def count(self):
+        where, args = results_where(self.filters)
+        return self.db.conn.execute(f"SELECT COUNT(*) FROM results{where}", args).fetchone()[0]
+
+    def rows(self):
+        where, args = results_where(self.filters)
+        order = "project, id" if self.by_project else "id"
+        total = self.count()
+        cur = self.db.conn.execute(f"SELECT project, param, mean, u_exp, status FROM results{where} ORDER BY {order}", args)
+        while True:
+            chunk = cur.fetchmany(self.FETCH)
+            if not chunk: break
+            yield from chunk
+            self.rows_done += len(chunk)
+            if self.progress: self.progress(self.rows_done, total)
+
+    def table(self, rows):
+        t = Table([self.HEADERS] + rows, colWidths=self.COL_WIDTHS, rowHeights=self.ROW_HEIGHT,
+                  repeatRows=1, splitByRow=1)
+        t.setStyle(self.style)
+        return t
+
+    def flowables(self, username):
+        styles = getSampleStyleSheet()
+        yield Paragraph(f"{APP_NAME} Report", styles['Title'])
+        yield Paragraph(f"Generated by: {username} | Date: {datetime.datetime.now()}", styles['Normal'])
+        if self.filters:
+            yield Paragraph("Filters: " + ", ".join(f"{k}={v}" for k, v in self.filters.items()), styles['Normal'])
+        yield Spacer(1, 20)
+        
+        block, project = [], None
+        for r in self.rows():
+            if self.by_project and r['project'] != project:
+                if block: yield self.table(block)
+                block, project = [], r['project']
+                yield CondPageBreak(80)
+                yield Paragraph(f"Project: {project}", styles['Heading2'])
+            block.append([r['project'], r['param'], f"{r['mean']:.3f}", f"{r['u_exp']:.3f}", r['status']])
+            if len(block) == self.ROWS_PER_TABLE:
+                yield self.table(block)
+                block = []
+        if block or not self.rows_done: yield self.table(block)
+        
+        # Sig
+        yield Spacer(1, 40)
+        yield Paragraph(COPYRIGHT_SIG, styles['Normal'])
+
+    def build(self, path, username):
+        doc = SimpleDocTemplate(path, pagesize=A4, pageCompression=1) # finished pages are held until save
+        doc.build(FlowableStream(self.flowables(username)))
+        return doc.page
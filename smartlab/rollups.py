@@ -0,0 +1,98 @@
+import math
+import numpy as np
+
+# ==================== ROLLUPS ====================
+# results_daily keeps one row of mergeable statistics per (param, project, day):
+# count, mean and sum of squared deviations of the result means (Chan/Welford),
+# U sum / max, min / max mean and WARN / FAIL counts. insert_results folds every
+# batch in inside its transaction, so trend queries read a few thousand daily
+# rows instead of scanning results. rebuild() recomputes it from scratch.
+class Rollups:
+    COLS = ['param', 'project', 'day', 'n', 'mean', 'm2', 'u_sum', 'u_max', 'lo', 'hi', 'n_warn', 'n_fail']
+    BUCKETS = {'day': "day", 'week': "strftime('%Y-W%W', day)", 'month': "substr(day, 1, 7)",
+               'year': "substr(day, 1, 4)", 'all': "''"}
+
+    # Same statistics straight from results (migration backfill and rebuild)
+    REBUILD = """INSERT INTO results_daily (param, project, day, n, mean, m2, u_sum, u_max, lo, hi, n_warn, n_fail)
+                 SELECT param, project, day, COUNT(*), m, SUM((mean - m) * (mean - m)), TOTAL(u_exp), MAX(u_exp),
+                        MIN(mean), MAX(mean), SUM(status = 'WARN'), SUM(status = 'FAIL')
+                 FROM (SELECT COALESCE(param, '') AS param, COALESCE(project, '') AS project,
+                              COALESCE(substr(timestamp, 1, 10), '') AS day, mean, u_exp, status,
+                              AVG(mean) OVER (PARTITION BY COALESCE(param, ''), COALESCE(project, ''),
+                                                          COALESCE(substr(timestamp, 1, 10), '')) AS m
+                       FROM results WHERE mean IS NOT NULL)
+                 GROUP BY param, project, day"""
+
+    # Chan's merge of a batch's (n, mean, m2) into the stored day
+    UPSERT = """INSERT INTO results_daily (param, project, day, n, mean, m2, u_sum, u_max, lo, hi, n_warn, n_fail)
+                VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
+                ON CONFLICT (param, project, day) DO UPDATE SET
+                    n = n + excluded.n,
+                    mean = mean + (excluded.mean - mean) * excluded.n / (n + excluded.n),
+                    m2 = m2 + excluded.m2 + (excluded.mean - mean) * (excluded.mean - mean) * n * excluded.n / (n + excluded.n),
+                    u_sum = u_sum + excluded.u_sum,
+                    u_max = MAX(COALESCE(u_max, excluded.u_max), COALESCE(excluded.u_max, u_max)),
+                    lo = MIN(lo, excluded.lo), hi = MAX(hi, excluded.hi),
+                    n_warn = n_warn + excluded.n_warn, n_fail = n_fail + excluded.n_fail"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def add(self, rows):
+        # rows: as for DataManager.insert_results; aggregated per day with NumPy,
+        # then one upsert per (param, project, day) touched
+        groups, inv, x, u, st = {}, [], [], [], []
+        for r in rows:
+            if r[2] is None: continue
+            inv.append(groups.setdefault((r[1] or "", r[0] or "", (r[7] or "")[:10]), len(groups)))
+            x.append(r[2]); u.append(r[3]); st.append(r[6])
+        if not groups: return 0
+        g = len(groups)
+        inv = np.array(inv)
+        x = np.array(x, dtype=float)
+        u = np.array(u, dtype=float) # None -> NaN
+        st = np.array(st, dtype=object)
+        n = np.bincount(inv, minlength=g)
+        mean = np.bincount(inv, x, g) / n
+        d = x - mean[inv]
+        m2 = np.bincount(inv, d * d, g)
+        u_sum = np.bincount(inv, np.nan_to_num(u), g)
+        u_max = np.full(g, -np.inf); np.maximum.at(u_max, inv, np.where(np.isnan(u), -np.inf, u))
+        lo = np.full(g, np.inf); np.minimum.at(lo, inv, x)
+        hi = np.full(g, -np.inf); np.maximum.at(hi, inv, x)
+        warn = np.bincount(inv, st == "WARN", g)
+        fail = np.bincount(inv, st == "FAIL", g)
+        self.db.executemany(self.UPSERT, [
+            (*key, int(n[i]), float(mean[i]), float(m2[i]), float(u_sum[i]),
+             float(u_max[i]) if u_max[i] > -np.inf else None, float(lo[i]), float(hi[i]), int(warn[i]), int(fail[i]))
+            for key, i in groups.items()])
+        return g
+
+    def rebuild(self):
+        # -> number of daily rows
+        with self.db.transaction():
+            self.db.query("DELETE FROM results_daily")
+            self.db.query(self.REBUILD)
+        return self.db.conn.execute("SELECT COUNT(*) FROM results_daily").fetchone()[0]
+
+    def trend(self, param, project=None, date_from=None, date_to=None, bucket="month"):
+        # -> [{period, n, mean, stdev, min, max, u_mean, u_max, n_pass, n_warn, n_fail}] ordered by period.
+        # Buckets are merged exactly: m2 adds each day's m2 plus n * (day mean - bucket mean)^2.
+        if bucket not in self.BUCKETS: raise ValueError(f"bucket must be one of {', '.join(self.BUCKETS)}")
+        clauses, args = ["param = ?"], [param]
+        if project: clauses.append("project = ?"); args.append(project)
+        if date_from: clauses.append("day >= ?"); args.append(date_from)
+        if date_to: clauses.append("day <= ?"); args.append(date_to)
+        rows = self.db.query(f"""
+            WITH d AS (SELECT {self.BUCKETS[bucket]} AS period, n, mean, m2, u_sum, u_max, lo, hi, n_warn, n_fail
+                       FROM results_daily WHERE {' AND '.join(clauses)}),
+                 g AS (SELECT period, SUM(n) AS n, SUM(n * mean) / SUM(n) AS mean FROM d GROUP BY period)
+            SELECT g.period, g.n, g.mean, SUM(d.m2 + d.n * (d.mean - g.mean) * (d.mean - g.mean)) AS m2,
+                   SUM(d.u_sum) / g.n AS u_mean, MAX(d.u_max) AS u_max, MIN(d.lo) AS min, MAX(d.hi) AS max,
+                   SUM(d.n_warn) AS n_warn, SUM(d.n_fail) AS n_fail
+            FROM d JOIN g USING (period) GROUP BY g.period ORDER BY g.period""", args, fetch=True)
+        for r in rows:
+            m2 = r.pop('m2')
+            r['stdev'] = math.sqrt(max(m2, 0.0) / (r['n'] - 1)) if r['n'] > 1 else 0.0
+            r['n_pass'] = r['n'] - r['n_warn'] - r['n_fail']
+        return rows
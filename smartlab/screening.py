@@ -0,0 +1,158 @@
+import math
+import json
+import functools
+import statistics
+import numpy as np
+
+# ==================== OUTLIER SCREENING ====================
+# Pre-analysis screening of every column at once. Columns are laid out as
+# one flat array of ragged segments (offsets, as in calculate_batch); all
+# per-column statistics are bincount / sort passes over that array, so a
+# whole grid costs a few O(N log N) sorts, not a Python loop per column.
+#   mad     modified Z-score |0.6745 (x - median) / MAD| > threshold (Iglewicz & Hoaglin, 3.5)
+#   grubbs  two-sided Grubbs test at alpha, repeated until nothing is significant
+#   dixon   Dixon's Q (r10) at 95 %, both ends, 3 <= n <= 30 only
+# Flagged readings are reported, never dropped silently: with exclude=False
+# they stay in the calculation and are only recorded with the result.
+class Screening:
+    METHODS = ('mad', 'grubbs', 'dixon')
+    DEFAULTS = {'method': 'mad', 'alpha': 0.05, 'threshold': 3.5, 'exclude': True, 'max_outliers': 10}
+    # Rorabacher (1991), r10, two-sided alpha = 0.05, n = 3 .. 30
+    DIXON_Q95 = [0.970, 0.829, 0.710, 0.625, 0.568, 0.526, 0.493, 0.466, 0.444, 0.426, 0.410, 0.396, 0.384, 0.374,
+                 0.365, 0.356, 0.349, 0.342, 0.337, 0.331, 0.326, 0.321, 0.317, 0.312, 0.308, 0.305, 0.301, 0.298]
+
+    @classmethod
+    def config(cls, screen):
+        # None / method name / partial dict -> full config dict (None = no screening); ValueError if invalid
+        if not screen: return None
+        cfg = dict(cls.DEFAULTS, **({'method': screen} if isinstance(screen, str) else screen))
+        if cfg['method'] not in cls.METHODS: raise ValueError(f"screening method must be one of {', '.join(cls.METHODS)}")
+        if not 0 < float(cfg['alpha']) < 0.5: raise ValueError("screening alpha must be between 0 and 0.5")
+        if float(cfg['threshold']) <= 0: raise ValueError("screening threshold must be positive")
+        return {k: cfg[k] for k in cls.DEFAULTS}
+
+    @staticmethod
+    def label(cfg):
+        # What goes in results.screening
+        return json.dumps(cfg, sort_keys=True) if cfg else None
+
+    @classmethod
+    def screen(cls, data, cfg):
+        # data: (rows x columns), NaN = empty -> bool mask of flagged cells
+        x = np.asarray(data, dtype=float)
+        valid = ~np.isnan(x)
+        # column-major so each column is one contiguous segment
+        vals = x.T[valid.T]
+        offsets = np.concatenate([[0], np.cumsum(valid.sum(axis=0))])
+        flags = np.zeros(x.shape, dtype=bool)
+        flags.T[valid.T] = cls.screen_flat(vals, offsets, cfg)
+        return flags
+
+    @classmethod
+    def screen_flat(cls, vals, offsets, cfg):
+        # Ragged columns vals[offsets[i]:offsets[i+1]] -> bool mask over vals
+        vals = np.asarray(vals, dtype=float)
+        offsets = np.asarray(offsets, dtype=np.intp)
+        n = np.diff(offsets)
+        seg = np.repeat(np.arange(len(n)), n)
+        vals = vals[offsets[0]:offsets[-1]]
+        if not len(vals): return np.zeros(0, dtype=bool)
+        return getattr(cls, '_' + cfg['method'])(vals, seg, n, offsets - offsets[0], cfg)
+
+    @staticmethod
+    def _sorted(vals, seg):
+        # -> permutation sorting vals within each segment (segments stay in order).
+        # Sort by value, then stable-sort by segment: with < 65536 segments that
+        # second pass is a radix sort, ~4x faster than lexsort.
+        if not len(seg) or seg[-1] >= 1 << 16: return np.lexsort((vals, seg))
+        o = np.argsort(vals)
+        return o[np.argsort(seg[o].astype(np.uint16), kind='stable')]
+
+    @classmethod
+    def _median(cls, vals, seg, n, starts):
+        s = vals[cls._sorted(vals, seg)]
+        lo = starts + np.maximum(n - 1, 0) // 2
+        hi = starts + n // 2
+        idx = np.minimum([lo, hi], len(s) - 1)
+        return np.where(n > 0, (s[idx[0]] + s[idx[1]]) / 2, np.nan)
+
+    @classmethod
+    def _mad(cls, vals, seg, n, offsets, cfg):
+        starts = offsets[:-1]
+        med = cls._median(vals, seg, n, starts)
+        dev = np.abs(vals - med[seg])
+        mad = cls._median(dev, seg, n, starts)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = 0.6745 * dev / mad[seg]
+        return (mad[seg] > 0) & (z > float(cfg['threshold']))
+
+    @classmethod
+    def _grubbs(cls, vals, seg, n, offsets, cfg):
+        flags = np.zeros(len(vals), dtype=bool)
+        alpha = float(cfg['alpha'])
+        starts = offsets[:-1]
+        for _ in range(int(cfg['max_outliers'])):
+            keep = ~flags
+            m = np.bincount(seg, keep, len(n))
+            mean = np.bincount(seg, np.where(keep, vals, 0.0), len(n)) / np.maximum(m, 1)
+            dev = np.where(keep, np.abs(vals - mean[seg]), -1.0)
+            ss = np.bincount(seg, np.where(keep, dev * dev, 0.0), len(n))
+            sd = np.sqrt(ss / np.maximum(m - 1, 1))
+            top = np.full(len(n), -1.0)
+            nz = n > 0
+            top[nz] = np.maximum.reduceat(dev, starts[nz])
+            crit = np.array([cls.grubbs_critical(int(k), alpha) for k in m])
+            with np.errstate(invalid='ignore'):
+                hit = (m >= 3) & (sd > 0) & (top > crit * sd)
+            if not hit.any(): break
+            new = hit[seg] & keep & (dev == top[seg])
+            flags |= new
+        return flags
+
+    @classmethod
+    def _dixon(cls, vals, seg, n, offsets, cfg):
+        order = cls._sorted(vals, seg)
+        s = vals[order]
+        starts, ends = offsets[:-1], offsets[1:] - 1
+        ok = (n >= 3) & (n <= len(cls.DIXON_Q95) + 2)
+        a, b = np.where(ok, starts, 0), np.where(ok, ends, 0)
+        rng = s[b] - s[a]
+        q = np.array(cls.DIXON_Q95)[np.clip(n - 3, 0, len(cls.DIXON_Q95) - 1)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            low = ok & (rng > 0) & ((s[np.minimum(a + 1, b)] - s[a]) / rng > q)
+            high = ok & (rng > 0) & ((s[b] - s[np.maximum(b - 1, a)]) / rng > q)
+        flags = np.zeros(len(vals), dtype=bool)
+        flags[order[a[low]]] = True
+        flags[order[b[high]]] = True
+        return flags
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def grubbs_critical(n, alpha=0.05):
+        # Two-sided Grubbs critical G for n readings
+        if n < 3: return math.inf
+        t = Screening.t_quantile(alpha / n, n - 2)
+        return (n - 1) / math.sqrt(n) * math.sqrt(t * t / (n - 2 + t * t))
+
+    @staticmethod
+    def t_quantile(p, df):
+        # Upper quantile t with P(|T| > t) = p for Student's t (Hill 1970, ACM Algorithm 396)
+        if df == 1: return 1 / math.tan(p * math.pi / 2)
+        if df == 2: return math.sqrt(2 / (p * (2 - p)) - 2)
+        a = 1 / (df - 0.5)
+        b = 48 / (a * a)
+        c = ((20700 * a / b - 98) * a - 16) * a + 96.36
+        d = ((94.5 / (b + c) - 3) / b + 1) * math.sqrt(a * math.pi / 2) * df
+        x = d * p
+        y = x ** (2 / df)
+        if y > 0.05 + a:
+            x = statistics.NormalDist().inv_cdf(0.5 * p)
+            y = x * x
+            if df < 5: c += 0.3 * (df - 4.5) * (x + 0.6)
+            c = (((0.05 * d * x - 5) * x - 7) * x - 2) * x + b + c
+            y = (((((0.4 * y + 6.3) * y + 36) * y + 94.5) / c - y - 3) / b + 1) * x
+            y = math.expm1(a * y * y)
+        else:
+            y = ((1 / (((df + 6) / (df * y) - 0.089 * d - 0.822) * (df + 2) * 3) + 0.5 / (df + 4)) * y - 1) \
+                * (df + 1) / (df + 2) + 1 / y
+        return math.sqrt(df * y)
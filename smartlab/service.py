@@ -0,0 +1,235 @@
+import os
+import json
+import asyncio
+import datetime
+import threading
+import urllib.parse
+import concurrent.futures
+
+from .config import APP_NAME, ver_str
+from .db import DataManager, results_where
+from .analysis import analyze_sets
+from .screening import Screening
+from .autocorr import Autocorrelation
+
+# ==================== HTTP SERVICE ====================
+# Local HTTP/JSON front end to the analysis engine for LIMS / instrument
+# pushes. Plain asyncio streams (HTTP/1.1, keep-alive, Content-Length
+# bodies); the event loop only reads, routes and writes bytes. JSON decoding
+# and encoding, SQLite and NumPy work run in a thread pool, one DataManager
+# connection per worker thread; result inserts take a single writer lock
+# instead of racing for SQLite's.
+#
+#   GET  /health
+#   GET  /params                   parameters + active calibration device
+#   POST /analyze                  {"project", "sets": [{"param", "readings", "unit"?, "project"?}],
+#                                   "save"?, "method"?: "gum" | "mcm", "samples"?, "seed"?,
+#                                   "screen"?: "mad" | "grubbs" | "dixon" | {"method", "alpha", "threshold", "exclude"},
+#                                   "type_a"?: "iid" | "acf" | "bootstrap"}
+#   GET  /results?project=&param=&status=&from=&to=&before=&limit=
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class AnalysisService:
+    MAX_HEADER = 64 << 10
+    MAX_BODY = 64 << 20
+    MAX_SETS = 100_000
+    MAX_LIMIT = 5000
+    MAX_SAMPLES = 10_000_000
+    REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+    def __init__(self, db_name, workers=None, auditor="Service"):
+        self.db_name = db_name
+        self.auditor = auditor
+        self.workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        self.pool = concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix="smartlab-service")
+        self.write_lock = threading.Lock()
+        self.routes = {
+            "/health": {"GET": self.health},
+            "/params": {"GET": self.params},
+            "/analyze": {"POST": self.analyze},
+            "/results": {"GET": self.results},
+        }
+        DataManager(db_name).conn.close() # create / migrate once, up front
+
+    def db(self):
+        # Worker threads only
+        return DataManager.for_thread(self.db_name)
+
+    def offload(self, fn, *args):
+        return asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    # -------- endpoints --------
+    async def health(self, query, body):
+        return {'status': "ok", 'app': APP_NAME, 'version': ver_str}
+
+    async def params(self, query, body):
+        def work():
+            db = self.db()
+            db.calibs.invalidate() # the desktop app may have changed them
+            return self.encode({'params': [dict(p, device=(db.calibs.active(p['id']) or {}).get('device'))
+                                           for p in db.calibs.params()]})
+        return await self.offload(work)
+
+    async def analyze(self, query, body):
+        def work():
+            req = self.json_body(body)
+            sets = req.get('sets')
+            if not isinstance(sets, list): raise HttpError(400, "'sets' must be a list")
+            if len(sets) > self.MAX_SETS: raise HttpError(413, f"at most {self.MAX_SETS} sets per request")
+            for i, st in enumerate(sets):
+                if not isinstance(st, dict): continue # reported per set by analyze_sets
+                if isinstance(st.get('param'), bool) or not isinstance(st.get('param'), (str, int, type(None))):
+                    raise HttpError(400, f"sets[{i}]: 'param' must be a parameter name or id")
+                if not isinstance(st.get('project'), (str, type(None))): raise HttpError(400, f"sets[{i}]: 'project' must be a string")
+            method = req.get('method', "gum")
+            if method not in ("gum", "mcm"): raise HttpError(400, "'method' must be 'gum' or 'mcm'")
+            mcm = {k: req[k] for k in ("samples", "seed") if k in req} if method == "mcm" else None
+            if mcm and not (isinstance(mcm.get('samples', 1), int) and 0 < mcm.get('samples', 1) <= self.MAX_SAMPLES):
+                raise HttpError(400, f"'samples' must be an integer up to {self.MAX_SAMPLES}")
+            if mcm and mcm.get('seed') is not None and (isinstance(mcm['seed'], bool) or not isinstance(mcm['seed'], int) or mcm['seed'] < 0):
+                raise HttpError(400, "'seed' must be a non-negative integer")
+            try:
+                screen = Screening.config(req.get('screen'))
+            except (TypeError, ValueError) as e:
+                raise HttpError(400, f"'screen': {e}")
+            try:
+                type_a = Autocorrelation.mode(req.get('type_a'))
+            except (TypeError, ValueError) as e:
+                raise HttpError(400, f"'type_a': {e}")
+            
+            db = self.db()
+            db.calibs.invalidate()
+            out, rows, readings = analyze_sets(db, str(req.get('project') or "Service"), sets,
+                                               str(req.get('auditor') or self.auditor), mcm=mcm, screen=screen,
+                                               type_a=type_a)
+            saved = 0
+            if req.get('save') and rows:
+                with self.write_lock, db.transaction(): db.insert_results(rows, readings)
+                saved = len(rows)
+            return self.encode({'results': out, 'saved': saved})
+        return await self.offload(work)
+
+    async def results(self, query, body):
+        filters = {k: query.get(q) for k, q in [('project', 'project'), ('param', 'param'), ('status', 'status'),
+                                                ('date_from', 'from'), ('date_to', 'to')] if query.get(q)}
+        try:
+            limit = max(1, min(int(query.get('limit', 500)), self.MAX_LIMIT))
+            before = int(query['before']) if query.get('before') else None
+        except ValueError:
+            raise HttpError(400, "'limit' and 'before' must be integers")
+        try:
+            if 'date_to' in filters: datetime.date.fromisoformat(filters['date_to'])
+        except ValueError:
+            raise HttpError(400, "'to' must be a date (YYYY-MM-DD)")
+
+        def work():
+            # Keyset paging like the Results tab: pass the last id back as ?before=
+            where, args = results_where(filters, ["id < ?"] if before else [])
+            if before: args.insert(0, before)
+            rows = self.db().query(f"SELECT * FROM results{where} ORDER BY id DESC LIMIT ?", (*args, limit), fetch=True)
+            return self.encode({'results': rows, 'next': rows[-1]['id'] if len(rows) == limit else None})
+        return await self.offload(work)
+
+    @staticmethod
+    def encode(payload):
+        return json.dumps(payload, separators=(",", ":")).encode()
+
+    @staticmethod
+    def json_body(body):
+        try:
+            req = json.loads(body or b"{}")
+        except ValueError as e:
+            raise HttpError(400, f"invalid JSON: {e}")
+        if not isinstance(req, dict): raise HttpError(400, "expected a JSON object")
+        return req
+
+    # -------- HTTP --------
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    break # client closed between requests
+                except asyncio.LimitOverrunError:
+                    await self.respond(writer, 413, {'error': "headers too large"}, False)
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self.respond(writer, 400, {'error': "malformed request line"}, False)
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    if name: headers[name.strip().lower()] = value.strip()
+                keep = (headers.get('connection', "").lower() != "close") if version == "HTTP/1.1" \
+                    else headers.get('connection', "").lower() == "keep-alive"
+
+                if headers.get('transfer-encoding'):
+                    await self.respond(writer, 411, {'error': "send a Content-Length body"}, False)
+                    break
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    await self.respond(writer, 400, {'error': "bad Content-Length"}, False)
+                    break
+                if not 0 <= length <= self.MAX_BODY:
+                    await self.respond(writer, 413, {'error': f"body over {self.MAX_BODY} bytes"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self.dispatch(method, target, body)
+                await self.respond(writer, status, payload, keep)
+                if not keep: break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, body):
+        url = urllib.parse.urlsplit(target)
+        route = self.routes.get(url.path.rstrip("/") or "/")
+        if route is None: return 404, {'error': f"no such endpoint: {url.path}"}
+        if method not in route: return 405, {'error': f"{method} not allowed on {url.path}"}
+        query = dict(urllib.parse.parse_qsl(url.query))
+        try:
+            return 200, await route[method](query, body)
+        except HttpError as e:
+            return e.status, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': f"{type(e).__name__}: {e}"}
+
+    async def respond(self, writer, status, payload, keep):
+        # payload: dict, or bytes already encoded on a worker thread
+        data = payload if isinstance(payload, bytes) else self.encode(payload)
+        writer.write(f"HTTP/1.1 {status} {self.REASONS.get(status, '')}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: {'keep-alive' if keep else 'close'}\r\n\r\n".encode() + data)
+        await writer.drain()
+
+    async def start(self, host="127.0.0.1", port=8017):
+        return await asyncio.start_server(self.handle, host, port, limit=self.MAX_HEADER, backlog=1024)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        DataManager.close_threads(self.db_name)
+
+def serve(db_name, host="127.0.0.1", port=8017, workers=None):
+    service = AnalysisService(db_name, workers)
+
+    async def main():
+        server = await service.start(host, port)
+        addr = server.sockets[0].getsockname()
+        print(f"{APP_NAME} service on http://{addr[0]}:{addr[1]} (db: {db_name}, {service.workers} workers)", flush=True)
+        async with server: await server.serve_forever()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
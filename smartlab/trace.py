@@ -0,0 +1,116 @@
+import io
+import csv
+import json
+import time
+import pstats
+import cProfile
+import threading
+import contextlib
+import collections
+
+# ==================== INSTRUMENTATION ====================
+# Process-wide tracer. Disabled (the default) every hook is one attribute
+# check: span() hands back a shared null context and DataManager skips
+# timing entirely. Enabled, each query / span becomes an event in a bounded
+# ring buffer; listeners in `hooks` are called with every event.
+class Tracer:
+    MAX_EVENTS = 100_000
+    FIELDS = ['ts', 'kind', 'name', 'ms', 'rows', 'thread', 'detail']
+    _NULL = contextlib.nullcontext()
+
+    def __init__(self):
+        self.enabled = False
+        self.profiling = False
+        self.events = collections.deque(maxlen=self.MAX_EVENTS)
+        self.hooks = []
+        self._profiles = []
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+
+    def enable(self, on=True):
+        self.enabled = on
+
+    def clear(self):
+        with self._lock:
+            self.events.clear()
+            self._profiles.clear()
+
+    def record(self, kind, name, start, rows=None, detail=""):
+        # start: perf_counter() at the beginning of the measured block
+        now = time.perf_counter()
+        ev = {'ts': round(start - self._t0, 6), 'kind': kind, 'name': name, 'ms': (now - start) * 1000,
+              'rows': rows, 'thread': threading.current_thread().name, 'detail': detail}
+        self.events.append(ev)
+        for h in self.hooks: h(ev)
+
+    def span(self, name, kind="span"):
+        if not self.enabled: return self._NULL
+        return self._span(name, kind)
+
+    @contextlib.contextmanager
+    def _span(self, name, kind):
+        start = time.perf_counter()
+        prof = None
+        if self.profiling:
+            # One profiler per span; nested spans reuse the outer one
+            if not getattr(_profiling, "active", None):
+                prof = _profiling.active = cProfile.Profile()
+                try:
+                    prof.enable()
+                except ValueError:
+                    # Python 3.12+: one profiler per process; another thread has it
+                    prof = _profiling.active = None
+        try:
+            yield
+        finally:
+            if prof:
+                prof.disable()
+                _profiling.active = None
+                with self._lock: self._profiles.append(prof)
+            self.record(kind, name, start)
+
+    # -------- reporting --------
+    def summary(self):
+        # [(kind, name, calls, total ms, mean ms, max ms, rows)] slowest total first
+        agg = {}
+        for ev in list(self.events):
+            a = agg.setdefault((ev['kind'], ev['name']), [0, 0.0, 0.0, 0])
+            a[0] += 1; a[1] += ev['ms']; a[2] = max(a[2], ev['ms']); a[3] += ev['rows'] or 0
+        return sorted(((k, n, c, t, t / c, m, r) for (k, n), (c, t, m, r) in agg.items()), key=lambda s: -s[3])
+
+    def export(self, path):
+        # .csv -> one row per event; anything else -> JSON with events and summary
+        events = list(self.events)
+        if path.lower().endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                w = csv.DictWriter(f, self.FIELDS)
+                w.writeheader(); w.writerows(events)
+        else:
+            keys = ['kind', 'name', 'calls', 'total_ms', 'mean_ms', 'max_ms', 'rows']
+            with open(path, "w") as f:
+                json.dump({'events': events, 'summary': [dict(zip(keys, s)) for s in self.summary()]}, f, indent=1)
+        return len(events)
+
+    def profile_stats(self):
+        with self._lock: profs = list(self._profiles)
+        if not profs: return None
+        stats = pstats.Stats(profs[0])
+        for p in profs[1:]: stats.add(p)
+        return stats
+
+    def export_profile(self, path, top=60):
+        # .prof -> binary pstats (snakeviz, pstats); otherwise a text listing
+        stats = self.profile_stats()
+        if stats is None: return False
+        if path.lower().endswith(".prof"):
+            stats.dump_stats(path)
+        else:
+            out = io.StringIO()
+            stats.stream = out
+            stats.sort_stats("cumulative").print_stats(top)
+            with open(path, "w") as f: f.write(out.getvalue())
+        return True
+
+_profiling = threading.local()
+
+TRACE = Tracer()
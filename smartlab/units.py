@@ -0,0 +1,74 @@
+import numpy as np
+
+# ==================== UNITS ====================
+class UnitError(ValueError):
+    pass
+
+class UnitRegistry:
+    # Units are nodes of a dimension graph; edges are affine maps y = a*x + b.
+    # A (from, to) pair is resolved once (composing edges along the shortest
+    # path) into a cached (a, b) and then applied to whole arrays.
+    BLOCK = 1 << 16
+
+    def __init__(self):
+        self.aliases = {}
+        self.edges = {}
+        self._cache = {}
+
+    def define(self, unit, *aliases):
+        for name in (unit,) + aliases: self.aliases[name.strip().lower()] = unit
+        self.edges.setdefault(unit, [])
+
+    def link(self, u1, u2, scale, offset=0.0):
+        # u2 = scale * u1 + offset (and the inverse)
+        self.edges[u1].append((u2, scale, offset))
+        self.edges[u2].append((u1, 1.0 / scale, -offset / scale))
+        self._cache.clear()
+
+    def canonical(self, unit):
+        key = str(unit).strip().lower()
+        return self.aliases.get(key, key)
+
+    def resolve(self, from_u, to_u):
+        key = (from_u, to_u)
+        if key in self._cache: return self._cache[key]
+        u1, u2 = self.canonical(from_u), self.canonical(to_u)
+        if u1 == u2:
+            self._cache[key] = (1.0, 0.0)
+            return self._cache[key]
+        # BFS over the dimension graph composing the affine maps
+        seen, queue = {u1: (1.0, 0.0)}, [u1]
+        for u in queue:
+            a, b = seen[u]
+            for v, a2, b2 in self.edges.get(u, []):
+                if v in seen: continue
+                seen[v] = (a2 * a, a2 * b + b2)
+                queue.append(v)
+            if u2 in seen: break
+        if u2 not in seen: raise UnitError(f"Cannot convert '{from_u}' to '{to_u}'")
+        self._cache[key] = seen[u2]
+        return seen[u2]
+
+    def convert(self, values, from_u, to_u):
+        a, b = self.resolve(from_u, to_u)
+        if a == 1.0 and b == 0.0: return values
+        if not isinstance(values, np.ndarray): return values * a + b
+        # One pass over memory: scale+shift block by block while it is in cache
+        src = values.ravel() if values.flags.c_contiguous else np.ascontiguousarray(values).ravel()
+        out = np.empty(src.shape, dtype=np.result_type(src, np.float64))
+        for i in range(0, len(src), self.BLOCK):
+            o = out[i:i + self.BLOCK]
+            np.multiply(src[i:i + self.BLOCK], a, out=o)
+            if b: o += b
+        return out.reshape(values.shape)
+
+UNITS = UnitRegistry()
+UNITS.define('ppm'); UNITS.define('ppb')
+UNITS.define('mg/m3', 'mg/m^3', 'mg/m³'); UNITS.define('ug/m3', 'ug/m^3', 'ug/m³', 'µg/m3', 'µg/m³', 'μg/m3', 'μg/m³')
+UNITS.define('mg/l', 'mg/L'); UNITS.define('ug/l', 'ug/L', 'µg/l', 'μg/l')
+UNITS.define('C', '°c', 'degc', 'celsius'); UNITS.define('K', 'kelvin'); UNITS.define('F', '°f', 'degf', 'fahrenheit')
+UNITS.link('ppm', 'ppb', 1000.0)
+UNITS.link('mg/m3', 'ug/m3', 1000.0)
+UNITS.link('mg/l', 'ug/l', 1000.0)
+UNITS.link('C', 'K', 1.0, 273.15)
+UNITS.link('C', 'F', 9 / 5, 32.0) # K <-> F goes through C
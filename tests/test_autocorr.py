@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from smartlab.autocorr import Autocorrelation
+from smartlab.calc import Calculator
+
+def ar1(n, phi, seed):
+    e = np.random.default_rng(seed).normal(0, 1, n).tolist()
+    for i in range(1, n): e[i] += phi * e[i - 1]
+    return np.array(e)
+
+@pytest.mark.parametrize("phi", [0.5, 0.9])
+def test_acf_n_eff_matches_ar1(phi):
+    n = 50_000
+    x = ar1(n, phi, 1)
+    n_eff = Autocorrelation.effective_n(x, [0, n], "acf")[0]
+    assert n_eff == pytest.approx(n * (1 - phi) / (1 + phi), rel=0.15)
+
+def test_white_noise_n_eff_is_n():
+    n = 20_000
+    x = np.random.default_rng(2).normal(0, 1, n)
+    assert Autocorrelation.effective_n(x, [0, n], "acf")[0] == pytest.approx(n, rel=0.1)
+    assert Autocorrelation.effective_n(x, [0, n], "bootstrap")[0] == pytest.approx(n, rel=0.15)
+
+def test_bootstrap_reproducible_and_batch_independent():
+    logs = [ar1(n, 0.8, s) for s, n in enumerate([400, 1500, 3000])]
+    offsets = np.concatenate([[0], np.cumsum([len(x) for x in logs])])
+    flat = np.concatenate(logs)
+    a = Autocorrelation.effective_n(flat, offsets, "bootstrap", seed=5)
+    assert np.array_equal(a, Autocorrelation.effective_n(flat, offsets, "bootstrap", seed=5))
+    assert np.array_equal(a[1:], Autocorrelation.effective_n(flat[offsets[1]:], offsets[1:] - offsets[1], "bootstrap", seed=5))
+    assert not np.array_equal(a, Autocorrelation.effective_n(flat, offsets, "bootstrap", seed=6))
+
+def test_calculate_batch_type_a():
+    x = ar1(5000, 0.9, 3)
+    iid = Calculator.calculate_batch(x, 0.5, 2, 0, 0, 0)
+    acf = Calculator.calculate_batch(x, 0.5, 2, 0, 0, 0, type_a="acf")
+    assert acf['mean'][0] == iid['mean'][0]
+    assert acf['u_a'][0] == pytest.approx(iid['u_a'][0] * np.sqrt(iid['n'][0] / acf['n_eff'][0]))
+    assert acf['u_a'][0] > 3 * iid['u_a'][0]
+    with pytest.raises(ValueError): Calculator.calculate_batch(x, 0.5, 2, 0, 0, 0, type_a="nope")
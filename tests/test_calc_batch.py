@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from smartlab.calc import Calculator
+
+CAL = [(0.5, 2.0, 0.01, 0.1, 0.2), (0.3, 0.0, 0.0, 0.05, 0.0), (1.0, 3.0, 0.1, 0.0, 0.4), (0.0, 2.0, 0.0, 0.0, 0.0)]
+
+def columns():
+    rng = np.random.default_rng(7)
+    # n = 1, n = 2, an ordinary column and a long one
+    return [rng.normal(50, 5, 1).tolist(), [10.2, 10.7], rng.normal(3, 0.2, 17).tolist(), rng.normal(-4, 1, 500).tolist()]
+
+def scalar(cols):
+    return np.array([Calculator.calculate(c, *cal) for c, cal in zip(cols, CAL)])
+
+def batch_args():
+    return [np.array([c[i] for c in CAL]) for i in range(5)]
+
+def test_batch_matches_scalar_ragged():
+    cols = columns()
+    offsets = np.concatenate([[0], np.cumsum([len(c) for c in cols])])
+    res = Calculator.calculate_batch(np.concatenate(cols), *batch_args(), offsets=offsets)
+    assert np.allclose(np.column_stack([res['mean'], res['u_exp']]), scalar(cols), rtol=1e-12, atol=1e-14)
+
+def test_batch_matches_scalar_nan_padded():
+    cols = columns()
+    grid = np.full((2 * max(len(c) for c in cols) + 1, len(cols)), np.nan)
+    for j, c in enumerate(cols):
+        grid[1:2 * len(c):2, j] = c # empty cells between the readings, as in an edited grid
+    res = Calculator.calculate_batch(grid, *batch_args())
+    assert list(res['n']) == [len(c) for c in cols]
+    assert np.allclose(np.column_stack([res['mean'], res['u_exp']]), scalar(cols), rtol=1e-12, atol=1e-14)
+
+@pytest.mark.parametrize("values", [[42.0], [1.0, 3.0]])
+def test_batch_matches_scalar_small_n(values):
+    res = Calculator.calculate_batch(np.array(values), *CAL[0])
+    assert np.allclose([res['mean'][0], res['u_exp'][0]], Calculator.calculate(values, *CAL[0]), rtol=1e-12, atol=1e-14)
+
+def test_batch_empty_column_matches_scalar():
+    res = Calculator.calculate_batch(np.array([1.0, 2.0]), *CAL[0], offsets=[0, 0, 2])
+    assert (res['mean'][0], res['u_exp'][0]) == Calculator.calculate([], *CAL[0])
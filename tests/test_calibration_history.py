@@ -0,0 +1,49 @@
+import pytest
+
+from smartlab import DataManager
+
+def cal(device):
+    return dict(device=device, serial="S", date="2024-01-01", cert_unc=0.1, k_factor=2.0, resolution=0.01, drift=0.0, accuracy=0.0)
+
+@pytest.fixture
+def db(tmp_path):
+    db = DataManager(str(tmp_path / "history.db"))
+    h = db.history
+    db.v1 = h.add(2, cal("v1"), "2024-03-01 08:00:00")
+    db.v2 = h.add(2, cal("v2"), "2024-03-10 12:30:15")
+    db.v3 = h.add(2, cal("v3"), "2024-03-10 12:30:15") # same second: v2 is never valid
+    db.w1 = h.add(3, cal("w1"), "2024-03-05 00:00:00")
+    return db
+
+CASES = [
+    (2, "2024-02-28 23:59:59", None),
+    (2, "2024-03-01 08:00:00", "v1"), # at the change
+    (2, "2024-03-10 12:30:14", "v1"), # just before
+    (2, "2024-03-10 12:30:15", "v3"), # at: the later of two same-second versions wins
+    (2, "2024-03-10 12:30:16", "v3"), # just after
+    (2, "2024-03-10 12:30", "v1"),    # legacy minute precision: start of the minute
+    (2, "2024-03-10 12:31", "v3"),
+    (3, "2024-03-04 23:59:59", None),
+    (3, "2024-12-31 00:00:00", "w1"),
+    (4, "2024-06-01 00:00:00", None), # no calibration at all
+]
+
+@pytest.mark.parametrize("param, ts, device", CASES)
+def test_as_of(db, param, ts, device):
+    v = db.history.as_of(param, ts)
+    assert (v and v['device']) == device
+
+def test_resolve_matches_as_of(db):
+    got = db.history.resolve([c[0] for c in CASES], [c[1] for c in CASES]).tolist()
+    want = [(db.history.as_of(p, ts) or {}).get('id', 0) for p, ts, _ in CASES]
+    assert got == want
+    names = {p['id']: p['name'] for p in db.calibs.params()}
+    assert db.history.resolve([names[c[0]] for c in CASES[:-1]], [c[1] for c in CASES[:-1]]).tolist() == want[:-1]
+
+def test_versions_are_closed_and_ordered(db):
+    rows = db.query("SELECT id, active, valid_from, valid_to FROM calibrations WHERE param_id=2 ORDER BY id", fetch=True)
+    assert [r['active'] for r in rows] == [0, 0, 1]
+    assert rows[0]['valid_to'] == rows[1]['valid_from'] and rows[2]['valid_to'] is None
+    # a timestamp older than the current version is clamped, so history stays ordered
+    v4 = db.history.add(2, cal("v4"), "2024-01-01 00:00:00")
+    assert db.history.as_of(2, "2024-03-10 12:30:15")['id'] == v4
@@ -0,0 +1,35 @@
+import os
+import sys
+import time
+import subprocess
+import numpy as np
+
+from smartlab import DataManager
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLI_STARTUP_BUDGET = 1.5 # seconds for `python -m smartlab analyze` on a small file
+
+def write_log(path, rows=100):
+    rng = np.random.default_rng(0)
+    with open(path, "w") as f:
+        f.write("H2S,SO2,NO2\n")
+        np.savetxt(f, rng.normal(50, 5, (rows, 3)), delimiter=",", fmt="%.4f")
+
+def test_cli_cold_start_within_budget(tmp_path):
+    db, path = str(tmp_path / "cli.db"), str(tmp_path / "log.csv")
+    DataManager(db).conn.close()
+    write_log(path)
+    cmd = [sys.executable, "-m", "smartlab", "--db", db, "analyze", path]
+    times = []
+    for _ in range(3):
+        t = time.perf_counter()
+        subprocess.run(cmd, cwd=HERE, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - t)
+    assert min(times) < CLI_STARTUP_BUDGET
+
+def test_cli_does_not_import_gui_or_pdf(tmp_path):
+    # Fresh interpreter: this test process may already have loaded either one
+    out = subprocess.run([sys.executable, "-c", "import sys, smartlab.cli; "
+                          "print(*sorted({m.split('.')[0] for m in sys.modules} & {'PyQt6', 'reportlab'}))"],
+                         cwd=HERE, check=True, capture_output=True, text=True).stdout.split()
+    assert out == []
@@ -0,0 +1,32 @@
+import os
+import pytest
+import numpy as np
+
+pytest.importorskip("PyQt6")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt6.QtWidgets import QApplication
+from Main import MeasurementModel
+
+PARAMS = [{'id': 1, 'name': "H2S", 'unit': "ppb", 'warn_limit': 10.0, 'crit_limit': 20.0},
+          {'id': 2, 'name': "SO2", 'unit': "ppb", 'warn_limit': 75.0, 'crit_limit': 100.0}]
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+def test_legacy_load_resets_input_units(app):
+    # A legacy JSON grid carries no units: it must load in the parameters'
+    # units, not in whatever input unit was picked for the previous project
+    m = MeasurementModel()
+    m.set_params(PARAMS)
+    assert m.setData(m.index(0, 1), "ppm")
+    m.load([[1.0, 10.5], [2.0, 10.5]])
+    assert m.units == ["ppb", "ppb"]
+    assert np.allclose(m.converted(), [[1.0, 10.5], [2.0, 10.5]])
+
+def test_load_keeps_given_units(app):
+    m = MeasurementModel()
+    m.set_params(PARAMS)
+    m.load([[1.0, 0.0105]], ["ppb", "ppm"])
+    assert m.units == ["ppb", "ppm"]
+    assert np.allclose(m.converted(), [[1.0, 10.5]])
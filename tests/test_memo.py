@@ -0,0 +1,30 @@
+import numpy as np
+
+from smartlab import DataManager
+from smartlab.analysis import analyze_matrix
+from smartlab.memo import AnalysisCache
+
+CAL = dict(device="A", serial="S1", date="2024-01-01", cert_unc=0.05, k_factor=2.0, resolution=0.01, drift=0.01, accuracy=0.01)
+
+def test_memo_points_at_inserted_results(tmp_path):
+    db = DataManager(str(tmp_path / "memo.db"))
+    params = db.calibs.params()[:3]
+    for p in params: db.history.add(p['id'], CAL)
+    db.calibs.invalidate()
+    data = np.array([[1.0, 2.0, np.nan], [1.5, 2.5, np.nan]])
+    ids = db.insert_results([("Other", "X", 0.0, 0.0, 0.0, 0.0, "PASS", "2024-01-01 00:00", "t", "d",
+                              None, None, None, None, None, None)])
+    assert len(ids) == 1
+
+    assert analyze_matrix(db, "P", params, data, "t") == 2
+    stored = {r['param']: r for r in db.query("SELECT * FROM results WHERE project='P'", fetch=True)}
+    for j, p in enumerate(params[:2]):
+        cal = db.calibs.active(p['id'])
+        key = AnalysisCache.key("P", p, cal, data[:, j])
+        hit = db.memo.get([key])[key]
+        r = stored[p['name']]
+        assert hit['result_id'] == r['id'] and hit['mean'] == r['mean']
+
+    # Second run is all cache hits, nothing new inserted
+    assert analyze_matrix(db, "P", params, data, "t") == 2
+    assert db.conn.execute("SELECT COUNT(*) FROM results WHERE project='P'").fetchone()[0] == 2
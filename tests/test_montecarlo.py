@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from smartlab.calc import Calculator
+from smartlab.montecarlo import MonteCarlo
+
+def inputs():
+    rng = np.random.default_rng(5)
+    data = np.full((60, 3), np.nan)
+    data[:, 0] = rng.normal(20, 0.2, 60)
+    data[:40, 1] = rng.normal(5, 0.05, 40)
+    data[:, 2] = rng.normal(100, 1.0, 60)
+    # cert_unc, k, resolution, drift, accuracy per column
+    return data, [0.2, 0.05, 1.0], [2.0, 2.0, 2.0], [0.01, 0.01, 0.1], [0.02, 0.0, 0.2], [0.0, 0.01, 0.1]
+
+def test_same_seed_same_result_any_workers():
+    args = inputs()
+    one = MonteCarlo.calculate_batch(*args, samples=20000, seed=42, workers=1)
+    two = MonteCarlo.calculate_batch(*args, samples=20000, seed=42, workers=2)
+    for k in ('mean', 'u_c', 'low', 'high', 'u_exp'): assert np.array_equal(one[k], two[k]), k
+    other = MonteCarlo.calculate_batch(*args, samples=20000, seed=43, workers=1)
+    assert not np.array_equal(one['low'], other['low'])
+
+def test_agrees_with_gum_for_linear_model():
+    args = inputs()
+    gum = Calculator.calculate_batch(*args)
+    mc = MonteCarlo.calculate_batch(*args, samples=400_000, seed=1, workers=1)
+    assert np.array_equal(mc['n'], gum['n'])
+    assert mc['mean'] == pytest.approx(gum['mean'], abs=0.01 * gum['u_c'].max())
+    # t(n-1) for the mean widens u_A slightly; the rest is sampling noise
+    assert mc['u_c'] == pytest.approx(gum['u_c'], rel=0.03)
+    assert mc['u_exp'] == pytest.approx(gum['u_exp'], rel=0.05)
+    assert np.all((mc['low'] < gum['mean']) & (gum['mean'] < mc['high']))
+
+def test_empty_column_and_progress():
+    calls = []
+    data = np.array([[1.0, np.nan], [1.2, np.nan], [0.9, np.nan]])
+    res = MonteCarlo.calculate_batch(data, 0.1, 2, 0.0, 0.0, 0.0, samples=1000, seed=0, workers=1,
+                                     progress=lambda done, total: calls.append((done, total)))
+    assert res['n'].tolist() == [3, 0] and res['u_exp'][1] == 0.0
+    assert calls == [(0, 1), (1, 1)]
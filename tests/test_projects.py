@@ -0,0 +1,47 @@
+import json
+import numpy as np
+
+from smartlab import DataManager
+from smartlab.projects import ProjectBlob, read_project, save_project
+
+PARAMS = [{'id': 1, 'name': "H2S", 'unit': "ppb"}, {'id': 2, 'name': "SO2", 'unit': "ppb"},
+          {'id': 3, 'name': "NO2", 'unit': "ppb"}]
+
+def grid():
+    values = np.full((9, 3), np.nan)
+    values[[0, 3, 8], 0] = [1.5, -2.25, 1e-300]
+    values[:, 1] = np.arange(9) * 0.1
+    return values # column 2 stays empty
+
+def test_blob_round_trip():
+    values = grid()
+    blob = ProjectBlob(ProjectBlob.encode(values, PARAMS, ["ppm", "ppb", "ug/m3"]))
+    assert blob.rows == 9
+    assert [c['param_id'] for c in blob.columns] == [1, 2] # empty columns are not stored
+    out, units = blob.matrix(PARAMS)
+    assert np.array_equal(np.isnan(out), np.isnan(values))
+    assert np.array_equal(out[~np.isnan(out)], values[~np.isnan(values)])
+    assert units == ["ppm", "ppb", "ppb"] # column without readings: the param's unit
+
+def test_blob_columns_decode_lazily():
+    blob = ProjectBlob(ProjectBlob.encode(grid(), PARAMS, ["ppb"] * 3))
+    assert blob._cache == {}
+    col = blob.column(1)
+    assert list(blob._cache) == [1]
+    assert blob.column(1) is col
+    assert np.array_equal(col, grid()[:, 1])
+
+def test_save_converts_legacy_project_in_place(tmp_path):
+    db = DataManager(str(tmp_path / "projects.db"))
+    db.query("INSERT INTO projects (id, name, last_modified, data_json) VALUES (?,?,?,?)",
+             ("20200101000000", "Legacy", "2020-01-01 00:00", json.dumps({"0": {"1": "4.5"}, "1": {"2": "x"}})))
+    p, legacy = read_project(db, "20200101000000", 3)
+    assert legacy[0, 0] == 4.5 and np.isnan(legacy[1, 1])
+
+    assert save_project(db, "Legacy", legacy, PARAMS, ["ppb"] * 3, p['id']) == p['id']
+    rows = db.query("SELECT * FROM projects", fetch=True)
+    assert len(rows) == 1 and rows[0]['data_json'] is None and rows[0]['data_blob'] is not None
+    _, blob = read_project(db, p['id'], 3)
+    assert isinstance(blob, ProjectBlob)
+    out, _ = blob.matrix(PARAMS)
+    assert np.array_equal(np.isnan(out), np.isnan(legacy)) and out[0, 0] == 4.5
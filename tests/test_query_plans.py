@@ -0,0 +1,36 @@
+import re
+import sqlite3
+import pytest
+
+from smartlab import DataManager
+from benchmarks import HOT_QUERIES, legacy_db, query_plan
+
+ROWS = 20_000
+
+@pytest.fixture(scope="module")
+def migrated(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("plans") / "legacy.db")
+    legacy_db(path, ROWS)
+    conn = sqlite3.connect(path)
+    before = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+              for t in ("parameters", "calibrations", "results", "projects")}
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    conn.close()
+    return DataManager(path), before # opening migrates in place
+
+def test_legacy_database_migrates_in_place(migrated):
+    db, before = migrated
+    assert db.conn.execute("PRAGMA user_version").fetchone()[0] == len(DataManager.MIGRATIONS)
+    for table, n in before.items():
+        assert db.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == n, table
+    # only the newest profile per parameter stays active
+    assert db.conn.execute("SELECT COUNT(*) FROM calibrations WHERE active=1").fetchone()[0] == before['parameters']
+    # rollups backfilled from the migrated results
+    assert db.conn.execute("SELECT SUM(n) FROM results_daily").fetchone()[0] == ROWS
+    assert DataManager(db.db_name).migrate() == 0 # reopening is a no-op
+
+@pytest.mark.parametrize("label, sql, args", HOT_QUERIES, ids=[q[0] for q in HOT_QUERIES])
+def test_hot_query_plan(migrated, label, sql, args):
+    plan = query_plan(migrated[0].conn, sql, args)
+    assert "USE TEMP B-TREE" not in plan
+    if "WHERE" in sql: assert re.match(r"SEARCH \w+ USING (COVERING )?INDEX", plan), plan
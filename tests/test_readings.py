@@ -0,0 +1,33 @@
+import numpy as np
+
+from smartlab import DataManager
+from smartlab.analysis import analyze_matrix
+
+CAL = dict(device="A", serial="S1", date="2024-01-01", cert_unc=0.05, k_factor=2.0, resolution=0.01, drift=0.01, accuracy=0.01)
+
+def setup(tmp_path):
+    db = DataManager(str(tmp_path / "readings.db"))
+    params = db.calibs.params()[:2]
+    for p in params: db.history.add(p['id'], CAL)
+    db.calibs.invalidate()
+    data = np.random.default_rng(3).normal(20, 0.1, (30, 2))
+    return db, params, data
+
+def test_verify_gum_and_mcm_rows(tmp_path):
+    db, params, data = setup(tmp_path)
+    analyze_matrix(db, "GUM", params, data, "t")
+    analyze_matrix(db, "MCM", params, data, "t", mcm=dict(samples=20000, seed=3, workers=1))
+    rows = db.query("SELECT id, project, method FROM results ORDER BY id", fetch=True)
+    assert [r['method'] is None for r in rows] == [True, True, False, False]
+    out = db.readings.verify([r['id'] for r in rows])
+    assert [v['method'] for v in out] == ["gum", "gum", "mcm", "mcm"]
+    assert all(v['ok'] and v['digest_ok'] for v in out)
+    assert all(v['n'] == 30 for v in out)
+
+def test_verify_detects_changed_result(tmp_path):
+    db, params, data = setup(tmp_path)
+    analyze_matrix(db, "GUM", params, data, "t")
+    analyze_matrix(db, "MCM", params, data, "t", mcm=dict(samples=20000, seed=3, workers=1))
+    db.query("UPDATE results SET mean = mean + 1, min_trust = min_trust + 1, max_trust = max_trust + 1")
+    ids = [r[0] for r in db.conn.execute("SELECT id FROM results")]
+    assert not any(v['ok'] for v in db.readings.verify(ids))
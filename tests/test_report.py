@@ -0,0 +1,56 @@
+import re
+import numpy as np
+import pytest
+
+pytest.importorskip("reportlab")
+from reportlab.platypus import SimpleDocTemplate
+from reportlab.lib.pagesizes import A4
+
+from smartlab import DataManager
+from smartlab.report import ReportBuilder, FlowableStream
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    db = DataManager(str(tmp_path_factory.mktemp("report") / "report.db"))
+    rng = np.random.default_rng(0)
+    # 3 projects of uneven size: several table splits and project sections
+    db.insert_results([(f"Site {i % 3 if i < 900 else 0}", "SO2", float(m), 1.0, m - 1, m + 1, "PASS",
+                        "2024-01-01 12:00:00", "t", "dev", None, None, None, None, None, None)
+                       for i, m in enumerate(rng.normal(50, 5, 1000))])
+    return db
+
+def pdf_pages(path):
+    data = open(path, "rb").read()
+    assert data.startswith(b"%PDF-") and data.rstrip().endswith(b"%%EOF")
+    root = re.search(rb"<<[^<>]*/Type /Pages\b[^<>]*>>", data).group(0) # page tree root
+    count = int(re.search(rb"/Count (\d+)", root).group(1))
+    assert count == len(re.findall(rb"/Type /Page\b(?!s)", data))
+    return count
+
+def plain_build(path, builder):
+    # Reference: the same flowables handed to reportlab as an ordinary list
+    doc = SimpleDocTemplate(path, pagesize=A4, pageCompression=1)
+    doc.build(list(builder.flowables("t")))
+    return doc.page
+
+@pytest.mark.parametrize("by_project", [True, False])
+def test_streamed_report_matches_plain_build(db, tmp_path, by_project):
+    pages = ReportBuilder(db, by_project=by_project).build(str(tmp_path / "stream.pdf"), "t")
+    want = plain_build(str(tmp_path / "plain.pdf"), ReportBuilder(db, by_project=by_project))
+    assert pages == want == pdf_pages(str(tmp_path / "stream.pdf"))
+    assert pages >= 1000 // ReportBuilder.ROWS_PER_TABLE // 2 # ~45 rows a page
+
+def test_filtered_and_empty_reports(db, tmp_path):
+    done = []
+    b = ReportBuilder(db, {'project': "Site 1"}, True, progress=lambda d, t: done.append((d, t)))
+    assert b.build(str(tmp_path / "one.pdf"), "t") == pdf_pages(str(tmp_path / "one.pdf"))
+    assert done[-1] == (300, 300)
+    assert ReportBuilder(db, {'project': "none"}).build(str(tmp_path / "empty.pdf"), "t") == 1
+
+def test_flowable_stream_refills_from_the_front():
+    s = FlowableStream(iter(range(20)))
+    seen = []
+    while len(s):
+        assert list.__len__(s) <= FlowableStream.LOW
+        seen.append(s[0]); del s[0]
+    assert seen == list(range(20))
@@ -0,0 +1,57 @@
+import datetime
+import numpy as np
+import pytest
+
+from smartlab import DataManager
+
+BUCKETS = {'day': lambda d: d, 'week': lambda d: datetime.date.fromisoformat(d).strftime("%Y-W%W"),
+           'month': lambda d: d[:7]}
+
+def rows(rng, n, start):
+    days = [str(datetime.date(2024, 1, 1) + datetime.timedelta(days=int(i))) for i in rng.integers(0, 90, n)]
+    mean = rng.normal(50, 10, n)
+    status = np.where(mean > 65, "FAIL", np.where(mean > 55, "WARN", "PASS"))
+    return [(("A", "B")[i % 2], ("SO2", "NO2")[(i // 2) % 2], float(m), float(u), float(m - u), float(m + u), str(s),
+             f"{d} {h:02d}:00", "t", "dev", None, None, None, None, None, None)
+            for i, (m, u, s, d, h) in enumerate(zip(mean, rng.uniform(0.5, 2, n), status, days, rng.integers(0, 24, n)), start)]
+
+@pytest.fixture
+def db(tmp_path):
+    db = DataManager(str(tmp_path / "rollups.db"))
+    rng = np.random.default_rng(4)
+    db.insert_results(rows(rng, 3000, 0)) # two batches: the second merges into existing days
+    db.insert_results(rows(rng, 2000, 3000))
+    return db
+
+def expected(db, param, project, bucket, date_from=None, date_to=None):
+    r = db.query("SELECT mean, u_exp, status, substr(timestamp, 1, 10) AS day FROM results WHERE param=? AND project=?",
+                 (param, project), fetch=True)
+    r = [x for x in r if (not date_from or x['day'] >= date_from) and (not date_to or x['day'] <= date_to)]
+    out = {}
+    for period in sorted({BUCKETS[bucket](x['day']) for x in r}):
+        g = [x for x in r if BUCKETS[bucket](x['day']) == period]
+        m, u = np.array([x['mean'] for x in g]), np.array([x['u_exp'] for x in g])
+        st = [x['status'] for x in g]
+        out[period] = {'n': len(g), 'mean': m.mean(), 'stdev': m.std(ddof=1) if len(g) > 1 else 0.0,
+                       'min': m.min(), 'max': m.max(), 'u_mean': u.mean(), 'u_max': u.max(),
+                       'n_warn': st.count("WARN"), 'n_fail': st.count("FAIL"), 'n_pass': st.count("PASS")}
+    return out
+
+@pytest.mark.parametrize("bucket", list(BUCKETS))
+@pytest.mark.parametrize("dates", [(None, None), ("2024-01-20", "2024-02-10")])
+def test_trend_matches_direct_aggregate(db, bucket, dates):
+    trend = db.rollups.trend("SO2", "A", *dates, bucket=bucket)
+    want = expected(db, "SO2", "A", bucket, *dates)
+    assert [t['period'] for t in trend] == list(want)
+    for t in trend:
+        for k, v in want[t['period']].items(): assert t[k] == pytest.approx(v, rel=1e-9, abs=1e-9), (t['period'], k)
+
+def test_incremental_upsert_matches_rebuild(db):
+    sql = "SELECT * FROM results_daily ORDER BY param, project, day"
+    incremental = db.query(sql, fetch=True)
+    assert db.rollups.rebuild() == len(incremental)
+    rebuilt = db.query(sql, fetch=True)
+    assert sum(r['n'] for r in rebuilt) == 5000
+    for a, b in zip(incremental, rebuilt):
+        assert a.keys() == b.keys()
+        for k in a: assert a[k] == pytest.approx(b[k], rel=1e-9, abs=1e-9), k
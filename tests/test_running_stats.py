@@ -0,0 +1,45 @@
+import statistics
+import numpy as np
+import pytest
+
+from smartlab.calc import Calculator, RunningStats
+
+CAL = (0.5, 2.0, 0.01, 0.1, 0.2)
+
+def check(acc, values):
+    mean, u = Calculator.calculate(list(values), *CAL)
+    assert acc.n == len(values)
+    assert acc.mean == pytest.approx(statistics.mean(values), rel=1e-12, abs=1e-12)
+    assert acc.stdev == pytest.approx(statistics.stdev(values), rel=1e-12, abs=1e-12)
+    assert acc.result(*CAL) == pytest.approx((mean, u), rel=1e-12)
+
+@pytest.fixture
+def values():
+    return np.random.default_rng(11).normal(1000, 3, 2000).tolist()
+
+def test_add_and_update(values):
+    acc = RunningStats()
+    for v in values: acc.add(v)
+    check(acc, values)
+    check(RunningStats().update(values), values)
+    check(RunningStats().update(values[:700]).update(values[700:] + [float("nan")]), values) # NaN is skipped
+
+def test_remove(values):
+    acc = RunningStats().update(values)
+    for v in values[:1500]: acc.remove(v)
+    check(acc, values[1500:])
+    for v in values[1500:-1]: acc.remove(v)
+    assert (acc.n, acc.mean, acc.stdev) == (1, pytest.approx(values[-1]), 0.0)
+    acc.remove(values[-1])
+    assert (acc.n, acc.mean, acc.m2) == (0, 0.0, 0.0)
+    assert acc.result(*CAL) == (0, 0)
+
+def test_merge_and_combine(values):
+    parts = [RunningStats().update(values[a:b]) for a, b in [(0, 1), (1, 900), (900, 900), (900, 2000)]]
+    check(RunningStats.combine(parts), values)
+    check(RunningStats().update(values[:10]).merge(RunningStats().update(values[10:])), values)
+    check(RunningStats().merge(RunningStats().update(values)), values)
+
+def test_feed_matches_calculate_stream(values):
+    assert Calculator.calculate_stream(iter(values), *CAL) == pytest.approx(Calculator.calculate(values, *CAL), rel=1e-12)
+    check(RunningStats().feed(iter(values), chunk_size=333), values)
@@ -0,0 +1,52 @@
+import json
+import numpy as np
+import pytest
+
+from smartlab.screening import Screening
+from smartlab.analysis import screen_columns, result_rows
+from smartlab.calc import Calculator
+
+CLEAN = [10.02, 9.98, 10.01, 9.99, 10.03, 9.97, 10.00, 10.02, 9.98, 10.01, 9.99, 10.00]
+CAL = {'id': 1, 'device': "A", 'cert_unc': 0.05, 'k_factor': 2.0, 'resolution': 0.01, 'drift': 0.0, 'accuracy': 0.0}
+PARAM = {'id': 1, 'name': "SO2", 'unit': "ppb", 'warn_limit': 75.0, 'crit_limit': 100.0}
+
+def grid():
+    # column 0: clean + one gross outlier, column 1: clean, column 2: empty
+    data = np.full((len(CLEAN) + 1, 3), np.nan)
+    data[:, 0] = CLEAN + [11.5]
+    data[:-1, 1] = CLEAN
+    return data
+
+@pytest.mark.parametrize("method", Screening.METHODS)
+def test_each_method_flags_the_outlier_only(method):
+    flags = Screening.screen(grid(), Screening.config(method))
+    assert flags[:, 0].tolist() == [False] * len(CLEAN) + [True]
+    assert not flags[:, 1:].any()
+
+def test_screen_flat_matches_grid():
+    data = grid()
+    vals = np.concatenate([CLEAN + [11.5], CLEAN])
+    flat = Screening.screen_flat(vals, [0, len(CLEAN) + 1, len(vals)], Screening.config("grubbs"))
+    assert flat.tolist() == Screening.screen(data[:, :2], Screening.config("grubbs")).T[~np.isnan(data[:, :2].T)].tolist()
+
+@pytest.mark.parametrize("exclude", [True, False])
+def test_exclude_changes_used_readings_only(exclude):
+    data = grid()
+    cfg = Screening.config({'method': "mad", 'exclude': exclude})
+    cols = [(0, PARAM, CAL), (1, PARAM, CAL)]
+    used, flagged = screen_columns(cols, data, cfg)
+    assert list(flagged) == [0] and flagged[0].tolist() == [11.5]
+    assert np.array_equal(np.isnan(data), np.isnan(grid())) # caller's grid untouched
+    assert np.isnan(used[-1, 0]) == exclude
+    assert np.array_equal(used[:, 1], data[:, 1], equal_nan=True)
+
+    rows = result_rows("P", cols, used, "t", ts="2024-01-01 00:00", screen=cfg, flagged=flagged)
+    assert json.loads(rows[0][12]) == [11.5] and json.loads(rows[1][12]) == []
+    assert json.loads(rows[0][11])['exclude'] is exclude
+    kept = CLEAN if exclude else CLEAN + [11.5]
+    assert rows[0][2] == pytest.approx(Calculator.calculate(kept, 0.05, 2.0, 0.01, 0.0, 0.0)[0])
+
+def test_config_validation():
+    assert Screening.config(None) is None
+    for bad in ("zscore", {'method': "mad", 'alpha': 0.7}, {'method': "mad", 'threshold': 0}):
+        with pytest.raises(ValueError): Screening.config(bad)
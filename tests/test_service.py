@@ -0,0 +1,34 @@
+import json
+import asyncio
+import pytest
+
+from smartlab.service import AnalysisService, HttpError
+
+@pytest.fixture
+def svc(tmp_path):
+    return AnalysisService(str(tmp_path / "svc.db"), workers=1)
+
+def call(svc, endpoint, query=None, body=None):
+    return asyncio.run(getattr(svc, endpoint)(query or {}, json.dumps(body).encode() if body is not None else b""))
+
+@pytest.mark.parametrize("body", [
+    {'sets': [], 'method': "mcm", 'seed': "x"},
+    {'sets': [], 'method': "mcm", 'seed': -1},
+    {'sets': [{'param': ["SO2"], 'readings': [1.0]}]},
+    {'sets': [{'param': "SO2", 'readings': [1.0], 'project': {}}]},
+])
+def test_analyze_rejects_bad_input(svc, body):
+    with pytest.raises(HttpError) as e: call(svc, "analyze", body=body)
+    assert e.value.status == 400
+
+@pytest.mark.parametrize("query", [{'limit': "x"}, {'to': "bad"}])
+def test_results_rejects_bad_input(svc, query):
+    with pytest.raises(HttpError) as e: call(svc, "results", query)
+    assert e.value.status == 400
+
+@pytest.mark.parametrize("limit", ["0", "-1"])
+def test_results_limit_floor(svc, limit):
+    svc.db().insert_results([("P", "SO2", float(i), 1.0, i - 1.0, i + 1.0, "PASS", "2024-01-01 12:00", "t", "dev",
+                              None, None, None, None, None, None) for i in range(3)])
+    out = json.loads(call(svc, "results", {'limit': limit}))
+    assert len(out['results']) == 1 and out['next'] == out['results'][0]['id']
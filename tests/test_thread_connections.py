@@ -0,0 +1,50 @@
+import sqlite3
+import threading
+import concurrent.futures
+import pytest
+
+from smartlab import DataManager
+
+@pytest.fixture
+def path(tmp_path):
+    p = str(tmp_path / "threads.db")
+    DataManager(p).conn.close()
+    return p
+
+def closed(db):
+    try: db.conn.execute("SELECT 1")
+    except sqlite3.ProgrammingError: return True
+    return False
+
+def test_connections_close_when_the_thread_exits(path):
+    seen = []
+    t = threading.Thread(target=lambda: seen.append((threading.get_ident(), DataManager.for_thread(path))))
+    t.start(); t.join()
+    ident, db = seen[0]
+    assert closed(db)
+    assert ident not in DataManager._threads
+
+def test_close_threads_after_pool_shutdown(path, tmp_path):
+    other = str(tmp_path / "other.db")
+    DataManager(other).conn.close()
+    gate = threading.Barrier(4)
+    def work(_):
+        gate.wait() # one task per worker thread
+        return DataManager.for_thread(path), DataManager.for_thread(other)
+    pool = concurrent.futures.ThreadPoolExecutor(4)
+    pairs = list(pool.map(work, range(4)))
+    DataManager.close_threads(path) # workers idle but alive, as in QThreadPool
+    assert len({id(a) for a, _ in pairs}) == 4
+    assert all(closed(a) and not closed(b) for a, b in pairs)
+    # a thread reconnects on its next use
+    again = pool.submit(DataManager.for_thread, path).result()
+    assert not closed(again) and again.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 0
+    pool.shutdown(wait=True)
+    assert all(closed(b) for _, b in pairs) and closed(again)
+
+def test_service_close_releases_worker_connections(path):
+    from smartlab.service import AnalysisService
+    service = AnalysisService(path, workers=2)
+    dbs = [service.pool.submit(service.db).result() for _ in range(4)]
+    service.close()
+    assert all(closed(db) for db in dbs)
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from smartlab.units import UNITS, UnitError, UnitRegistry
+from smartlab.calc import Calculator
+
+@pytest.mark.parametrize("value, from_u, to_u, want", [
+    (0.0, "C", "K", 273.15), (100.0, "C", "F", 212.0), (-40.0, "F", "C", -40.0),
+    (0.0, "K", "F", -459.67), (32.0, "F", "K", 273.15), (300.0, "K", "C", 26.85),
+    (1.5, "ppm", "ppb", 1500.0), (250.0, "µg/m³", "mg/m3", 0.25), (20.0, "celsius", "kelvin", 293.15),
+])
+def test_conversions(value, from_u, to_u, want):
+    assert UNITS.convert(value, from_u, to_u) == pytest.approx(want, abs=1e-9)
+    assert UNITS.convert(np.array([value, value]), from_u, to_u) == pytest.approx([want, want], abs=1e-9)
+    assert UNITS.convert(UNITS.convert(value, from_u, to_u), to_u, from_u) == pytest.approx(value, abs=1e-9)
+
+def test_array_conversion_keeps_shape_and_blocks():
+    x = np.random.default_rng(0).normal(20, 5, (UnitRegistry.BLOCK + 17, 3))
+    out = UNITS.convert(x[:, ::2], "C", "F") # non-contiguous input
+    assert out.shape == (len(x), 2)
+    assert np.allclose(out, x[:, ::2] * 9 / 5 + 32)
+    assert UNITS.convert(x, "ppb", "PPB") is x # same unit: untouched
+
+def test_multi_hop_path():
+    reg = UnitRegistry()
+    for u in "abcde": reg.define(u)
+    reg.link("a", "b", 2.0, 1.0)   # b = 2a + 1
+    reg.link("b", "c", 3.0)        # c = 3b
+    reg.link("d", "c", 0.5, -4.0)  # c = 0.5d - 4
+    assert reg.resolve("a", "d") == pytest.approx((12.0, 14.0)) # d = 2(c + 4) = 12a + 14
+    assert reg.convert(1.0, "a", "d") == pytest.approx(26.0)
+    assert reg.convert(26.0, "d", "a") == pytest.approx(1.0)
+    with pytest.raises(UnitError): reg.resolve("a", "e") # defined, but not linked
+
+@pytest.mark.parametrize("from_u, to_u", [("ppm", "C"), ("mg/m3", "ppb"), ("furlong", "ppm"), ("ppm", "")])
+def test_incompatible_or_unknown_pair_raises(from_u, to_u):
+    with pytest.raises(UnitError): UNITS.convert(1.0, from_u, to_u)
+    with pytest.raises(UnitError): Calculator.convert(np.ones(3), from_u, to_u)